@@ -1,35 +1,72 @@
-from threading import Lock
-import time
+"""
+The webserver package. The webserver is set up on its first use, by `flask run`
+through create_app or by `from app import webserver`, so that importing the other
+modules of the package, e.g. from the unit tests and the benchmarks, neither loads
+the dataset nor starts the workers and the log writer.
+"""
+from threading import Lock, RLock
+import os
 from flask import Flask
-from app.data_ingestor import DataIngestor
 from app.task_runner import ThreadPool
-import logging, logging.handlers
+from app.result_store import create_result_store
+from app.memo import create_request_memo
+from app.reloader import DatasetReloader, DatasetWatcher
+from app.log_pipeline import setup_logging
+import logging
 
-# Disable werkzeug logs
-werkzeug_logger = logging.getLogger('werkzeug')
-werkzeug_logger.setLevel(logging.ERROR)
+_setup_lock = RLock()
 
-# Initialize the webserver
-webserver = Flask(__name__)
-webserver.tasks_runner = ThreadPool()
 
-# Set up root logger
-logging.basicConfig(level=logging.INFO, filename='webserver.log')
+def create_app() -> Flask:
+    """
+    Sets up the webserver, once.
 
-logger = logging.getLogger(None)
-handler = logging.handlers.RotatingFileHandler("webserver.log", maxBytes=100000, backupCount=20)
-formatter = logging.Formatter('%(asctime)s %(levelname)-8s %(message)s')
-formatter.converter = time.gmtime
-handler.setFormatter(formatter)
-logger.addHandler(handler)
+    Returns:
+        Flask: The webserver.
+    """
+    global webserver  # pylint: disable=global-variable-undefined
+    with _setup_lock:
+        if 'webserver' in globals():
+            return webserver
 
-# Initialize the data ingestor
-webserver.data_ingestor = DataIngestor("./nutrition_activity_obesity_usa_subset.csv")
+        # Disable werkzeug logs
+        werkzeug_logger = logging.getLogger('werkzeug')
+        werkzeug_logger.setLevel(logging.ERROR)
 
-# Initialize the job counter and running flag
-webserver.job_counter = 1
-webserver.job_counter_lock = Lock()
+        # Initialize the webserver
+        server = Flask(__name__)
+        server.result_store = create_result_store()
+        # Repeated requests are answered from the memo while the dataset is unchanged
+        server.memo = create_request_memo(server.result_store)
 
-webserver.running = True
+        # Set up root logger, writing to webserver.log from a background thread
+        server.log_handler = setup_logging("webserver.log")
 
-from app import routes
+        # Initialize the data ingestor from DI_CSV_PATH (see app.reloader.load_dataset)
+        csv_path = os.environ.get('DI_CSV_PATH', "./nutrition_activity_obesity_usa_subset.csv")
+        server.reloader = DatasetReloader(server, csv_path)
+        server.data_ingestor = server.reloader.load()
+
+        # Start the workers once the data is loaded, so that forked worker processes share it
+        server.tasks_runner = ThreadPool(server.result_store, server.data_ingestor)
+
+        # Reload the dataset when the CSV changes, checking every DI_WATCH_INTERVAL seconds
+        if float(os.environ.get('DI_WATCH_INTERVAL', '0')) > 0:
+            DatasetWatcher(server.reloader, float(os.environ['DI_WATCH_INTERVAL'])).start()
+
+        # Initialize the job counter and running flag
+        server.job_counter = 1
+        server.job_counter_lock = Lock()
+
+        server.running = True
+
+        # The routes import the webserver from this module
+        webserver = server
+        from app import routes  # pylint: disable=import-outside-toplevel,unused-import
+    return webserver
+
+
+def __getattr__(name: str):
+    if name == 'webserver':
+        return create_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
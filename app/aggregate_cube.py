@@ -0,0 +1,139 @@
+"""
+A module that contains the aggregate cube, a read-only summary of the dataset
+from which every task can be answered without touching the rows.
+"""
+
+import numpy as np
+
+from app.data_ingestor import DataIngestor, QUESTION_COL, STATE_COL, CATEGORY_COL, STRAT_COL
+
+
+def _mean(total: float, count: int) -> float:
+    return total / count if count else float('NaN')
+
+
+class AggregateCube:
+    """
+    Sums and counts of the valid Data_Value cells at every grouping level used by
+    the tasks. Groups are kept in order of first appearance in the CSV.
+
+    Attributes:
+        question_totals (dict): Maps each question to its (sum, count).
+        state_totals (dict): Maps each question to a dictionary from state to (sum, count).
+        category_totals (dict): Maps each question to a dictionary from state to a
+            dictionary from stratification to (category, sum, count). The category is
+            the one of the first row of the group.
+    """
+
+    def __init__(self, data_ingestor: DataIngestor, rows: np.ndarray = None):
+        """
+        Builds the cube from the rows of a DataIngestor in one pass.
+
+        Args:
+            data_ingestor (DataIngestor): The data to summarize.
+            rows (np.ndarray, optional): The sorted indexes of the rows to summarize.
+                Defaults to all the rows.
+        """
+        codes = data_ingestor.codes
+        values = data_ingestor.values
+        if rows is not None:
+            codes = {column: codes[column][rows] \
+                     for column in (QUESTION_COL, STATE_COL, STRAT_COL)}
+            values = values[rows]
+        labels = data_ingestor.labels
+        num_states = len(labels[STATE_COL])
+        num_strats = len(labels[STRAT_COL])
+
+        keys = (codes[QUESTION_COL].astype(np.int64) * num_states + codes[STATE_COL]) \
+                * num_strats + codes[STRAT_COL]
+        unique_keys, first_rows, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        valid = ~np.isnan(values)
+        sums = np.bincount(inverse, weights=np.where(valid, values, 0.0),
+                           minlength=len(unique_keys))
+        counts = np.bincount(inverse[valid], minlength=len(unique_keys))
+        if rows is not None:
+            first_rows = rows[first_rows]
+
+        self.question_totals = {}
+        self.state_totals = {}
+        self.category_totals = {}
+        for group in np.argsort(first_rows):
+            question_code, key = divmod(int(unique_keys[group]), num_states * num_strats)
+            state_code, strat_code = divmod(key, num_strats)
+            self._add(labels[QUESTION_COL][question_code], labels[STATE_COL][state_code],
+                      data_ingestor.label_of(CATEGORY_COL, first_rows[group]),
+                      labels[STRAT_COL][strat_code], float(sums[group]), int(counts[group]))
+
+    def _add(self, question: str, state: str, category: str, strat: str,
+             total: float, count: int):
+        question_total, question_count = self.question_totals.get(question, (0.0, 0))
+        self.question_totals[question] = (question_total + total, question_count + count)
+
+        states = self.state_totals.setdefault(question, {})
+        state_total, state_count = states.get(state, (0.0, 0))
+        states[state] = (state_total + total, state_count + count)
+
+        strats = self.category_totals.setdefault(question, {}).setdefault(state, {})
+        category, strat_total, strat_count = strats.get(strat, (category, 0.0, 0))
+        strats[strat] = (category, strat_total + total, strat_count + count)
+
+    def extended(self, data_ingestor: DataIngestor, rows: np.ndarray) -> 'AggregateCube':
+        """
+        Returns a new cube also summarizing rows appended to the dataset, in time
+        proportional to the number of rows and of groups they touch. The groups left
+        unchanged are shared with this cube, which is not modified.
+
+        Args:
+            data_ingestor (DataIngestor): The dataset the rows were appended to.
+            rows (np.ndarray): The sorted indexes of the appended rows.
+
+        Returns:
+            AggregateCube: The extended cube.
+        """
+        delta = AggregateCube(data_ingestor, rows)
+        cube = AggregateCube.__new__(AggregateCube)
+        cube.question_totals = dict(self.question_totals)
+        cube.state_totals = dict(self.state_totals)
+        cube.category_totals = dict(self.category_totals)
+        for question, states in delta.category_totals.items():
+            # Copy the dictionaries on the path to the touched groups before updating them
+            cube.state_totals[question] = dict(cube.state_totals.get(question, {}))
+            question_strats = cube.category_totals[question] = \
+                    dict(cube.category_totals.get(question, {}))
+            for state, strats in states.items():
+                question_strats[state] = dict(question_strats.get(state, {}))
+                for strat, (category, total, count) in strats.items():
+                    cube._add(question, state, category, strat, total, count)
+        return cube
+
+    def global_mean(self, question: str) -> float:
+        """
+        Returns the mean of all the values of a question.
+        """
+        return _mean(*self.question_totals.get(question, (0.0, 0)))
+
+    def state_means(self, question: str) -> dict:
+        """
+        Returns a dictionary from state to the mean of its values for a question.
+        """
+        return {state: _mean(*totals) \
+                for state, totals in self.state_totals.get(question, {}).items()}
+
+    def state_mean(self, question: str, state: str) -> float:
+        """
+        Returns the mean of the values of a state for a question, or None if the
+        state has no rows for the question.
+        """
+        totals = self.state_totals.get(question, {}).get(state)
+        return _mean(*totals) if totals is not None else None
+
+    def category_means(self, question: str, state: str) -> dict:
+        """
+        Returns a dictionary from stratification to (category, mean) for a question
+        and a state, or None if the state has no rows for the question.
+        """
+        strats = self.category_totals.get(question, {}).get(state)
+        if strats is None:
+            return None
+        return {strat: (category, _mean(total, count)) \
+                for strat, (category, total, count) in strats.items()}
@@ -2,46 +2,574 @@
 A module that contains a class for ingesting data from a CSV file.
 """
 
+import copy
 import csv
+import fcntl
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+QUESTION_COL = 'Question'
+STATE_COL = 'LocationDesc'
+CATEGORY_COL = 'StratificationCategory1'
+STRAT_COL = 'Stratification1'
+DATA_COL = 'Data_Value'
+
+# Columns stored as integer codes into a per-column list of labels
+CATEGORICAL_COLUMNS = (QUESTION_COL, STATE_COL, CATEGORY_COL, STRAT_COL)
+
+QUESTIONS_BEST_IS_MIN = [
+    'Percent of adults aged 18 years and older who have an overweight classification',
+    'Percent of adults aged 18 years and older who have obesity',
+    'Percent of adults who engage in no leisure-time physical activity',
+    'Percent of adults who report consuming fruit less than one time daily',
+    'Percent of adults who report consuming vegetables less than one time daily'
+]
+
+QUESTIONS_BEST_IS_MAX = [
+    'Percent of adults who achieve at least 150 minutes a week of moderate-intensity aerobic physical activity or 75 minutes a week of vigorous-intensity aerobic activity (or an equivalent combination)',
+    'Percent of adults who achieve at least 150 minutes a week of moderate-intensity aerobic physical activity or 75 minutes a week of vigorous-intensity aerobic physical activity and engage in muscle-strengthening activities on 2 or more days a week',
+    'Percent of adults who achieve at least 300 minutes a week of moderate-intensity aerobic physical activity or 150 minutes a week of vigorous-intensity aerobic activity (or an equivalent combination)',
+    'Percent of adults who engage in muscle-strengthening activities on 2 or more days a week',
+]
+
+# Names of the arrays of the index, saved next to the columns
+INDEX_ARRAYS = ('question_order', 'question_groups', 'state_order', 'state_groups')
+META_FILE = 'meta.json'
+HASH_BLOCK_SIZE = 2**20
+# The size of the ranges of the file parsed by every task of the parallel parser
+PARALLEL_PART_BYTES = 64 * 2**20
+
+_NO_ROWS = np.empty(0, dtype=np.intp)
+_NO_ROWS.flags.writeable = False
+
+
+def _read_rows(rows, header: list, labels: dict = None) -> tuple:
+    """
+    Reads the columns used by the tasks from CSV rows.
+
+    Args:
+        rows: An iterable of CSV rows, lists of cells in the order of the header.
+        header (list): The names of the columns.
+        labels (dict, optional): The labels already coded, which keep their codes.
+
+    Returns:
+        tuple: The values array, the dictionary of code arrays and the dictionary
+            of label lists.
+    """
+    positions = [header.index(column) for column in CATEGORICAL_COLUMNS]
+    data_position = header.index(DATA_COL)
+
+    lookups = [{label: code for code, label in enumerate(labels[column])} if labels else {} \
+               for column in CATEGORICAL_COLUMNS]
+    code_columns = [array('i') for _ in CATEGORICAL_COLUMNS]
+    values = array('d')
+    nan = float('NaN')
+    for row in rows:
+        # Skip blank lines, like csv.DictReader
+        if not row:
+            continue
+        for position, lookup, codes in zip(positions, lookups, code_columns):
+            label = row[position]
+            code = lookup.get(label)
+            if code is None:
+                code = lookup[label] = len(lookup)
+            codes.append(code)
+        value = row[data_position]
+        values.append(float(value) if value != '' else nan)
+
+    return np.frombuffer(values, dtype=np.float64), \
+            {column: np.frombuffer(codes, dtype=np.int32) \
+                for column, codes in zip(CATEGORICAL_COLUMNS, code_columns)}, \
+            {column: list(lookup) for column, lookup in zip(CATEGORICAL_COLUMNS, lookups)}
+
+
+def _read_csv(csv_path: str) -> tuple:
+    """
+    Reads the columns used by the tasks from a CSV file.
+
+    Returns:
+        tuple: The values array, the dictionary of code arrays and the dictionary
+            of label lists.
+    """
+    with open(csv_path, 'r', newline='') as file:
+        reader = csv.reader(file)
+        return _read_rows(reader, next(reader))
+
+
+def _read_csv_chunks(csv_path: str, chunk_rows: int) -> tuple:
+    """
+    Reads the columns used by the tasks from a CSV file with the pandas C parser,
+    chunk_rows rows at a time. Only the projected columns of one chunk are held as
+    Python objects at once, so the memory used beyond the compact columns is bounded
+    by the chunk size whatever the size of the file.
+
+    Returns:
+        tuple: The values array, the dictionary of code arrays and the dictionary
+            of label lists, the same as _read_csv.
+    """
+    # Imported here, since the other ingestion modes do not need it
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    lookups = [{} for _ in CATEGORICAL_COLUMNS]
+    code_columns = [array('i') for _ in CATEGORICAL_COLUMNS]
+    values = array('d')
+    chunks = pd.read_csv(csv_path, usecols=[*CATEGORICAL_COLUMNS, DATA_COL], chunksize=chunk_rows,
+                         dtype={**{column: str for column in CATEGORICAL_COLUMNS},
+                                DATA_COL: np.float64},
+                         keep_default_na=False, na_values={DATA_COL: ['']},
+                         float_precision='round_trip')
+    for chunk in chunks:
+        for column, lookup, codes in zip(CATEGORICAL_COLUMNS, lookups, code_columns):
+            # Code the distinct labels of the chunk, then map them to the codes of the file
+            chunk_codes, chunk_labels = pd.factorize(chunk[column])
+            file_codes = np.array([lookup.setdefault(label, len(lookup)) \
+                                   for label in chunk_labels], dtype=np.int32)
+            codes.frombytes(file_codes[chunk_codes].tobytes())
+        values.frombytes(chunk[DATA_COL].to_numpy(dtype=np.float64).tobytes())
+
+    return np.frombuffer(values, dtype=np.float64), \
+            {column: np.frombuffer(codes, dtype=np.int32) \
+                for column, codes in zip(CATEGORICAL_COLUMNS, code_columns)}, \
+            {column: list(lookup) for column, lookup in zip(CATEGORICAL_COLUMNS, lookups)}
+
+
+def _record_boundaries(csv_path: str, part_bytes: int) -> list:
+    """
+    Splits a CSV file into ranges of about part_bytes bytes that start and end on
+    record boundaries. A newline ends a record only if it is preceded by an even
+    number of quotes, so that quoted fields containing newlines are never split.
+
+    Returns:
+        list: The byte offsets of the boundaries, from the end of the header to
+            the end of the file.
+    """
+    size = os.path.getsize(csv_path)
+    boundaries = []
+    quotes = position = 0
+    with open(csv_path, 'rb') as file:
+        for target in range(0, size, part_bytes):
+            if target < position:
+                continue
+            # Count the quotes up to the target
+            file.seek(position)
+            while position < target:
+                block = file.read(min(HASH_BLOCK_SIZE, target - position))
+                quotes += block.count(b'"')
+                position += len(block)
+            # Then move to the first newline outside of quotes
+            boundary = None
+            while boundary is None:
+                block = file.read(HASH_BLOCK_SIZE)
+                if not block:
+                    boundary = position = size
+                    break
+                start = 0
+                while True:
+                    newline = block.find(b'\n', start)
+                    if newline < 0:
+                        quotes += block.count(b'"', start)
+                        position += len(block)
+                        break
+                    quotes += block.count(b'"', start, newline)
+                    start = newline + 1
+                    if quotes % 2 == 0:
+                        boundary = position = position + start
+                        break
+            boundaries.append(boundary)
+    if not boundaries or boundaries[-1] != size:
+        boundaries.append(size)
+    return boundaries
+
+
+def _read_range(csv_path: str, header: list, start: int, end: int) -> tuple:
+    with open(csv_path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    # Decoded like open(csv_path, 'r') would, the ranges never split a character
+    return _read_rows(csv.reader(io.TextIOWrapper(io.BytesIO(data), newline='')), header)
+
+
+def _read_csv_parallel(csv_path: str, workers: int) -> tuple:
+    """
+    Reads the columns used by the tasks from a CSV file with a pool of worker processes,
+    each one parsing ranges of records, then merges their columns and labels so that
+    the codes are the same as with _read_csv.
+
+    Returns:
+        tuple: The values array, the dictionary of code arrays and the dictionary
+            of label lists, the same as _read_csv.
+    """
+    boundaries = _record_boundaries(csv_path, PARALLEL_PART_BYTES)
+    with open(csv_path, 'rb') as file:
+        header_data = file.read(boundaries[0])
+    header = next(csv.reader(io.TextIOWrapper(io.BytesIO(header_data), newline='')))
+    starts, ends = boundaries[:-1], boundaries[1:]
+    if len(starts) < 2:
+        parts = [_read_range(csv_path, header, start, end) for start, end in zip(starts, ends)]
+    else:
+        # Forked, like the workers of the thread pool, so that nothing is re-imported
+        with ProcessPoolExecutor(max_workers=min(workers, len(starts)),
+                                 mp_context=multiprocessing.get_context('fork')) as executor:
+            parts = list(executor.map(_read_range, repeat(csv_path), repeat(header),
+                                      starts, ends))
+
+    # Recode every part with the labels of the whole file, in order of first appearance
+    lookups = [{} for _ in CATEGORICAL_COLUMNS]
+    code_parts = [[np.empty(0, dtype=np.int32)] for _ in CATEGORICAL_COLUMNS]
+    for _, codes, labels in parts:
+        for column, lookup, column_parts in zip(CATEGORICAL_COLUMNS, lookups, code_parts):
+            file_codes = np.array([lookup.setdefault(label, len(lookup)) \
+                                   for label in labels[column]], dtype=np.int32)
+            column_parts.append(file_codes[codes[column]])
+
+    return np.concatenate([np.empty(0)] + [values for values, _, _ in parts]), \
+            {column: np.concatenate(column_parts) \
+                for column, column_parts in zip(CATEGORICAL_COLUMNS, code_parts)}, \
+            {column: list(lookup) for column, lookup in zip(CATEGORICAL_COLUMNS, lookups)}
+
+
+def _sort_rows(keys: np.ndarray) -> tuple:
+    """
+    Sorts the rows by key, keeping the rows of every key in their original order.
+
+    Returns:
+        tuple: The sorted row indices and an array with a (start, end, key) line for
+            every group of rows sharing a key.
+    """
+    order = np.argsort(keys, kind='stable')
+    if not len(keys):
+        return order, np.empty((0, 3), dtype=np.int64)
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+    return order, np.column_stack((starts, ends, sorted_keys[starts])).astype(np.int64)
+
+
+class _Growable:
+    """
+    An array with spare capacity at its end, shared by the versions of a dataset.
+    Every version views a prefix of the buffer, so appending past the longest version
+    leaves the others unchanged.
+
+    Attributes:
+        buffer (np.ndarray): The array, of which the first length items are used.
+        length (int): The length of the longest version.
+    """
+
+    def __init__(self, array: np.ndarray, capacity: int):
+        self.buffer = np.empty(capacity, dtype=array.dtype)
+        self.buffer[:len(array)] = array
+        self.length = len(array)
+
+
+def _extend(array: np.ndarray, growable: _Growable, new: np.ndarray) -> tuple:
+    """
+    Appends new items to an array, copying it only when it is not the longest version
+    of its growable or the capacity is exhausted, which doubles it.
+
+    Returns:
+        tuple: The growable holding the result and the read-only view of the result.
+    """
+    length = len(array) + len(new)
+    if growable is None or growable.length != len(array) or length > len(growable.buffer):
+        growable = _Growable(array, 2 * length)
+    growable.buffer[len(array):length] = new
+    growable.length = length
+    view = growable.buffer[:length]
+    view.flags.writeable = False
+    return growable, view
+
+
+def _groups_in_order(keys: np.ndarray) -> list:
+    """
+    Returns (key, positions) pairs for every distinct key, keys in order of first
+    appearance and positions in increasing order.
+    """
+    order, groups = _sort_rows(keys)
+    return sorted(((int(key), order[start:end]) for start, end, key in groups.tolist()),
+                  key=lambda group: group[1][0])
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_signature(csv_path: str) -> dict:
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': _file_hash(csv_path)}
+
+
+def _read_meta(directory: str) -> dict:
+    with open(os.path.join(directory, META_FILE), 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _write_meta(directory: str, meta: dict):
+    temporary = os.path.join(directory, f"{META_FILE}.tmp")
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(meta, file)
+    os.replace(temporary, os.path.join(directory, META_FILE))
+
+
+def _snapshot_is_fresh(csv_path: str, directory: str) -> bool:
+    """
+    Tells whether the data saved in directory was read from the current CSV file.
+    The contents are only hashed when the size matches but the mtime changed.
+    """
+    try:
+        meta = _read_meta(directory)
+    except (OSError, ValueError):
+        return False
+    source = meta.get('source')
+    stat = os.stat(csv_path)
+    if source is None or stat.st_size != source['size']:
+        return False
+    if stat.st_mtime_ns == source['mtime_ns']:
+        return True
+    if _file_hash(csv_path) != source['sha256']:
+        return False
+    # Same contents, only touched: remember the new mtime to skip hashing next time
+    meta['source']['mtime_ns'] = stat.st_mtime_ns
+    _write_meta(directory, meta)
+    return True
+
 
 class DataIngestor:
     """
     A class that represents a data ingestor for CSV files.
 
+    The CSV is kept in a columnar layout: the numeric column is a float64 array
+    (NaN for blank cells) and every categorical column is an int32 array of codes
+    that index into a list of distinct labels. The arrays can be saved to a directory
+    and memory-mapped back, read-only, by any number of processes.
+
     Attributes:
-        data (list): A list of dictionaries representing the data from the CSV file.
+        values (np.ndarray): The Data_Value column, NaN where the cell is blank.
+        codes (dict): Maps each categorical column name to its array of codes.
+        labels (dict): Maps each categorical column name to the list of its labels,
+            the label of code i being labels[column][i].
+        label_codes (dict): Maps each categorical column name to a dictionary from
+            label to code.
+        index_arrays (dict): The row indices sorted per question and per (question, state)
+            and the bounds of their groups, from which the two indexes below are sliced.
+        question_index (dict): Maps each question to the indices of its rows.
+        question_state_index (dict): Maps each question to a dictionary from state to
+            the indices of the rows of that state, states in order of first appearance.
+        cube (AggregateCube): The precomputed aggregates used to answer the tasks,
+            or None to compute them from the rows.
+        growables (dict): The buffers with spare capacity holding the columns and the
+            indexes of the rows once rows are appended, shared with the previous versions.
         questions_best_is_min (list): A list of questions where the best value is the minimum.
         questions_best_is_max (list): A list of questions where the best value is the maximum.
     """
 
-    def __init__(self, csv_path: str):
+    def __init__(self, csv_path: str, chunk_rows: int = None, workers: int = None):
         """
         Initializes a DataIngestor object.
 
         Args:
             csv_path (str): The path to the CSV file.
+            chunk_rows (int, optional): If positive, the CSV is streamed in chunks of this
+                many rows with pandas, otherwise it is read with the csv module.
+                Defaults to the DI_CHUNK_ROWS environment variable, 0 if it is not set.
+            workers (int, optional): If greater than 1, ranges of the CSV are parsed by
+                this many processes with the csv module, whatever chunk_rows is.
+                Defaults to the DI_PARSE_WORKERS environment variable, 1 if it is not set.
+
+        """
+        if chunk_rows is None:
+            chunk_rows = int(os.environ.get('DI_CHUNK_ROWS', '0'))
+        if workers is None:
+            workers = int(os.environ.get('DI_PARSE_WORKERS', '1'))
+        # Read csv from csv_path, keeping only the columns used by the tasks
+        if workers > 1:
+            self._set_data(*_read_csv_parallel(csv_path, workers))
+        elif chunk_rows > 0:
+            self._set_data(*_read_csv_chunks(csv_path, chunk_rows))
+        else:
+            self._set_data(*_read_csv(csv_path))
+        self._build_index()
+
+    def _set_data(self, values: np.ndarray, codes: dict, labels: dict):
+        self.values = values
+        self.codes = codes
+        self.labels = labels
+        self.label_codes = {column: {label: code for code, label in enumerate(column_labels)} \
+                for column, column_labels in labels.items()}
+        self.cube = None
+        self.growables = {}
+        self.questions_best_is_min = QUESTIONS_BEST_IS_MIN
+        self.questions_best_is_max = QUESTIONS_BEST_IS_MAX
+
+    def _build_index(self):
+        """
+        Partitions the row indices per question and per (question, state), so that
+        lookups cost as much as the size of the answer instead of a scan of the dataset.
+        """
+        questions = self.codes[QUESTION_COL].astype(np.int64)
+        question_order, question_groups = _sort_rows(questions)
+        state_order, state_groups = _sort_rows(questions * len(self.labels[STATE_COL]) \
+                                               + self.codes[STATE_COL])
+        self.index_arrays = {'question_order': question_order, 'question_groups': question_groups,
+                             'state_order': state_order, 'state_groups': state_groups}
+        self._index_from_arrays()
+
+    def _index_from_arrays(self):
+        """
+        Builds the question and (question, state) indexes as read-only views into the
+        sorted row indices of index_arrays.
+        """
+        question_order = self.index_arrays['question_order'].view()
+        state_order = self.index_arrays['state_order'].view()
+        question_order.flags.writeable = False
+        state_order.flags.writeable = False
+        question_labels = self.labels[QUESTION_COL]
+        state_labels = self.labels[STATE_COL]
+
+        self.question_index = {question_labels[key]: question_order[start:end] \
+                for start, end, key in self.index_arrays['question_groups'].tolist()}
+
+        per_question = {}
+        for start, end, key in self.index_arrays['state_groups'].tolist():
+            question_code, state_code = divmod(key, len(state_labels))
+            per_question.setdefault(question_labels[question_code], []) \
+                    .append((state_labels[state_code], state_order[start:end]))
+
+        self.question_state_index = {}
+        for question, state_groups in per_question.items():
+            state_groups.sort(key=lambda group: group[1][0])
+            self.question_state_index[question] = dict(state_groups)
+
+    def _arrays(self) -> dict:
+        if self.index_arrays is None:
+            self._build_index()
+        return {DATA_COL: self.values, **self.codes, **self.index_arrays}
+
+    def save(self, directory: str, source: dict = None):
+        """
+        Writes the columns, the labels and the index to a directory, from which
+        load maps them back without parsing the CSV.
+
+        Args:
+            directory (str): The directory to write to, created if missing.
+            source (dict, optional): The signature of the CSV the data was read from,
+                used to tell whether the saved data is stale.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name, column in self._arrays().items():
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(column))
+        # The metadata is written last, its presence marks a complete dataset
+        _write_meta(directory, {'labels': self.labels, 'source': source})
+
+    @classmethod
+    def load(cls, directory: str) -> 'DataIngestor':
+        """
+        Memory-maps a dataset written by save. The arrays are read-only and their
+        pages are shared by every process mapping the same files.
+
+        Args:
+            directory (str): The directory the dataset was saved to.
+
+        Returns:
+            DataIngestor: The mapped dataset.
+        """
+        with open(os.path.join(directory, META_FILE), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        arrays = {name: np.asarray(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r'))
+                  for name in (DATA_COL, *CATEGORICAL_COLUMNS, *INDEX_ARRAYS)}
+
+        data_ingestor = cls.__new__(cls)
+        data_ingestor._set_data(arrays[DATA_COL],
+                                {column: arrays[column] for column in CATEGORICAL_COLUMNS},
+                                meta['labels'])
+        data_ingestor.index_arrays = {name: arrays[name] for name in INDEX_ARRAYS}
+        data_ingestor._index_from_arrays()
+        return data_ingestor
+
+    def append(self, rows, header: list) -> 'DataIngestor':
+        """
+        Returns a new version of the dataset with rows appended, in time proportional
+        to the number of new rows: the columns and the index of the touched questions
+        and states grow in place, and the aggregate cube is updated with the new rows
+        only. This version is left unchanged, so jobs using it are not disturbed.
+        Appends must not run concurrently.
+
+        Args:
+            rows: An iterable of CSV rows, lists of cells in the order of the header.
+            header (list): The names of the columns of the rows.
+
+        Returns:
+            DataIngestor: The new version of the dataset.
+        """
+        values, codes, labels = _read_rows(rows, header, self.labels)
+        if not len(values):
+            return self
+        appended = copy.copy(self)
+        appended.labels = labels
+        appended.label_codes = {column: {label: code for code, label in enumerate(column_labels)} \
+                for column, column_labels in labels.items()}
+        appended.growables = dict(self.growables)
+        appended.index_arrays = None
+
+        def extend(key, array: np.ndarray, new: np.ndarray) -> np.ndarray:
+            appended.growables[key], view = _extend(array, self.growables.get(key), new)
+            return view
+
+        appended.values = extend(DATA_COL, self.values, values)
+        appended.codes = {column: extend(column, self.codes[column], codes[column]) \
+                          for column in CATEGORICAL_COLUMNS}
+
+        new_rows = np.arange(len(self), len(appended), dtype=np.intp)
+        appended.question_index = dict(self.question_index)
+        appended.question_state_index = dict(self.question_state_index)
+        for question_code, positions in _groups_in_order(codes[QUESTION_COL]):
+            question = labels[QUESTION_COL][question_code]
+            appended.question_index[question] = extend(
+                (QUESTION_COL, question), self.get_data_for_question(question),
+                new_rows[positions])
+            states = dict(self.get_data_per_state(question))
+            for state_code, state_positions in _groups_in_order(codes[STATE_COL][positions]):
+                state = labels[STATE_COL][state_code]
+                states[state] = extend((STATE_COL, question, state), states.get(state, _NO_ROWS),
+                                       new_rows[positions[state_positions]])
+            appended.question_state_index[question] = states
+
+        if self.cube is not None:
+            appended.cube = self.cube.extended(appended, new_rows)
+        return appended
 
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def label_of(self, column: str, row: int) -> str:
         """
-        # Read csv from csv_path
-        with open(csv_path, 'r') as file:
-            self.data = list(csv.DictReader(file))
+        Returns the label stored in the given categorical column of a row.
 
-        self.questions_best_is_min = [
-            'Percent of adults aged 18 years and older who have an overweight classification',
-            'Percent of adults aged 18 years and older who have obesity',
-            'Percent of adults who engage in no leisure-time physical activity',
-            'Percent of adults who report consuming fruit less than one time daily',
-            'Percent of adults who report consuming vegetables less than one time daily'
-        ]
+        Args:
+            column (str): The name of the categorical column.
+            row (int): The index of the row.
 
-        self.questions_best_is_max = [
-            'Percent of adults who achieve at least 150 minutes a week of moderate-intensity aerobic physical activity or 75 minutes a week of vigorous-intensity aerobic activity (or an equivalent combination)',
-            'Percent of adults who achieve at least 150 minutes a week of moderate-intensity aerobic physical activity or 75 minutes a week of vigorous-intensity aerobic physical activity and engage in muscle-strengthening activities on 2 or more days a week',
-            'Percent of adults who achieve at least 300 minutes a week of moderate-intensity aerobic physical activity or 150 minutes a week of vigorous-intensity aerobic activity (or an equivalent combination)',
-            'Percent of adults who engage in muscle-strengthening activities on 2 or more days a week',
-        ]
+        Returns:
+            str: The label of the cell.
+        """
+        return self.labels[column][self.codes[column][row]]
 
-    def get_data_for_question(self, question: str) -> list:
+    def get_data_for_question(self, question: str) -> np.ndarray:
         """
         Retrieves data rows that match the given question.
 
@@ -49,6 +577,86 @@ class DataIngestor:
             question (str): The question to match.
 
         Returns:
-            list: A list of data rows that match the given question.
+            np.ndarray: The indices of the rows that match the given question.
+        """
+        return self.question_index.get(question, _NO_ROWS)
+
+    def get_data_per_state(self, question: str) -> dict:
+        """
+        Retrieves data rows that match the given question, grouped by state.
+
+        Args:
+            question (str): The question to match.
+
+        Returns:
+            dict: Maps every state to the indices of its rows that match the question,
+                states in order of first appearance.
+        """
+        return self.question_state_index.get(question, {})
+
+    def get_data_for_question_state(self, question: str, state: str) -> np.ndarray:
+        """
+        Retrieves data rows that match the given question and state.
+
+        Args:
+            question (str): The question to match.
+            state (str): The state to match.
+
+        Returns:
+            np.ndarray: The indices of the rows that match the given question and state.
         """
-        return [row for row in self.data if row['Question'] == question]
+        return self.get_data_per_state(question).get(state, _NO_ROWS)
+
+
+def default_snapshot_dir(csv_path: str) -> str:
+    """
+    Returns the directory the snapshot of a CSV file is saved to unless DI_SNAPSHOT_DIR
+    is set: under the temporary directory of the system, out of the source tree, and
+    named after the absolute path of the CSV file so that two datasets never share it.
+    """
+    csv_path = os.path.abspath(csv_path)
+    digest = hashlib.sha256(csv_path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), 'di-snapshots',
+                        f"{os.path.basename(csv_path)}-{digest}.snapshot")
+
+
+def open_snapshot(csv_path: str, directory: str) -> DataIngestor:
+    """
+    Memory-maps the binary snapshot of a CSV file saved in a directory, parsing the
+    CSV and saving the snapshot first if it is missing or stale. The snapshot is stale
+    when the size, the mtime and the hash of the CSV no longer match the ones it was
+    read with.
+
+    Worker processes opening the same directory, for example under /dev/shm, share
+    one copy of the data, and only the first one parses the CSV while the others
+    wait for it. If the snapshot cannot be written, the CSV is parsed in memory.
+
+    Args:
+        csv_path (str): The path to the CSV file.
+        directory (str): The directory holding the snapshot.
+
+    Returns:
+        DataIngestor: The mapped dataset.
+    """
+    directory = os.path.abspath(directory)
+    try:
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        with open(f"{directory}.lock", 'w', encoding='utf-8') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not _snapshot_is_fresh(csv_path, directory):
+                logging.info("Writing snapshot of %s to %s", csv_path, directory)
+                # Signed before parsing, so that a change made meanwhile invalidates it
+                source = _source_signature(csv_path)
+                # Save to a temporary directory first, so that no process maps half a dataset
+                temporary = tempfile.mkdtemp(dir=os.path.dirname(directory))
+                try:
+                    DataIngestor(csv_path).save(temporary, source)
+                except BaseException:
+                    shutil.rmtree(temporary, ignore_errors=True)
+                    raise
+                shutil.rmtree(directory, ignore_errors=True)
+                os.rename(temporary, directory)
+            return DataIngestor.load(directory)
+    except OSError as error:
+        logging.warning("Cannot use snapshot %s, parsing %s: %s", directory, csv_path, error)
+        return DataIngestor(csv_path)
@@ -0,0 +1,153 @@
+"""
+A module that contains the table of the states of the jobs, one byte per recent job ID.
+"""
+
+from threading import Lock
+
+UNKNOWN = 0
+RUNNING = 1
+DONE = 2
+FAILED = 3
+REJECTED = 4
+
+STATUS_NAMES = {RUNNING: 'running', DONE: 'done', FAILED: 'failed', REJECTED: 'rejected'}
+STATUSES = {name: state for state, name in STATUS_NAMES.items()}
+
+# The number of most recent job IDs whose state is kept, 1 MiB of states
+DEFAULT_HISTORY = 1 << 20
+
+
+class JobTable:
+    """
+    The states of the most recent jobs, in a ring indexed by job ID, with a counter per
+    state, so that counting the jobs costs O(1) and listing them costs as much as the
+    listed jobs.
+
+    Only the states of the last `history` job IDs are kept, so the table takes `history`
+    bytes however many jobs ran. The counters cover all the jobs since the start, while
+    the pages, the legacy listing and get only see the IDs still in the ring. A job that
+    leaves the ring while running is still counted when it finishes, since only the
+    jobs tracked as running are finished after their ID was used.
+
+    Attributes:
+        history (int): The number of most recent job IDs whose state is kept.
+        states (bytearray): The state of every job ID in the ring, at index job ID modulo
+            history, UNKNOWN for IDs never used.
+        counts (list): The number of jobs in every state.
+        start (int): The smallest job ID still in the ring.
+        end (int): One more than the largest job ID used.
+        lock (Lock): A lock used for thread-safe access to the table.
+    """
+
+    def __init__(self, history: int = DEFAULT_HISTORY):
+        self.history = history
+        self.states = bytearray(history)
+        self.counts = [0] * len(STATUS_NAMES)
+        self.start = 1
+        self.end = 1
+        self.lock : Lock = Lock()
+
+    def _advance(self, end: int):
+        # Clears the slots of the IDs entering the ring, dropping the oldest ones
+        cleared = min(end - self.end, self.history)
+        first = (end - cleared) % self.history
+        tail = min(cleared, self.history - first)
+        self.states[first:first + tail] = bytes(tail)
+        self.states[:cleared - tail] = bytes(cleared - tail)
+        self.end = end
+        self.start = max(1, end - self.history)
+
+    def set(self, job_id: int, state: int):
+        """
+        Records the state of a job.
+
+        Args:
+            job_id (int): The ID of the job.
+            state (int): The new state, RUNNING, DONE, FAILED or REJECTED.
+        """
+        with self.lock:
+            if job_id >= self.end:
+                self._advance(job_id + 1)
+            if job_id < self.start:
+                # A job finishing after its ID left the ring was running
+                self.counts[RUNNING - 1] -= 1
+                self.counts[state - 1] += 1
+                return
+            slot = job_id % self.history
+            previous = self.states[slot]
+            if previous != UNKNOWN:
+                self.counts[previous - 1] -= 1
+            self.counts[state - 1] += 1
+            self.states[slot] = state
+
+    def get(self, job_id: int) -> int:
+        """
+        Returns the state of a job, UNKNOWN if the ID was never used or left the ring.
+        """
+        with self.lock:
+            if self.start <= job_id < self.end:
+                return self.states[job_id % self.history]
+        return UNKNOWN
+
+    def stats(self) -> dict:
+        """
+        Returns the number of jobs in every state, and in total without the rejected ones.
+        """
+        with self.lock:
+            counts = {name: self.counts[state - 1] for state, name in STATUS_NAMES.items()}
+        return {'num_jobs': counts['running'] + counts['done'] + counts['failed'], **counts}
+
+    def _find(self, state: int, job_id: int, end: int) -> int:
+        # The first job ID from job_id to end in the state, -1 if there is none
+        while job_id < end:
+            slot = job_id % self.history
+            stop = min(self.history, slot + end - job_id)
+            found = self.states.find(state, slot, stop)
+            if found >= 0:
+                return job_id + found - slot
+            job_id += stop - slot
+        return -1
+
+    def page(self, cursor: int, limit: int, state: int = None) -> tuple:
+        """
+        Lists the jobs from a job ID on, in increasing order of ID, starting at the
+        oldest job ID still in the ring if the cursor is older.
+
+        Args:
+            cursor (int): The first job ID to list.
+            limit (int): The maximum number of jobs to list.
+            state (int, optional): Only list the jobs in this state. Defaults to all the states.
+
+        Returns:
+            tuple: The list of (job ID, state) pairs, and the cursor of the next page,
+                or None if there are no more jobs.
+        """
+        jobs = []
+        with self.lock:
+            job_id = max(cursor, self.start)
+            while len(jobs) < limit and job_id < self.end:
+                if state is not None:
+                    # Jump straight to the next job in the state
+                    job_id = self._find(state, job_id, self.end)
+                    if job_id < 0:
+                        job_id = self.end
+                        break
+                job_state = self.states[job_id % self.history]
+                if job_state != UNKNOWN:
+                    jobs.append((job_id, job_state))
+                job_id += 1
+            next_cursor = job_id if job_id < self.end else None
+        return jobs, next_cursor
+
+    def legacy_states(self, max_jobs: int) -> dict:
+        """
+        Returns the status of every job ID in the ring below max_jobs, "running" or
+        "done" (failed jobs and unused IDs are reported as done, rejected jobs are left out).
+        """
+        with self.lock:
+            start = self.start
+            states = [self.states[job_id % self.history]
+                      for job_id in range(start, min(max_jobs, self.end))]
+        states += [UNKNOWN] * max(max_jobs - start - len(states), 0)
+        return {f"job_id_{job_id}": 'running' if state == RUNNING else 'done'
+                for job_id, state in enumerate(states, start=start) if state != REJECTED}
@@ -0,0 +1,138 @@
+"""
+A module that contains the logging pipeline of the webserver: the request threads only
+queue their records, which a background thread formats and writes to the log file.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from threading import Thread, Event, Lock
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_FLUSH_INTERVAL = 0.1
+
+# The thread writing the queued records, once logging is set up
+_writer = None
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    A queue handler that never blocks the logging thread: the records are queued
+    as they are, to be formatted by the listener, and dropped if the queue is full.
+
+    Attributes:
+        dropped (int): The number of records dropped because the queue was full.
+        dropped_lock (Lock): A lock used for thread-safe counting of the dropped records,
+            which emit does not hold the handler lock for.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.dropped_lock : Lock = Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue stays in the process, so the record needs neither formatting
+        # nor pickling, and the listener formats it instead of the logging thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.dropped_lock:
+                self.dropped += 1
+
+
+class LogWriter(Thread):
+    """
+    A thread writing the queued records in batches. Unlike a QueueListener, it does not
+    wake up for every record, which would take the interpreter from the request threads.
+
+    Attributes:
+        queue (Queue): The queue of the records.
+        handler (Handler): The handler writing the records.
+        interval (float): The number of seconds between two batches.
+        stopped (Event): Set to write the last batch and stop.
+    """
+
+    def __init__(self, log_queue: queue.Queue, handler: logging.Handler, interval: float):
+        super().__init__(daemon=True)
+        self.queue = log_queue
+        self.handler = handler
+        self.interval = interval
+        self.stopped = Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.drain()
+        self.drain()
+
+    def drain(self):
+        """
+        Writes the records queued so far.
+        """
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            self.handler.handle(record)
+            # Let the request threads run between two records, rather than waiting
+            # for the whole batch to be written
+            time.sleep(0)
+
+    def stop(self):
+        """
+        Writes the remaining records and waits for the thread to stop.
+        """
+        self.stopped.set()
+        self.join()
+        self.handler.close()
+
+
+def setup_logging(filename: str) -> NonBlockingQueueHandler:
+    """
+    Sets up the root logger to write to a rotating log file from a background thread,
+    every LOG_FLUSH_INTERVAL seconds. The file rotates every LOG_MAX_BYTES bytes, keeping
+    LOG_BACKUP_COUNT files, and at most LOG_QUEUE_SIZE records wait to be written.
+
+    Args:
+        filename (str): The path to the log file.
+
+    Returns:
+        NonBlockingQueueHandler: The handler queueing the records of the root logger.
+    """
+    global _writer  # pylint: disable=global-statement
+    file_handler = logging.handlers.RotatingFileHandler(
+        filename, maxBytes=int(os.environ.get('LOG_MAX_BYTES', '100000')),
+        backupCount=int(os.environ.get('LOG_BACKUP_COUNT', '20')))
+    formatter = logging.Formatter('%(asctime)s %(levelname)-8s %(message)s')
+    formatter.converter = time.gmtime
+    file_handler.setFormatter(formatter)
+
+    handler = NonBlockingQueueHandler(
+        queue.Queue(int(os.environ.get('LOG_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))))
+    logger = logging.getLogger(None)
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
+    _writer = LogWriter(handler.queue, file_handler,
+                        float(os.environ.get('LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)))
+    _writer.start()
+    atexit.register(stop_logging)
+    return handler
+
+
+def stop_logging():
+    """
+    Writes the queued records and stops the background thread, to be called before
+    the process exits without running its exit handlers.
+    """
+    global _writer  # pylint: disable=global-statement
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
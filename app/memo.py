@@ -0,0 +1,212 @@
+"""
+A module that contains the memoization of the requests, serving repeated requests
+from the results of the previous ones while the dataset stays the same.
+"""
+
+import json
+import os
+from collections import OrderedDict
+from threading import RLock
+
+from app.result_store import ResultStore
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def request_key(endpoint: str, data: dict) -> tuple:
+    """
+    Builds the memoization key of a request from the fields read by the tasks.
+
+    Args:
+        endpoint (str): The name of the endpoint, a key of threadpool_tasks.REQUEST_TASKS.
+        data (dict): The data of the request.
+
+    Returns:
+        tuple: The key (endpoint, question, state), with question and state serialized
+            as JSON since the clients may send any JSON value. Requests whose data is not
+            a dictionary, like batches, are keyed by all of their data.
+    """
+    if not isinstance(data, dict):
+        return (endpoint, json.dumps(data, sort_keys=True))
+    return (endpoint, json.dumps(data.get('question'), sort_keys=True),
+            json.dumps(data.get('state'), sort_keys=True))
+
+
+class _InFlight:
+    """
+    A request being computed, with the jobs waiting for its result.
+
+    Attributes:
+        future (Future): The future of the job computing the result.
+        followers (list): The IDs of the jobs sharing the result.
+        generation (int): The generation of the memo when the job was submitted.
+    """
+
+    def __init__(self, generation: int):
+        self.future = None
+        self.followers = []
+        self.generation = generation
+
+
+class RequestMemo:
+    """
+    A bounded cache of the serialized results of the requests, in front of ThreadPool.submit.
+    A repeated request is answered from the cache, and a request identical to one still
+    being computed shares its job (single-flight) instead of submitting a new one.
+
+    Attributes:
+        result_store (ResultStore): The store receiving the results of the jobs.
+        max_entries (int): The maximum number of cached results, 0 to disable the cache.
+        results (OrderedDict): Maps request keys to payloads, least recently used first.
+        in_flight (dict): Maps request keys to the _InFlight requests being computed.
+        generation (int): Incremented whenever the dataset changes, so that results
+            computed from the previous dataset are not cached.
+        hits (int): The number of requests answered from the cache.
+        shared (int): The number of requests that joined a job in flight.
+        misses (int): The number of requests that submitted a job.
+        lock (RLock): A lock used for thread-safe access to the cache, reentrant since
+            the task runner may complete a job inside submit.
+    """
+
+    def __init__(self, result_store: ResultStore, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.result_store = result_store
+        self.max_entries = max_entries
+        self.results : OrderedDict = OrderedDict()
+        self.in_flight : dict = {}
+        self.generation = 0
+        self.hits = 0
+        self.shared = 0
+        self.misses = 0
+        self.lock : RLock = RLock()
+
+    def _cache(self, key: tuple, payload: bytes):
+        self.results[key] = payload
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_entries:
+            self.results.popitem(last=False)
+
+    def get(self, key: tuple) -> bytes:
+        """
+        Returns the cached result of a request, or None if it is not cached.
+        """
+        with self.lock:
+            payload = self.results.get(key)
+            if payload is not None:
+                self.results.move_to_end(key)
+                self.hits += 1
+            return payload
+
+    def put(self, key: tuple, payload: bytes, generation: int = None):
+        """
+        Caches the result of a request computed outside of the thread pool, unless
+        the dataset changed since the given generation.
+        """
+        with self.lock:
+            if generation is None or generation == self.generation:
+                self._cache(key, payload)
+
+    def submit(self, key: tuple, tasks_runner, task: callable, job_id: int, *args,
+               generation: int = None, cost: int = 0):
+        """
+        Answers a request as the job job_id, either from the cache, by sharing the job
+        of an identical request in flight, or by submitting the task to the task runner.
+
+        Args:
+            key (tuple): The key of the request, built by request_key.
+            tasks_runner (ThreadPool): The task runner executing the jobs.
+            task (callable): The function to be executed, returning the serialized result.
+            job_id (int): The ID of the job.
+            *args: Variable length argument list to be passed to the function.
+            generation (int, optional): The generation read before the dataset passed to
+                the task. If the dataset changed since, the task is submitted on its own.
+            cost (int, optional): The estimated cost of the task, for the scheduler.
+
+        Raises:
+            QueueFullError: If the task runner rejects the task, in which case requests
+                answered from the cache or sharing a job in flight still succeed.
+        """
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                tasks_runner.submit(task, job_id, *args, endpoint=key[0], cost=cost)
+                return
+            payload = self.results.get(key)
+            if payload is not None:
+                self.results.move_to_end(key)
+                self.hits += 1
+            elif key in self.in_flight:
+                entry = self.in_flight[key]
+                entry.followers.append(job_id)
+                # The follower is done when the shared job is, after its result is stored
+                tasks_runner.track(job_id, entry.future)
+                self.shared += 1
+                return
+            else:
+                entry = _InFlight(self.generation)
+                self.in_flight[key] = entry
+                self.misses += 1
+                # Other threads can not share the result before the entry knows its
+                # future, since sharing it takes the lock held here
+                try:
+                    entry.future = tasks_runner.submit(
+                        task, job_id, *args, endpoint=key[0], cost=cost,
+                        on_result=lambda payload: self._complete(key, entry, payload))
+                except BaseException:
+                    del self.in_flight[key]
+                    raise
+        if payload is not None:
+            self.result_store.put(job_id, payload)
+            tasks_runner.complete(job_id)
+        else:
+            entry.future.add_done_callback(lambda _: self._forget(key, entry))
+
+    def _complete(self, key: tuple, entry: _InFlight, payload: bytes):
+        # Called by the task runner once the result of the leader is stored,
+        # before its future is done
+        with self.lock:
+            for job_id in entry.followers:
+                self.result_store.put(job_id, payload)
+            if self.in_flight.get(key) is entry:
+                del self.in_flight[key]
+            if entry.generation == self.generation and self.max_entries > 0:
+                self._cache(key, payload)
+
+    def _forget(self, key: tuple, entry: _InFlight):
+        # Failed jobs leave no result to share, so the next request tries again
+        with self.lock:
+            if self.in_flight.get(key) is entry:
+                del self.in_flight[key]
+
+    def invalidate(self):
+        """
+        Drops the cached results, to be called whenever the dataset is reloaded.
+        The requests in flight still complete, but their results are not cached
+        and new requests do not join them.
+        """
+        with self.lock:
+            self.generation += 1
+            self.results.clear()
+            self.in_flight.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the memo.
+        """
+        with self.lock:
+            return {'hits': self.hits, 'shared': self.shared, 'misses': self.misses,
+                    'entries': len(self.results), 'max_entries': self.max_entries,
+                    'generation': self.generation}
+
+
+def create_request_memo(result_store: ResultStore) -> RequestMemo:
+    """
+    Creates the memo of the requests, holding at most MEMO_MAX_ENTRIES results
+    (0 disables the cache but keeps the single-flight deduplication).
+
+    Args:
+        result_store (ResultStore): The store receiving the results of the jobs.
+
+    Returns:
+        RequestMemo: The new memo.
+    """
+    return RequestMemo(result_store,
+                       int(os.environ.get('MEMO_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)))
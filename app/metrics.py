@@ -0,0 +1,132 @@
+"""
+A module that contains the latency histograms of the jobs and their rendering,
+with the other metrics of the webserver, in the Prometheus text exposition format.
+"""
+
+import bisect
+import os
+import resource
+from threading import Lock
+
+# The upper bounds of the buckets of the histograms, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# The phases of a job: waiting to start, computing the result, storing it, and all of them
+PHASES = ('queue', 'compute', 'persist', 'total')
+# The statistics rendered as counters rather than gauges
+COUNTERS = {'hits', 'misses', 'evictions', 'shared', 'rejected'}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """
+    The number of observations per bucket, with their sum and count.
+
+    Attributes:
+        counts (list): The number of observations of every bucket, the last one unbounded.
+        sum (float): The sum of the observations.
+        count (int): The number of observations.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """
+        Records an observation.
+        """
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class JobMetrics:
+    """
+    The latency histograms of the jobs, per endpoint and phase.
+
+    Attributes:
+        histograms (dict): Maps (endpoint, phase) pairs to their Histogram.
+        lock (Lock): A lock used for thread-safe access to the histograms.
+    """
+
+    def __init__(self):
+        self.histograms : dict = {}
+        self.lock : Lock = Lock()
+
+    def observe(self, endpoint: str, submitted: float, started: float, computed: float,
+                persisted: float):
+        """
+        Records the timestamps of a job, all read from time.monotonic().
+
+        Args:
+            endpoint (str): The endpoint of the job.
+            submitted (float): When the job was submitted.
+            started (float): When a worker started the job.
+            computed (float): When the worker returned the result.
+            persisted (float): When the result was stored.
+        """
+        durations = (started - submitted, computed - started, persisted - computed,
+                     persisted - submitted)
+        with self.lock:
+            for phase, duration in zip(PHASES, durations):
+                histogram = self.histograms.get((endpoint, phase))
+                if histogram is None:
+                    histogram = self.histograms[(endpoint, phase)] = Histogram()
+                histogram.observe(duration)
+
+    def render(self) -> list:
+        """
+        Renders the histograms as lines of the text exposition format.
+        """
+        name = 'di_job_duration_seconds'
+        lines = [f"# HELP {name} Duration of the phases of the jobs.",
+                 f"# TYPE {name} histogram"]
+        with self.lock:
+            for (endpoint, phase), histogram in sorted(self.histograms.items(),
+                                                       key=lambda item: str(item[0])):
+                labels = f'endpoint="{endpoint}",phase="{phase}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return lines
+
+
+def render_value(name: str, description: str, value: float, kind: str = 'gauge') -> list:
+    """
+    Renders a gauge or a counter as lines of the text exposition format.
+    """
+    return [f"# HELP {name} {description}", f"# TYPE {name} {kind}", f"{name} {value}"]
+
+
+def render_stats(prefix: str, description: str, stats: dict) -> list:
+    """
+    Renders the numeric statistics of a component, e.g. the counters of the memo,
+    as counters or gauges named after their keys.
+    """
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if key in COUNTERS:
+            lines += render_value(f"{prefix}_{key}_total", f"{description} {key}.", value,
+                                  'counter')
+        else:
+            lines += render_value(f"{prefix}_{key}", f"{description} {key}.", value)
+    return lines
+
+
+def process_rss() -> int:
+    """
+    Returns the resident set size of the process in bytes, or its peak where
+    /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
@@ -0,0 +1,203 @@
+"""
+A module that contains the opt-in profiling of the jobs: a fraction of the jobs of
+every endpoint run under a tracer recording the time spent in every call stack,
+aggregated as collapsed stacks that flame graph tools read (flamegraph.pl, speedscope).
+"""
+
+import random
+import sys
+import time
+from threading import Lock
+
+CONTENT_TYPE = 'text/plain; charset=utf-8'
+
+
+def _function_name(frame) -> str:
+    # Qualified names of code objects appeared with Python 3.11
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _builtin_name(function) -> str:
+    module = getattr(function, '__module__', None)
+    name = getattr(function, '__qualname__', None) or repr(function)
+    return f"{module}.{name}" if module else name
+
+
+class StackTracer:
+    """
+    A profile function (see sys.setprofile) recording the time spent in every call
+    stack of the thread it is set on, Python and built-in calls alike. Unlike cProfile,
+    which only keeps the callers of every function, it keeps the whole stacks.
+
+    Attributes:
+        names (list): The names of the calls on the stack, the first one being the root.
+        starts (list): The perf_counter() at which every call on the stack started.
+        children (list): The seconds spent in the calls made by every call on the stack.
+        stacks (dict): Maps the collapsed stacks, names joined by ";", to the seconds
+            spent in their last call itself.
+    """
+
+    def __init__(self, root: str):
+        self.names = [root]
+        self.starts = [time.perf_counter()]
+        self.children = [0.0]
+        self.stacks : dict = {}
+
+    def __call__(self, frame, event: str, arg):
+        if event == 'call':
+            self._push(_function_name(frame))
+        elif event == 'c_call':
+            self._push(_builtin_name(arg))
+        elif len(self.names) > 1:
+            # return, c_return or c_exception. The return of the call that set
+            # the tracer has no call on the stack and is ignored
+            self._pop()
+
+    def _push(self, name: str):
+        self.names.append(name.replace(';', ':'))
+        self.starts.append(time.perf_counter())
+        self.children.append(0.0)
+
+    def _pop(self):
+        elapsed = time.perf_counter() - self.starts.pop()
+        stack = ';'.join(self.names)
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + elapsed - self.children.pop()
+        self.names.pop()
+        self.children[-1] += elapsed
+
+    def finish(self) -> dict:
+        """
+        Closes the calls left on the stack, including the root.
+
+        Returns:
+            dict: The seconds spent in every collapsed stack.
+        """
+        while self.names:
+            elapsed = time.perf_counter() - self.starts.pop()
+            stack = ';'.join(self.names)
+            self.stacks[stack] = self.stacks.get(stack, 0.0) + elapsed - self.children.pop()
+            self.names.pop()
+            if self.children:
+                self.children[-1] += elapsed
+        return self.stacks
+
+
+def profile_call(root: str, task: callable, *args, **kwargs) -> tuple:
+    """
+    Calls a function with a StackTracer set on the current thread.
+
+    Args:
+        root (str): The name of the root of the stacks, e.g. the endpoint of the job.
+        task (callable): The function to call.
+        *args: Variable length argument list to be passed to the function.
+        **kwargs: Arbitrary keyword arguments to be passed to the function.
+
+    Returns:
+        tuple: The value returned by the function and the seconds spent in every stack.
+    """
+    tracer = StackTracer(root)
+    sys.setprofile(tracer)
+    try:
+        result = task(*args, **kwargs)
+    finally:
+        sys.setprofile(None)
+    return result, tracer.finish()
+
+
+class JobProfiler:
+    """
+    Decides which jobs are profiled and aggregates their stacks, per endpoint.
+
+    Profiling is disabled until a rate is set, e.g. through /api/admin/profile, and
+    then costs the jobs that are not profiled a dictionary lookup and a random draw.
+
+    Attributes:
+        rate (float): The fraction of the jobs profiled, for the endpoints without a rate.
+        rates (dict): The fraction of the jobs of every endpoint profiled.
+        enabled (bool): Whether any fraction is positive.
+        stacks (dict): Maps the endpoints to the seconds spent in every collapsed stack
+            of their profiled jobs.
+        profiled (dict): The number of profiled jobs of every endpoint.
+        lock (Lock): A lock used for thread-safe access to the stacks.
+    """
+
+    def __init__(self, rate: float = 0.0):
+        self.rate = 0.0
+        self.rates : dict = {}
+        self.enabled = False
+        self.stacks : dict = {}
+        self.profiled : dict = {}
+        self.lock : Lock = Lock()
+        self.configure(rate=rate)
+
+    def configure(self, rate: float = None, rates: dict = None, reset: bool = False):
+        """
+        Sets the fractions of the jobs profiled, each between 0 and 1.
+
+        Args:
+            rate (float, optional): The fraction for the endpoints without their own rate.
+            rates (dict, optional): The fractions of some endpoints, replacing the
+                previous ones, 0 excluding an endpoint profiled by the default rate.
+            reset (bool, optional): Whether to discard the stacks recorded so far.
+
+        Raises:
+            ValueError: If a fraction is not a number between 0 and 1.
+        """
+        fractions = ([rate] if rate is not None else []) + list((rates or {}).values())
+        for fraction in fractions:
+            if isinstance(fraction, bool) or not isinstance(fraction, (int, float)) \
+                    or not 0 <= fraction <= 1:
+                raise ValueError(f"Invalid profiling rate: {fraction}")
+        with self.lock:
+            if rate is not None:
+                self.rate = float(rate)
+            if rates is not None:
+                self.rates = {endpoint: float(fraction) for endpoint, fraction in rates.items()}
+            self.enabled = self.rate > 0 or any(self.rates.values())
+            if reset:
+                self.stacks = {}
+                self.profiled = {}
+
+    def sample(self, endpoint: str) -> bool:
+        """
+        Decides whether to profile a job of an endpoint.
+        """
+        if not self.enabled:
+            return False
+        return random.random() < self.rates.get(endpoint, self.rate)
+
+    def record(self, endpoint: str, stacks: dict):
+        """
+        Adds the stacks of a profiled job of an endpoint.
+        """
+        with self.lock:
+            totals = self.stacks.setdefault(endpoint, {})
+            for stack, seconds in stacks.items():
+                totals[stack] = totals.get(stack, 0.0) + seconds
+            self.profiled[endpoint] = self.profiled.get(endpoint, 0) + 1
+
+    def collapsed(self, endpoint: str = None) -> str:
+        """
+        Renders the stacks in the collapsed format: one stack per line, its calls
+        separated by ";", followed by the microseconds spent in its last call.
+
+        Args:
+            endpoint (str, optional): The endpoint whose stacks are rendered, all by default.
+        """
+        with self.lock:
+            endpoints = [endpoint] if endpoint is not None else sorted(self.stacks)
+            lines = [f"{stack} {round(seconds * 1e6)}"
+                     for name in endpoints
+                     for stack, seconds in sorted(self.stacks.get(name, {}).items())
+                     if round(seconds * 1e6) > 0]
+        return ''.join(line + '\n' for line in lines)
+
+    def status(self) -> dict:
+        """
+        Returns the fractions of the jobs profiled and the number of profiled jobs.
+        """
+        with self.lock:
+            return {'enabled': self.enabled, 'rate': self.rate, 'rates': dict(self.rates),
+                    'profiled': dict(self.profiled),
+                    'stacks': sum(len(stacks) for stacks in self.stacks.values())}
@@ -0,0 +1,225 @@
+"""
+A module that contains the hot reload of the dataset: a new DataIngestor is built
+in the background and swapped in while the webserver keeps answering requests.
+"""
+
+import csv
+import io
+import logging
+import os
+import time
+from threading import Thread, Lock
+
+from app.aggregate_cube import AggregateCube
+from app.data_ingestor import DataIngestor, default_snapshot_dir, open_snapshot
+
+
+def load_dataset(csv_path: str) -> DataIngestor:
+    """
+    Loads a dataset, memory-mapped from its binary snapshot unless DI_SNAPSHOT=0,
+    with the aggregate cube answering the tasks if DI_AGGREGATE_CUBE=1. The CSV is
+    parsed with the csv module, by DI_PARSE_WORKERS processes if it is greater than 1,
+    or streamed DI_CHUNK_ROWS rows at a time if that is set.
+    The snapshot is saved under the temporary directory of the system (see
+    default_snapshot_dir), or to DI_SNAPSHOT_DIR if it is set. Workers sharing one
+    DI_SNAPSHOT_DIR (e.g. under /dev/shm) share one copy of the data.
+
+    Args:
+        csv_path (str): The path to the CSV file.
+
+    Returns:
+        DataIngestor: The loaded dataset.
+    """
+    if os.environ.get('DI_SNAPSHOT', '1') == '1':
+        data_ingestor = open_snapshot(
+            csv_path, os.environ.get('DI_SNAPSHOT_DIR', default_snapshot_dir(csv_path)))
+    else:
+        data_ingestor = DataIngestor(csv_path)
+    if os.environ.get('DI_AGGREGATE_CUBE', '0') == '1':
+        data_ingestor.cube = AggregateCube(data_ingestor)
+    return data_ingestor
+
+
+def _file_signature(csv_path: str) -> tuple:
+    stat = os.stat(csv_path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def _file_ending(csv_path: str) -> tuple:
+    """
+    Returns the line terminator of a file, from its last line, and whether
+    the file is missing a final line terminator.
+    """
+    with open(csv_path, 'rb') as file:
+        size = file.seek(0, os.SEEK_END)
+        file.seek(max(size - 2, 0))
+        ending = file.read()
+    if ending.endswith(b'\r\n'):
+        return '\r\n', False
+    return '\n', size > 0 and not ending.endswith(b'\n')
+
+
+class DatasetReloader:
+    """
+    Loads the dataset of the webserver and swaps a new one in on reload or append.
+    Jobs already submitted keep the DataIngestor they were submitted with, while the
+    worker processes, the request memo and the derived indexes move to the new dataset.
+
+    Attributes:
+        webserver (Flask): The webserver whose data_ingestor is replaced.
+        csv_path (str): The path to the CSV file.
+        signature (tuple): The (size, mtime) of the CSV file when it was last loaded.
+        version (int): The number of datasets loaded or appended to.
+        last_reload (float): The time of the last successful load.
+        last_duration (float): The number of seconds the last successful load took.
+        last_error (str): The error of the last failed reload, None if it succeeded.
+        lock (Lock): A lock serializing the reloads and the appends.
+        thread (Thread): The thread of the last reload started in the background.
+    """
+
+    def __init__(self, webserver, csv_path: str):
+        self.webserver = webserver
+        self.csv_path = csv_path
+        self.signature = None
+        self.version = 0
+        self.last_reload = None
+        self.last_duration = None
+        self.last_error = None
+        self.lock : Lock = Lock()
+        self.thread = None
+
+    def load(self) -> DataIngestor:
+        """
+        Loads the dataset from the CSV file, without swapping it in.
+
+        Returns:
+            DataIngestor: The loaded dataset.
+        """
+        # Signed before loading, so that a change made meanwhile triggers another reload
+        signature = _file_signature(self.csv_path)
+        start = time.perf_counter()
+        data_ingestor = load_dataset(self.csv_path)
+        self.signature = signature
+        self.version += 1
+        self.last_reload = time.time()
+        self.last_duration = time.perf_counter() - start
+        return data_ingestor
+
+    def reload(self) -> bool:
+        """
+        Loads the dataset again and swaps it in. The current dataset is kept if the
+        new one cannot be loaded.
+
+        Returns:
+            bool: True if the new dataset was swapped in, False otherwise.
+        """
+        with self.lock:
+            try:
+                data_ingestor = self.load()
+            except Exception as error:  # pylint: disable=broad-except
+                logging.error("Reloading %s failed, keeping the current dataset: %s",
+                              self.csv_path, error)
+                self.last_error = str(error)
+                return False
+            self.last_error = None
+            # New requests read the new dataset from now on
+            self.webserver.data_ingestor = data_ingestor
+            self.webserver.tasks_runner.set_shared_data(data_ingestor)
+            self.webserver.memo.invalidate()
+            logging.info("Reloaded %s (version %d, %d rows) in %.2f s", self.csv_path,
+                         self.version, len(data_ingestor), self.last_duration)
+            return True
+
+    def append(self, text: str) -> int:
+        """
+        Appends CSV lines to the dataset and to its CSV file, without reloading it.
+        The lines have the columns of the CSV file, optionally preceded by its header.
+
+        Args:
+            text (str): The CSV lines.
+
+        Returns:
+            int: The number of rows appended.
+
+        Raises:
+            ValueError: If a line cannot be parsed, in which case nothing is appended.
+        """
+        with self.lock:
+            with open(self.csv_path, 'r', newline='') as file:
+                header = next(csv.reader(file))
+            rows = [row for row in csv.reader(io.StringIO(text, newline='')) if row]
+            if rows and rows[0] == header:
+                rows = rows[1:]
+            if any(len(row) != len(header) for row in rows):
+                raise ValueError(f"Expected {len(header)} columns per line")
+            if not rows:
+                return 0
+            data_ingestor = self.webserver.data_ingestor.append(rows, header)
+
+            # Keep the file in sync, so that the next start or reload sees the rows too
+            terminator, unterminated = _file_ending(self.csv_path)
+            with open(self.csv_path, 'a', newline='') as file:
+                if unterminated:
+                    file.write(terminator)
+                csv.writer(file, lineterminator=terminator).writerows(rows)
+            self.signature = _file_signature(self.csv_path)
+            self.version += 1
+
+            self.webserver.data_ingestor = data_ingestor
+            self.webserver.tasks_runner.set_shared_data(data_ingestor)
+            self.webserver.memo.invalidate()
+            logging.info("Appended %d rows to %s (version %d, %d rows)", len(rows),
+                         self.csv_path, self.version, len(data_ingestor))
+            return len(rows)
+
+    def reload_in_background(self) -> bool:
+        """
+        Starts a reload on a background thread, unless one is already running.
+
+        Returns:
+            bool: True if a reload was started, False if one is already running.
+        """
+        if self.lock.locked() or (self.thread is not None and self.thread.is_alive()):
+            return False
+        self.thread = Thread(target=self.reload, daemon=True)
+        self.thread.start()
+        return True
+
+    def status(self) -> dict:
+        """
+        Returns the state of the reloads.
+        """
+        return {'csv_path': self.csv_path, 'version': self.version,
+                'reloading': self.lock.locked(), 'last_reload': self.last_reload,
+                'last_duration': self.last_duration, 'last_error': self.last_error}
+
+
+class DatasetWatcher(Thread):
+    """
+    A thread reloading the dataset when its CSV file changes. A change is only picked
+    up once the file stayed the same for a whole interval, so that a file still being
+    written is not loaded.
+
+    Attributes:
+        reloader (DatasetReloader): The reloader of the dataset.
+        interval (float): The number of seconds between two checks of the file.
+    """
+
+    def __init__(self, reloader: DatasetReloader, interval: float):
+        super().__init__(daemon=True)
+        self.reloader = reloader
+        self.interval = interval
+
+    def run(self):
+        previous = attempted = self.reloader.signature
+        while True:
+            time.sleep(self.interval)
+            try:
+                signature = _file_signature(self.reloader.csv_path)
+            except OSError:
+                continue
+            # A file that failed to load is not retried until it changes again
+            if signature not in (self.reloader.signature, attempted) and signature == previous:
+                attempted = signature
+                self.reloader.reload()
+            previous = signature
@@ -0,0 +1,216 @@
+"""
+A module that contains the stores keeping the serialized results of the jobs
+until the clients ask for them.
+"""
+
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from threading import Lock
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+DEFAULT_MAX_BYTES = 256 * 2**20
+DEFAULT_TTL = 3600
+
+
+# RESULT_JSON_ENCODER=orjson selects the faster encoder when it is installed
+USE_ORJSON = os.environ.get('RESULT_JSON_ENCODER') == 'orjson' and orjson is not None
+
+def encode_result(result) -> bytes:
+    """
+    Serializes the result of a task to JSON bytes. orjson, when selected,
+    writes null where the json module writes NaN.
+
+    Args:
+        result: The result of a task.
+
+    Returns:
+        bytes: The result serialized as JSON.
+    """
+    if USE_ORJSON:
+        return orjson.dumps(result)
+    return json.dumps(result).encode('utf-8')
+
+def done_envelope(payload: bytes) -> bytes:
+    """
+    Wraps a serialized result in the JSON body of a finished job without parsing it.
+
+    Args:
+        payload (bytes): The result serialized as JSON.
+
+    Returns:
+        bytes: The JSON body {"status": "done", "data": <payload>}.
+    """
+    return b'{"status": "done", "data": ' + payload + b'}'
+
+
+class ResultStore(ABC):
+    """
+    The interface of the result stores. Results are stored as serialized JSON bytes.
+    A backend must implement put and get to be instantiated.
+
+    Attributes:
+        hits (int): The number of results found by get.
+        misses (int): The number of results not found by get.
+        evictions (int): The number of results dropped to respect the limits of the store.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def put(self, job_id: int, payload: bytes):
+        """
+        Stores the result of a job.
+
+        Args:
+            job_id (int): The ID of the job.
+            payload (bytes): The result serialized as JSON.
+        """
+
+    @abstractmethod
+    def get(self, job_id: int) -> bytes:
+        """
+        Retrieves the result of a job.
+
+        Args:
+            job_id (int): The ID of the job.
+
+        Returns:
+            bytes: The result serialized as JSON, or None if it is not stored.
+        """
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the store.
+        """
+        return {'backend': type(self).__name__, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
+
+
+class FileResultStore(ResultStore):
+    """
+    A result store that writes every result to a file named after the job ID.
+    Files are never evicted.
+
+    Attributes:
+        results_dir (str): The directory of the result files.
+    """
+
+    def __init__(self, results_dir: str = RESULTS_DIR):
+        super().__init__()
+        self.results_dir = results_dir
+        os.makedirs(results_dir, exist_ok=True)
+
+    def put(self, job_id: int, payload: bytes):
+        with open(os.path.join(self.results_dir, f"{job_id}"), 'wb') as file:
+            file.write(payload)
+
+    def get(self, job_id: int) -> bytes:
+        try:
+            with open(os.path.join(self.results_dir, f"{job_id}"), 'rb') as file:
+                payload = file.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return payload
+
+
+class MemoryResultStore(ResultStore):
+    """
+    A result store that keeps the results in memory. The least recently used results
+    are evicted when the total size exceeds max_bytes, and results older than ttl
+    seconds are dropped on every put and get, whenever they were last used.
+
+    Attributes:
+        max_bytes (int): The maximum total size of the stored results.
+        ttl (float): The number of seconds a result is kept, 0 to keep it forever.
+        size (int): The total size of the stored results.
+        results (OrderedDict): Maps job IDs to (payload, expiry time), least recently used first.
+        expiries (deque): The (expiry time, job ID) of the results in the order they were
+            stored, which is also the order they expire in since the ttl is the same for
+            all. Entries of results stored again or already evicted are skipped.
+        lock (Lock): A lock used for thread-safe access to the results.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.results : OrderedDict = OrderedDict()
+        self.expiries : deque = deque()
+        self.lock : Lock = Lock()
+
+    def _pop(self, job_id: int):
+        payload, _ = self.results.pop(job_id)
+        self.size -= len(payload)
+        self.evictions += 1
+
+    def _expire(self, now: float):
+        while self.expiries and self.expiries[0][0] <= now:
+            expiry, job_id = self.expiries.popleft()
+            entry = self.results.get(job_id)
+            if entry is not None and entry[1] == expiry:
+                self._pop(job_id)
+
+    def put(self, job_id: int, payload: bytes):
+        now = time.monotonic()
+        expiry = now + self.ttl if self.ttl else float('inf')
+        with self.lock:
+            if job_id in self.results:
+                self.size -= len(self.results.pop(job_id)[0])
+            self.results[job_id] = (payload, expiry)
+            self.size += len(payload)
+            if self.ttl:
+                self.expiries.append((expiry, job_id))
+            self._expire(now)
+            # Drop the least recently used results while over the limit
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self.results)))
+
+    def get(self, job_id: int) -> bytes:
+        with self.lock:
+            self._expire(time.monotonic())
+            entry = self.results.get(job_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.results.move_to_end(job_id)
+            self.hits += 1
+            return entry[0]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**super().stats(), 'entries': len(self.results), 'bytes': self.size,
+                    'max_bytes': self.max_bytes}
+
+
+def create_result_store() -> ResultStore:
+    """
+    Creates the result store selected by the RESULT_STORE environment variable,
+    "memory" (the default) or "file". The memory store is limited by
+    RESULT_STORE_MAX_BYTES and RESULT_STORE_TTL (in seconds, 0 to disable expiry).
+
+    Returns:
+        ResultStore: The new result store.
+    """
+    backend = os.environ.get('RESULT_STORE', 'memory')
+    if backend == 'file':
+        return FileResultStore()
+    if backend == 'memory':
+        return MemoryResultStore(
+            max_bytes=int(os.environ.get('RESULT_STORE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+            ttl=float(os.environ.get('RESULT_STORE_TTL', DEFAULT_TTL)))
+    raise ValueError(f"Unknown result store: {backend}")
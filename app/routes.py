@@ -1,42 +1,119 @@
 """
     This module contains the routes for the webserver.
 """
+import itertools
 import os
-import json
 import logging
 
 from flask import request, jsonify
 from app import webserver, threadpool_tasks
+from app.result_store import done_envelope
+from app.memo import request_key
+from app.job_table import STATUSES, STATUS_NAMES, REJECTED
+from app.task_runner import QueueFullError
+from app import metrics, profiler
 
-RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
 GREAT_SUCCESS = 200
+TOO_MANY_REQUESTS = 429
+SERVICE_UNAVAILABLE = 503
+JSON_MIMETYPE = 'application/json'
+# The longest a get_results request may block waiting for its job, in seconds
+MAX_POLL_WAIT = 30
+# The most jobs listed in one page of /api/jobs
+MAX_JOBS_PAGE = 1000
 
-def _handle_request(task: callable, *args):
+# Requests estimated to cost at most this many values are answered inline, 0 disables it
+INLINE_MAX_COST = int(os.environ.get('INLINE_MAX_COST', '0'))
+# The most a request asking to be answered inline may cost, above which it is queued
+INLINE_FORCED_MAX_COST = max(int(os.environ.get('INLINE_FORCED_MAX_COST', '5000')),
+                             INLINE_MAX_COST)
+
+# Only one in LOG_POLL_SAMPLE get_results requests is logged
+LOG_POLL_SAMPLE = max(int(os.environ.get('LOG_POLL_SAMPLE', '1')), 1)
+_polls = itertools.count()
+
+def _wants_inline(cost: int) -> bool:
+    """
+    Decides whether a request is computed in the request thread instead of the thread pool.
+    The client can ask for it with the "inline" query parameter or the X-Inline header,
+    which is granted up to INLINE_FORCED_MAX_COST, otherwise cheap requests are answered
+    inline if INLINE_MAX_COST is set.
+    """
+    inline = request.args.get('inline', request.headers.get('X-Inline'))
+    if inline is not None:
+        return inline.lower() in ('1', 'true', 'yes') and cost <= INLINE_FORCED_MAX_COST
+    return 0 < INLINE_MAX_COST and cost <= INLINE_MAX_COST
+
+def _handle_request(endpoint: str):
     """
-    Handles a request by executing the specified task asynchronously.
+    Handles a request by executing the task of the endpoint asynchronously,
+    or inline for cheap requests. Repeated requests are answered from the memo.
 
     Args:
-        task (callable): The task to be executed.
-        *args: Additional arguments to be passed to the task.
+        endpoint (str): The name of the endpoint, a key of threadpool_tasks.REQUEST_TASKS.
 
     Returns:
-        Flask.Response: The response containing the job ID associated with the request.
+        Flask.Response: The response containing the job ID associated with the request,
+            or the result itself if the request was answered inline.
     """
+    task, args = threadpool_tasks.REQUEST_TASKS[endpoint]
     data = request.json
     request_path = request.path
     logging.info("Got request at %s with data:\n %s", request_path, data)
+    key = request_key(endpoint, data)
+    # The generation is read first, so that a result computed from a dataset
+    # replaced meanwhile is not memoized
+    generation = webserver.memo.generation
+    data_ingestor = webserver.data_ingestor
+    # The cost decides which requests are answered inline and which jobs run first
+    cost = threadpool_tasks.estimate_cost(endpoint, data, data_ingestor)
+    if _wants_inline(cost):
+        payload = webserver.memo.get(key)
+        if payload is None:
+            # Admitted, recorded in the metrics and profiled like the queued jobs
+            payload = webserver.tasks_runner.run_inline(
+                threadpool_tasks.run_task, task, data, data_ingestor, *args,
+                endpoint=endpoint, cost=cost)
+            webserver.memo.put(key, payload, generation)
+        return webserver.response_class(done_envelope(payload), mimetype=JSON_MIMETYPE)
     with webserver.job_counter_lock:
         current_job_counter = webserver.job_counter
         webserver.job_counter += 1
-    webserver.tasks_runner.submit(task, current_job_counter, data, webserver.data_ingestor, *args)
+    webserver.memo.submit(key, webserver.tasks_runner, threadpool_tasks.run_task,
+                          current_job_counter, task, data, data_ingestor, *args,
+                          generation=generation, cost=cost)
     result = jsonify({"job_id": current_job_counter})
     return result
 
 
+@webserver.errorhandler(QueueFullError)
+def queue_full(error: QueueFullError):
+    """
+    Rejects a request whose job does not fit in the queue, with 503 if the whole queue
+    is full and 429 if only its endpoint is at its limit, and a Retry-After estimate.
+
+    Args:
+        error (QueueFullError): The error raised when submitting the job.
+
+    Returns:
+        tuple: A tuple containing the JSON response, the HTTP status code and the headers.
+    """
+    logging.info("Rejected request at %s: %s", request.path, error)
+    status = TOO_MANY_REQUESTS if error.endpoint else SERVICE_UNAVAILABLE
+    return jsonify({'status': 'error', 'reason': str(error),
+                    'retry_after': error.retry_after}), status, \
+        {'Retry-After': str(error.retry_after)}
+
+
 @webserver.route('/api/get_results/<job_id>', methods=['GET'])
 def get_response(job_id: str):
     """
-    Get the response for a given job ID.
+    Get the response for a given job ID. With the "wait" query parameter, the request
+    blocks for up to that many seconds (at most MAX_POLL_WAIT) until the job is done.
+    The WSGI server runs every request on its own thread, so a blocked request holds
+    that thread, though no worker, until its job finishes. Once TP_MAX_WAITERS (4096
+    by default) requests are blocked, the others answer at once, "running" if their
+    job is not done.
 
     Args:
         job_id (str): The ID of the job.
@@ -45,7 +122,8 @@ def get_response(job_id: str):
         tuple: A tuple containing the JSON response and the HTTP status code.
 
     """
-    logging.info("Got request for job_id %s", job_id)
+    if next(_polls) % LOG_POLL_SAMPLE == 0:
+        logging.info("Got request for job_id %s", job_id)
 
     if webserver.running is False:
         return jsonify({'status': 'shutting down'}), GREAT_SUCCESS
@@ -53,19 +131,97 @@ def get_response(job_id: str):
     # Check if job_id is valid
     if int(job_id) >= webserver.job_counter:
         return jsonify({'status': 'error', 'reason': 'Invalid job_id'})
+    if webserver.tasks_runner.jobs.get(int(job_id)) == REJECTED:
+        return jsonify({'status': 'error', 'reason': 'Job rejected'}), GREAT_SUCCESS
+
+    # Long poll: block until the job is done or the wait expires
+    wait = min(request.args.get('wait', 0, type=float), MAX_POLL_WAIT)
+    if wait > 0:
+        webserver.tasks_runner.wait_job(int(job_id), wait)
 
     # Check if job is done
     if webserver.tasks_runner.check_job(int(job_id)):
-        file_path = os.path.join(RESULTS_DIR, f"{job_id}")
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as file:
-                res = json.load(file)
-                return jsonify({'status': 'done', 'data': res}), GREAT_SUCCESS
-        else:
-            return jsonify({'status': 'error', 'reason': 'File not found'}), GREAT_SUCCESS
+        payload = webserver.result_store.get(int(job_id))
+        if payload is not None:
+            # The stored result is already JSON, so it is sent without being parsed again
+            return webserver.response_class(done_envelope(payload), mimetype=JSON_MIMETYPE), \
+                    GREAT_SUCCESS
+        return jsonify({'status': 'error', 'reason': 'Result not found'}), GREAT_SUCCESS
     return jsonify({'status': 'running'}), GREAT_SUCCESS
 
 
+@webserver.route('/api/result_store', methods=['GET'])
+def result_store_stats():
+    """
+    Returns the hit, miss and eviction counters of the result store.
+
+    Returns:
+        A JSON response containing the counters and a success status.
+    """
+    return jsonify(webserver.result_store.stats()), GREAT_SUCCESS
+
+
+@webserver.route('/api/memo', methods=['GET'])
+def memo_stats():
+    """
+    Returns the hit, shared and miss counters of the request memo.
+
+    Returns:
+        A JSON response containing the counters and a success status.
+    """
+    return jsonify(webserver.memo.stats()), GREAT_SUCCESS
+
+
+@webserver.route('/api/queue', methods=['GET'])
+def queue_stats():
+    """
+    Returns the depth of the job queue, its limits and the average time the jobs
+    wait to start, for load balancers to shed load before the queue is full.
+
+    Returns:
+        A JSON response containing the state of the queue and a success status.
+    """
+    return jsonify(webserver.tasks_runner.queue_stats()), GREAT_SUCCESS
+
+
+@webserver.route('/api/metrics', methods=['GET'])
+def metrics_exposition():
+    """
+    Returns the metrics of the webserver in the Prometheus text exposition format:
+    the histograms of the durations of the phases of the jobs per endpoint, the
+    state of the queue and of the jobs, the counters of the memo and of the result
+    store, and the resident memory of the process.
+
+    Returns:
+        The metrics as plain text and a success status.
+    """
+    tasks_runner = webserver.tasks_runner
+    queue = tasks_runner.queue_stats()
+    lines = tasks_runner.metrics.render()
+    lines += metrics.render_value('di_queue_depth', "Unfinished jobs.", queue['depth'])
+    lines += metrics.render_value('di_queue_scheduled', "Jobs waiting in the scheduler.",
+                                  queue['scheduled'])
+    lines += metrics.render_value('di_workers', "Workers running the jobs.", queue['workers'])
+    lines += metrics.render_value('di_active_workers', "Workers running a job.",
+                                  queue['active_workers'])
+    lines += metrics.render_value('di_jobs_rejected_total', "Jobs rejected by admission control.",
+                                  queue['rejected'], 'counter')
+    jobs_stats = tasks_runner.jobs.stats()
+    lines += ["# HELP di_jobs Jobs per status.", "# TYPE di_jobs gauge"]
+    lines += [f'di_jobs{{status="{status}"}} {count}' for status, count in jobs_stats.items()
+              if status != 'num_jobs']
+    lines += metrics.render_stats('di_memo', "Request memo", webserver.memo.stats())
+    lines += metrics.render_stats('di_result_store', "Result store",
+                                  webserver.result_store.stats())
+    lines += metrics.render_value('di_log_dropped_total', "Log records dropped by a full queue.",
+                                  webserver.log_handler.dropped, 'counter')
+    lines += metrics.render_value('di_process_resident_memory_bytes',
+                                  "Resident memory of the webserver process.",
+                                  metrics.process_rss())
+    return webserver.response_class('\n'.join(lines) + '\n',
+                                    content_type=metrics.CONTENT_TYPE), GREAT_SUCCESS
+
+
 @webserver.route('/api/states_mean', methods=['POST'])
 def states_mean_request():
     """
@@ -74,7 +230,7 @@ def states_mean_request():
     Returns:
         A tuple containing the result of the request and the status code.
     """
-    return _handle_request(threadpool_tasks.states_mean), GREAT_SUCCESS
+    return _handle_request('states_mean'), GREAT_SUCCESS
 
 
 @webserver.route('/api/state_mean', methods=['POST'])
@@ -85,7 +241,7 @@ def state_mean_request():
     Returns:
         A tuple containing the result of the request and the status code.
     """
-    return _handle_request(threadpool_tasks.state_mean), GREAT_SUCCESS
+    return _handle_request('state_mean'), GREAT_SUCCESS
 
 
 @webserver.route('/api/best5', methods=['POST'])
@@ -96,7 +252,7 @@ def best5_request():
     Returns:
         tuple: A tuple containing the result of the request and the success status.
     """
-    return _handle_request(threadpool_tasks.top, True), GREAT_SUCCESS
+    return _handle_request('best5'), GREAT_SUCCESS
 
 
 @webserver.route('/api/worst5', methods=['POST'])
@@ -107,7 +263,7 @@ def worst5_request():
     Returns:
         The result of the _handle_request function and the constant GREAT_SUCCESS.
     """
-    return _handle_request(threadpool_tasks.top, False), GREAT_SUCCESS
+    return _handle_request('worst5'), GREAT_SUCCESS
 
 
 @webserver.route('/api/global_mean', methods=['POST'])
@@ -118,7 +274,7 @@ def global_mean_request():
     Returns:
         A tuple containing the result of the _handle_request function and the GREAT_SUCCESS status.
     """
-    return _handle_request(threadpool_tasks.global_mean), GREAT_SUCCESS
+    return _handle_request('global_mean'), GREAT_SUCCESS
 
 
 @webserver.route('/api/diff_from_mean', methods=['POST'])
@@ -129,7 +285,7 @@ def diff_from_mean_request():
     Returns:
         A tuple containing the result of the request and the status code.
     """
-    return _handle_request(threadpool_tasks.diff_from_mean), GREAT_SUCCESS
+    return _handle_request('diff_from_mean'), GREAT_SUCCESS
 
 
 @webserver.route('/api/state_diff_from_mean', methods=['POST'])
@@ -137,14 +293,14 @@ def state_diff_from_mean_request():
     """
     Handles the state difference from mean request.
 
-    This function calls the _handle_request function with the task 'state_diff_from_mean'
-    from the threadpool_tasks module.
+    This function calls the _handle_request function with the 'state_diff_from_mean'
+    endpoint, whose task is in the threadpool_tasks module.
 
     Returns:
         A tuple containing the result of the _handle_request function and the status code
         'GREAT_SUCCESS'.
     """
-    return _handle_request(threadpool_tasks.state_diff_from_mean), GREAT_SUCCESS
+    return _handle_request('state_diff_from_mean'), GREAT_SUCCESS
 
 
 @webserver.route('/api/mean_by_category', methods=['POST'])
@@ -155,7 +311,7 @@ def mean_by_category_request():
     Returns:
         A tuple containing the result of the request and the status code.
     """
-    return _handle_request(threadpool_tasks.mean_by_category), GREAT_SUCCESS
+    return _handle_request('mean_by_category'), GREAT_SUCCESS
 
 
 @webserver.route('/api/state_mean_by_category', methods=['POST'])
@@ -166,7 +322,94 @@ def state_mean_by_category_request():
     Returns:
         A tuple containing the result of the request and the status code.
     """
-    return _handle_request(threadpool_tasks.state_mean_by_category), GREAT_SUCCESS
+    return _handle_request('state_mean_by_category'), GREAT_SUCCESS
+
+
+@webserver.route('/api/batch', methods=['POST'])
+def batch_request():
+    """
+    Handles a batch of requests to the other endpoints, given as a list of
+    {"endpoint", "question", "state"} objects and answered by one job.
+
+    Returns:
+        A tuple containing the result of the request and the status code.
+            The result of the job is the list of the results of the requests.
+    """
+    return _handle_request('batch'), GREAT_SUCCESS
+
+
+@webserver.route('/api/admin/reload', methods=['GET', 'POST'])
+def reload_dataset():
+    """
+    Reloads the dataset from its CSV file in the background on POST, without
+    interrupting the jobs already submitted, and returns the state of the reloads.
+
+    Returns:
+        A JSON response containing the state of the reloads and a success status.
+    """
+    started = request.method == 'POST' and webserver.reloader.reload_in_background()
+    return jsonify({**webserver.reloader.status(), 'started': started}), GREAT_SUCCESS
+
+
+@webserver.route('/api/admin/append', methods=['POST'])
+def append_rows():
+    """
+    Appends the CSV lines in the body of the request to the dataset, which answers
+    the requests submitted afterwards.
+
+    Returns:
+        A JSON response containing the number of rows appended and a success status.
+    """
+    try:
+        appended = webserver.reloader.append(request.get_data(as_text=True))
+    except (ValueError, IndexError) as error:
+        return jsonify({'status': 'error', 'reason': str(error)}), GREAT_SUCCESS
+    return jsonify({'status': 'done', 'rows': appended, 'total': len(webserver.data_ingestor),
+                    'version': webserver.reloader.version}), GREAT_SUCCESS
+
+
+@webserver.route('/api/admin/profile', methods=['GET', 'POST'])
+def profile_jobs():
+    """
+    Returns the state of the profiling of the jobs, after changing it on POST with
+    a JSON body such as {"rate": 0.1, "rates": {"mean_by_category": 1}, "reset": true}:
+    the fraction of the jobs of every endpoint profiled, 0 to disable it, and whether to
+    discard the stacks recorded so far.
+
+    Returns:
+        A JSON response containing the state of the profiling and a success status.
+    """
+    job_profiler = webserver.tasks_runner.profiler
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        rates = data.get('rates')
+        try:
+            if rates is not None and (not isinstance(rates, dict) or
+                                      not set(rates) <= set(threadpool_tasks.REQUEST_TASKS)):
+                raise ValueError(f"Invalid profiling rates: {rates}")
+            job_profiler.configure(data.get('rate'), rates, bool(data.get('reset')))
+        except ValueError as error:
+            return jsonify({'status': 'error', 'reason': str(error)}), GREAT_SUCCESS
+        logging.info("Profiling configured: %s", job_profiler.status())
+    return jsonify(job_profiler.status()), GREAT_SUCCESS
+
+
+@webserver.route('/api/admin/profile/stacks', methods=['GET'])
+def profile_stacks():
+    """
+    Downloads the stacks of the profiled jobs, of the endpoint given by the "endpoint"
+    query parameter or of all of them, in the collapsed format of flame graph tools:
+    one stack per line, rooted at its endpoint, with the microseconds spent in its last call.
+
+    Returns:
+        The collapsed stacks as a plain text attachment and a success status.
+    """
+    endpoint = request.args.get('endpoint')
+    response = webserver.response_class(
+        webserver.tasks_runner.profiler.collapsed(endpoint), content_type=profiler.CONTENT_TYPE)
+    response.headers['Content-Disposition'] = \
+        f'attachment; filename="{endpoint or "jobs"}.collapsed"'
+    return response, GREAT_SUCCESS
 
 
 @webserver.route('/api/gracefull_shutdown', methods=['GET'])
@@ -175,39 +418,57 @@ def gracefull_shutdown():
     Gracefully shuts down the web server.
 
     This function sets the `running` flag of the web server to False and
-    shuts down the tasks runner. It returns a JSON response indicating
+    shuts down the tasks runner once the response is sent, since the process
+    exits as soon as the last job is done. It returns a JSON response indicating
     that the server is shutting down.
 
     Returns:
         A JSON response with the status message and the HTTP status code.
     """
     webserver.running = False
-    webserver.tasks_runner.shutdown()
-    return jsonify({'status': 'shutting down'}), GREAT_SUCCESS
+    response = jsonify({'status': 'shutting down'})
+    response.call_on_close(webserver.tasks_runner.shutdown)
+    return response, GREAT_SUCCESS
 
 
 @webserver.route('/api/num_jobs', methods=['GET'])
 def num_jobs():
     """
-    Returns the number of jobs in the webserver's task runner.
+    Returns the number of jobs in the webserver's task runner, in total and per status
+    (running, done, failed and rejected, the rejected jobs not counting in the total),
+    from the counters of the job table.
 
     Returns:
         A JSON response containing the number of jobs and a success status.
     """
-    result = len(webserver.tasks_runner.get_jobs(webserver.job_counter))
-    return jsonify({'num_jobs': result}), GREAT_SUCCESS
+    return jsonify(webserver.tasks_runner.jobs.stats()), GREAT_SUCCESS
 
 
 @webserver.route('/api/jobs', methods=['GET'])
 def jobs():
     """
-    Retrieve the jobs from the webserver's tasks runner.
+    Retrieve the jobs from the webserver's tasks runner. Without query parameters, all the
+    jobs are listed. Otherwise the jobs are listed a page at a time, from the job ID
+    "cursor" on, at most "limit" (up to MAX_JOBS_PAGE) of them, only those with the given
+    "status" (running, done, failed or rejected) if it is set, along with the cursor of
+    the next page. Only the last TP_JOB_HISTORY job IDs are listed.
 
     Returns:
         A JSON response containing the result of the jobs and a success status code.
     """
-    result = webserver.tasks_runner.get_jobs(webserver.job_counter)
-    return jsonify(result), GREAT_SUCCESS
+    if not any(param in request.args for param in ('cursor', 'limit', 'status')):
+        result = webserver.tasks_runner.get_jobs(webserver.job_counter)
+        return jsonify(result), GREAT_SUCCESS
+
+    status = request.args.get('status')
+    if status is not None and status not in STATUSES:
+        return jsonify({'status': 'error', 'reason': 'Invalid status'}), GREAT_SUCCESS
+    cursor = request.args.get('cursor', 1, type=int)
+    limit = min(max(request.args.get('limit', MAX_JOBS_PAGE, type=int), 0), MAX_JOBS_PAGE)
+    page, next_cursor = webserver.tasks_runner.jobs.page(
+        cursor, limit, STATUSES[status] if status is not None else None)
+    return jsonify({'jobs': {f"job_id_{job_id}": STATUS_NAMES[state] for job_id, state in page},
+                    'next_cursor': next_cursor}), GREAT_SUCCESS
 
 
 @webserver.route('/')
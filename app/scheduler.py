@@ -0,0 +1,80 @@
+"""
+A module that contains the cost-aware scheduling of the jobs, running cheap jobs
+before the expensive ones queued with them.
+"""
+
+import heapq
+import itertools
+
+# The weight of the last job in the moving averages of the cost of the endpoints
+RATE_WEIGHT = 0.2
+DEFAULT_SLACK = 10.0
+DEFAULT_MAX_DELAY = 5.0
+
+
+class CostScheduler:
+    """
+    A queue of jobs ordered by virtual deadline: the time a job was submitted, plus
+    the time it is predicted to run for multiplied by the slack. Cheap jobs thus overtake
+    the expensive ones, while a job is never overtaken by the jobs submitted more than
+    max_delay seconds after it, so that expensive jobs do not starve under load.
+
+    The running time of a job is predicted from its cost (see threadpool_tasks.estimate_cost)
+    and the seconds per unit of cost measured on the previous jobs of its endpoint.
+
+    Not thread-safe, the task runner serializes the accesses.
+
+    Attributes:
+        slack (float): How many times its predicted running time a job may be delayed.
+        max_delay (float): The longest a job may be delayed, in seconds.
+        rates (dict): The moving average of the seconds per unit of cost of every endpoint.
+        ready (list): The heap of (deadline, sequence number, job) entries.
+    """
+
+    def __init__(self, slack: float = DEFAULT_SLACK, max_delay: float = DEFAULT_MAX_DELAY):
+        self.slack = slack
+        self.max_delay = max_delay
+        self.rates : dict = {}
+        self.ready : list = []
+        self.counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.ready)
+
+    def predict(self, endpoint: str, cost: int) -> float:
+        """
+        Predicts the number of seconds a job runs for, from the rate of its endpoint,
+        or the mean rate of all the endpoints if none of its jobs ran yet.
+        """
+        rate = self.rates.get(endpoint)
+        if rate is None:
+            rate = sum(self.rates.values()) / len(self.rates) if self.rates else 0.0
+        return max(cost, 1) * rate
+
+    def push(self, job, submitted: float, endpoint: str, cost: int):
+        """
+        Queues a job.
+
+        Args:
+            job: The job.
+            submitted (float): The time.monotonic() at which the job was submitted.
+            endpoint (str): The endpoint of the job.
+            cost (int): The estimated cost of the job.
+        """
+        delay = min(self.slack * self.predict(endpoint, cost), self.max_delay)
+        heapq.heappush(self.ready, (submitted + delay, next(self.counter), job))
+
+    def pop(self):
+        """
+        Removes and returns the job with the earliest deadline.
+        """
+        return heapq.heappop(self.ready)[2]
+
+    def observe(self, endpoint: str, cost: int, seconds: float):
+        """
+        Records the running time of a job of an endpoint.
+        """
+        rate = seconds / max(cost, 1)
+        previous = self.rates.get(endpoint)
+        self.rates[endpoint] = rate if previous is None else \
+            previous + RATE_WEIGHT * (rate - previous)
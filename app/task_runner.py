@@ -3,73 +3,494 @@ A module that provides a ThreadPool class for executing jobs asynchronously.
 """
 
 import logging
-from threading import Thread, Lock
-from concurrent.futures import Future, ThreadPoolExecutor
+import math
+import multiprocessing
+from threading import Event, Lock
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 import time
 import os
 
-CLEANUP_INTERVAL = 2
+from app.job_table import JobTable, RUNNING, DONE, FAILED, REJECTED, DEFAULT_HISTORY
+from app.log_pipeline import stop_logging
+from app.metrics import JobMetrics
+from app.profiler import JobProfiler, profile_call
+from app.result_store import ResultStore
+from app.scheduler import CostScheduler, DEFAULT_SLACK, DEFAULT_MAX_DELAY
+
+# The weight of the last job in the moving averages of the wait and service times
+AVERAGE_WEIGHT = 0.1
+
+# The data shared with the worker processes, set when they are forked
+_worker_shared_data = None
 
 def _log_exception(future : Future, job_id : int):
     if future.exception():
         logging.info("Job %d failed with exception: %s", job_id, future.exception())
 
 
+class QueueFullError(RuntimeError):
+    """
+    Raised when a job is rejected because the queue of the task runner is full,
+    or because its endpoint already has as many unfinished jobs as it may have.
+
+    Attributes:
+        endpoint (str): The endpoint at its limit, None if the whole queue is full.
+        retry_after (int): The estimated number of seconds until there is room again.
+    """
+
+    def __init__(self, endpoint: str, retry_after: int):
+        super().__init__(f"Too many {endpoint} jobs" if endpoint else "Job queue full")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def _parse_limits(limits: str) -> dict:
+    """Parses per-endpoint limits written as "endpoint=limit,endpoint=limit"."""
+    return {endpoint.strip(): int(limit) for endpoint, limit in
+            (item.split('=') for item in limits.split(',') if item.strip())}
+
+
+class _SharedData:
+    """
+    Stands for the shared data in the arguments of a job sent to a worker process,
+    which already has its own copy of the data since it was forked.
+    """
+
+def _init_worker(shared_data):
+    global _worker_shared_data  # pylint: disable=global-statement
+    _worker_shared_data = shared_data
+
+def _run_in_worker(task: callable, profile_root: str, *args, **kwargs):
+    # CLOCK_MONOTONIC is shared by all the processes, so the parent can compare it
+    started = time.monotonic()
+    args = tuple(_worker_shared_data if isinstance(arg, _SharedData) else arg for arg in args)
+    stacks = None
+    if profile_root is None:
+        payload = task(*args, **kwargs)
+    else:
+        payload, stacks = profile_call(profile_root, task, *args, **kwargs)
+    return started, time.monotonic(), payload, stacks
+
+
+class _Job:
+    """
+    A job submitted to the task runner, with what is needed to start and complete it.
+    """
+
+    def __init__(self, task: callable, job_id: int, args: tuple, kwargs: dict,
+                 on_result: callable, endpoint: str, cost: int, profiled: bool):
+        self.task = task
+        self.job_id = job_id
+        self.args = args
+        self.kwargs = kwargs
+        self.on_result = on_result
+        self.endpoint = endpoint
+        self.cost = cost
+        self.profiled = profiled
+        self.submitted = time.monotonic()
+        self.future = Future()
+
+
 class ThreadPool:
     """
     A thread pool implementation for executing jobs asynchronously.
 
     The ThreadPool class provides methods for submitting jobs to be executed
     asynchronously and retrieving the status of running and completed jobs.
+    The jobs run on threads, or on forked processes if TP_EXECUTOR is "process",
+    and their results are stored in the result store before they count as done.
 
     Attributes:
-        executor (ThreadPoolExecutor): The ThreadPoolExecutor instance used for
-            executing the jobs.
-        futures (dict): A dictionary that maps job IDs to corresponding Future
-            objects representing the execution of the jobs.
+        result_store (ResultStore): The store receiving the results of the jobs.
+        num_workers (int): The number of threads or processes running the jobs.
+        use_processes (bool): Whether the jobs run on processes instead of threads.
+        shared_data: The object forked into the worker processes, passed to them by
+            reference instead of being pickled with every job.
+        stale_workers (bool): Whether the shared data was replaced since the worker
+            processes were forked, in which case they are forked again before the
+            next job reading it is handed to them.
+        executor (Executor): The ThreadPoolExecutor or ProcessPoolExecutor instance used
+            for executing the jobs.
+        executor_lock (Lock): A lock used to replace the worker processes while jobs
+            are submitted.
+        futures (dict): A dictionary that maps the IDs of the unfinished jobs to
+            the Future objects representing their execution. A job is removed as
+            soon as it finishes, by a callback of its future.
         dict_lock (Lock): A lock used for thread-safe access to the futures dictionary.
-        cleaner (ThreadPoolCleaner): A ThreadPoolCleaner instance responsible for
-            cleaning up completed jobs.
+        done_events (dict): Maps the IDs of the unfinished jobs someone waits for to
+            the Event set when they finish, shared by all their waiters.
+        jobs (JobTable): The state of the last TP_JOB_HISTORY jobs, updated as the jobs
+            complete or are rejected.
+        running (bool): False once the task runner is shut down, after which the
+            process exits as soon as the last job finishes.
+        max_queue (int): The maximum number of unfinished jobs, 0 for no limit.
+        endpoint_limits (dict): The maximum number of unfinished jobs per endpoint.
+        pending (dict): The number of unfinished jobs per endpoint (None for the jobs
+            submitted without one), shared jobs counting once.
+        rejected (int): The number of jobs rejected since the queue was full.
+        wait_time (float): The moving average of the seconds the jobs waited to start.
+        service_time (float): The moving average of the seconds the jobs ran for.
+        dispatched (int): The number of unfinished jobs handed to the executor.
+        metrics (JobMetrics): The histograms of the durations of the phases of the jobs.
+        queue_lock (Lock): A lock used for thread-safe access to the queue counters.
+        scheduler (CostScheduler): The queue ordering the jobs by cost if TP_SCHEDULER
+            is "cost", in which case at most num_workers jobs are handed to the executor
+            at once. None if the jobs run in the order they are submitted.
+        idle_workers (int): The number of jobs the scheduler may still hand to the executor.
+        scheduler_lock (Lock): A lock used for thread-safe access to the scheduler.
+        profiler (JobProfiler): Decides which jobs run under the profiler, a PROFILE_RATE
+            fraction of them by default, and aggregates their stacks.
+        max_waiters (int): The maximum number of threads blocked in wait_job at once,
+            0 for no limit. The WSGI server runs every request on its own thread, so
+            a waiting client holds a request thread but no worker.
+        waiters (int): The number of threads blocked in wait_job.
     """
 
-    def __init__(self):
+    def __init__(self, result_store: ResultStore, shared_data=None,
+                 num_workers: int = None, executor: str = None,
+                 max_queue: int = None, endpoint_limits: dict = None,
+                 scheduler: str = None):
         # Check if TP_NUM_OF_THREADS environment variable is defined
-        if 'TP_NUM_OF_THREADS' in os.environ:
-            num_threads = int(os.environ['TP_NUM_OF_THREADS'])
-        else:
+        if num_workers is None and 'TP_NUM_OF_THREADS' in os.environ:
+            num_workers = int(os.environ['TP_NUM_OF_THREADS'])
+        elif num_workers is None:
             # Use hardware concurrency if TP_NUM_OF_THREADS is not defined
-            num_threads = os.cpu_count()
+            num_workers = os.cpu_count()
+
+        executor = executor or os.environ.get('TP_EXECUTOR', 'thread')
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor: {executor}")
 
-        # Create a ThreadPoolExecutor with the specified number of threads
-        self.executor : ThreadPoolExecutor = ThreadPoolExecutor(max_workers=num_threads)
+        self.result_store = result_store
+        self.num_workers = num_workers
+        self.use_processes = executor == 'process'
+        self.shared_data = shared_data
+        self.stale_workers = False
+        self.executor : Executor = self._create_executor()
+        self.executor_lock : Lock = Lock()
         self.futures : dict = {}
         self.dict_lock : Lock = Lock()
-
-        self.cleaner = ThreadPoolCleaner(self)
-        self.cleaner.start()
-        
+        self.done_events : dict = {}
+        self.jobs = JobTable(int(os.environ.get('TP_JOB_HISTORY', DEFAULT_HISTORY)))
         self.running = True
 
-    def submit(self, task: callable, job_id: int, *args, **kwargs):
+        # Bound the unfinished jobs with TP_MAX_QUEUE, and per endpoint with
+        # TP_ENDPOINT_LIMITS, e.g. "mean_by_category=4,state_mean_by_category=4"
+        if max_queue is None:
+            max_queue = int(os.environ.get('TP_MAX_QUEUE', '0'))
+        if endpoint_limits is None:
+            endpoint_limits = _parse_limits(os.environ.get('TP_ENDPOINT_LIMITS', ''))
+        self.max_queue = max_queue
+        self.endpoint_limits = endpoint_limits
+        self.pending : dict = {}
+        self.rejected = 0
+        self.wait_time = 0.0
+        self.service_time = 0.0
+        self.dispatched = 0
+        self.metrics = JobMetrics()
+        self.queue_lock : Lock = Lock()
+
+        # Run cheap jobs first if TP_SCHEDULER is "cost", delaying a job for at most
+        # TP_SCHED_SLACK times its predicted running time and TP_SCHED_MAX_DELAY seconds
+        scheduler = scheduler or os.environ.get('TP_SCHEDULER', 'fifo')
+        if scheduler not in ('fifo', 'cost'):
+            raise ValueError(f"Unknown scheduler: {scheduler}")
+        self.scheduler = CostScheduler(
+            float(os.environ.get('TP_SCHED_SLACK', DEFAULT_SLACK)),
+            float(os.environ.get('TP_SCHED_MAX_DELAY', DEFAULT_MAX_DELAY))) \
+            if scheduler == 'cost' else None
+        self.idle_workers = num_workers
+        self.scheduler_lock : Lock = Lock()
+        self.profiler = JobProfiler(float(os.environ.get('PROFILE_RATE', '0')))
+
+        # Every long poll holds a request thread, so at most TP_MAX_WAITERS of them block
+        self.max_waiters = int(os.environ.get('TP_MAX_WAITERS', '4096'))
+        self.waiters = 0
+
+    def _create_executor(self) -> Executor:
+        if not self.use_processes:
+            # Create a ThreadPoolExecutor with the specified number of threads
+            return ThreadPoolExecutor(max_workers=self.num_workers)
+        # Forked workers inherit the shared data without it being pickled
+        executor = ProcessPoolExecutor(max_workers=self.num_workers,
+                                       mp_context=multiprocessing.get_context('fork'),
+                                       initializer=_init_worker,
+                                       initargs=(self.shared_data,))
+        # Fork all the workers now, before the webserver starts its threads
+        executor.submit(int).result()
+        return executor
+
+    def _store(self, job_id: int, payload: bytes, on_result: callable):
+        self.result_store.put(job_id, payload)
+        if on_result is not None:
+            on_result(payload)
+
+    def _record_times(self, job: _Job, started: float, computed: float, persisted: float):
+        with self.queue_lock:
+            self.wait_time += AVERAGE_WEIGHT * (started - job.submitted - self.wait_time)
+            self.service_time += AVERAGE_WEIGHT * (computed - started - self.service_time)
+        self.metrics.observe(job.endpoint or 'none', job.submitted, started, computed,
+                             persisted)
+        # The profiled jobs run slower, and would make the scheduler overestimate their cost
+        if self.scheduler is not None and not job.profiled:
+            with self.scheduler_lock:
+                self.scheduler.observe(job.endpoint, job.cost, computed - started)
+
+    def _store_from_worker(self, job: _Job, worker_future: Future):
+        if worker_future.exception() is not None:
+            job.future.set_exception(worker_future.exception())
+            return
+        try:
+            started, computed, payload, stacks = worker_future.result()
+            if stacks is not None:
+                self.profiler.record(job.endpoint or 'none', stacks)
+            self._store(job.job_id, payload, job.on_result)
+            self._record_times(job, started, computed, time.monotonic())
+        except Exception as exception:  # pylint: disable=broad-except
+            job.future.set_exception(exception)
+            return
+        job.future.set_result(None)
+
+    def _complete(self, job: _Job, worker_future: Future):
+        with self.queue_lock:
+            self.dispatched -= 1
+        self._store_from_worker(job, worker_future)
+        if self.scheduler is not None:
+            with self.scheduler_lock:
+                self.idle_workers += 1
+            self._dispatch()
+
+    def _start(self, job: _Job):
+        # Hands a job to the executor, the job is done once its result is stored
+        with self.queue_lock:
+            self.dispatched += 1
+        try:
+            with self.executor_lock:
+                if self.stale_workers and any(isinstance(arg, _SharedData) for arg in job.args):
+                    self._refork()
+                worker_future = self.executor.submit(
+                    _run_in_worker, job.task, (job.endpoint or 'none') if job.profiled else None,
+                    *job.args, **job.kwargs)
+        except BaseException:
+            with self.queue_lock:
+                self.dispatched -= 1
+            raise
+        worker_future.add_done_callback(
+            lambda worker_future: self._complete(job, worker_future))
+
+    def _dispatch(self):
+        # Hands the jobs with the earliest deadlines to the idle workers
+        while True:
+            with self.scheduler_lock:
+                if self.idle_workers == 0 or len(self.scheduler) == 0:
+                    return
+                self.idle_workers -= 1
+                job = self.scheduler.pop()
+            try:
+                self._start(job)
+            except Exception as exception:  # pylint: disable=broad-except
+                job.future.set_exception(exception)
+                with self.scheduler_lock:
+                    self.idle_workers += 1
+
+    def _retry_after(self, pending: int) -> int:
+        # The time the workers take to run the unfinished jobs, at least a second
+        return max(1, math.ceil(pending * self.service_time / self.num_workers))
+
+    def _admit(self, endpoint: str):
+        with self.queue_lock:
+            pending = sum(self.pending.values())
+            if 0 < self.max_queue <= pending:
+                self.rejected += 1
+                raise QueueFullError(None, self._retry_after(pending))
+            limit = self.endpoint_limits.get(endpoint, 0)
+            if 0 < limit <= self.pending.get(endpoint, 0):
+                self.rejected += 1
+                raise QueueFullError(endpoint, self._retry_after(self.pending[endpoint]))
+            self.pending[endpoint] = self.pending.get(endpoint, 0) + 1
+
+    def _release(self, endpoint: str):
+        with self.queue_lock:
+            self.pending[endpoint] -= 1
+
+    def submit(self, task: callable, job_id: int, *args, on_result: callable = None,
+               endpoint: str = None, cost: int = 0, **kwargs):
         """
-        Submits a job to be executed asynchronously.
+        Submits a job to be executed asynchronously. The job is done once the
+        value returned by the task is stored in the result store.
 
         Args:
-            fn (callable): The function to be executed.
+            task (callable): The function to be executed, returning the serialized result.
             job_id (int): The ID of the job.
             *args: Variable length argument list to be passed to the function.
+            on_result (callable, optional): Called with the result once it is stored,
+                before the job is done.
+            endpoint (str, optional): The endpoint of the job, for its limit and its cost.
+            cost (int, optional): The estimated cost of the job, for the scheduler.
             **kwargs: Arbitrary keyword arguments to be passed to the function.
 
         Returns:
-            None
+            Future: The future of the job.
+
+        Raises:
+            QueueFullError: If the queue, or the jobs of the endpoint, are at their limit,
+                in which case the job is recorded as rejected.
         """
-        future = self.executor.submit(task, job_id, *args, **kwargs)
+        try:
+            self._admit(endpoint)
+        except QueueFullError:
+            self.jobs.set(job_id, REJECTED)
+            raise
+        try:
+            if self.use_processes:
+                # Jobs still waiting in the scheduler when the shared data is replaced
+                # run on the workers forked with the new data
+                with self.executor_lock:
+                    args = tuple(_SharedData() if arg is self.shared_data else arg
+                                 for arg in args)
+            job = _Job(task, job_id, args, kwargs, on_result, endpoint, cost,
+                       self.profiler.sample(endpoint))
+            if self.scheduler is None:
+                self._start(job)
+            else:
+                with self.scheduler_lock:
+                    self.scheduler.push(job, job.submitted, endpoint, cost)
+                self._dispatch()
+        except BaseException:
+            self._release(endpoint)
+            raise
+        job.future.add_done_callback(lambda _: self._release(endpoint))
+        self.track(job_id, job.future)
+        return job.future
+
+    def run_inline(self, task: callable, *args, endpoint: str = None, cost: int = 0,
+                   **kwargs):
+        """
+        Runs a job in the calling thread, e.g. a request answered inline. The job counts
+        towards the limits of the queue while it runs, and is recorded in the metrics
+        and profiled like the jobs submitted, but its result is not stored.
+
+        Args:
+            task (callable): The function to be executed, returning the serialized result.
+            *args: Variable length argument list to be passed to the function.
+            endpoint (str, optional): The endpoint of the job, for its limit and its cost.
+            cost (int, optional): The estimated cost of the job, for the scheduler.
+            **kwargs: Arbitrary keyword arguments to be passed to the function.
+
+        Returns:
+            The value returned by the task.
+
+        Raises:
+            QueueFullError: If the queue, or the jobs of the endpoint, are at their limit.
+        """
+        self._admit(endpoint)
+        try:
+            job = _Job(task, None, args, kwargs, None, endpoint, cost,
+                       self.profiler.sample(endpoint))
+            started, computed, payload, stacks = _run_in_worker(
+                task, (endpoint or 'none') if job.profiled else None, *args, **kwargs)
+            if stacks is not None:
+                self.profiler.record(endpoint or 'none', stacks)
+            # Nothing is persisted, the result is sent as soon as it is computed
+            self._record_times(job, started, computed, computed)
+        finally:
+            self._release(endpoint)
+        return payload
+
+    def _refork(self):
+        # Called with the executor lock held. The previous workers finish the jobs
+        # already handed to them and exit
+        previous = self.executor
+        self.executor = self._create_executor()
+        self.stale_workers = False
+        previous.shutdown(wait=False)
+
+    def set_shared_data(self, shared_data):
+        """
+        Replaces the shared data, e.g. when the dataset is reloaded or appended to.
+
+        With worker processes, the workers only see the data they were forked with, so
+        new workers are forked with the new data, while the previous ones finish the
+        jobs already handed to them with the previous data and exit. Forking all the
+        workers costs about as much as a reload, whatever the size of the change, so
+        it is deferred until the next job reading the shared data is started: a burst
+        of appends costs one fork, and appends with no request in between none.
+        The fork happens while the webserver runs its threads, which is safe for the
+        workers since they only run the tasks (the logging locks are reset at fork).
+
+        Args:
+            shared_data: The new object shared with the workers.
+        """
+        if not self.use_processes:
+            self.shared_data = shared_data
+            return
+        with self.executor_lock:
+            self.shared_data = shared_data
+            self.stale_workers = True
+
+    def track(self, job_id: int, future: Future):
+        """
+        Registers a job whose result is stored by another job, e.g. a request sharing
+        the job of an identical one. The job is done when the future is.
+
+        Args:
+            job_id (int): The ID of the job.
+            future (Future): The future of the job storing the result.
+        """
+        self.jobs.set(job_id, RUNNING)
         with self.dict_lock:
             self.futures[job_id] = future
+        future.add_done_callback(lambda future: self._finish(job_id, future))
+
+    def _finish(self, job_id: int, future: Future):
+        # Called by the future as soon as the job is done
+        _log_exception(future, job_id)
+        self.jobs.set(job_id, FAILED if future.exception() is not None else DONE)
+        with self.dict_lock:
+            if self.futures.get(job_id) is future:
+                del self.futures[job_id]
+            done_event = self.done_events.pop(job_id, None)
+            idle = not self.futures
+        if done_event is not None:
+            done_event.set()
+        if idle and not self.running:
+            _exit()
+
+    def complete(self, job_id: int):
+        """
+        Registers a job whose result was stored without running a task, e.g. a request
+        answered from the memo.
+
+        Args:
+            job_id (int): The ID of the job.
+        """
+        self.jobs.set(job_id, DONE)
+
+    def queue_stats(self) -> dict:
+        """
+        Returns the depth of the queue, its limits and the average wait and service times.
+        """
+        with self.queue_lock:
+            pending = sum(self.pending.values())
+            return {'depth': pending, 'max_queue': self.max_queue,
+                    'endpoints': {endpoint: count for endpoint, count in self.pending.items()
+                                  if endpoint is not None and count > 0},
+                    'endpoint_limits': self.endpoint_limits, 'rejected': self.rejected,
+                    'workers': self.num_workers,
+                    # With jobs queued in the executor, all of its workers are busy
+                    'active_workers': min(self.dispatched, self.num_workers),
+                    'wait_ms': self.wait_time * 1000,
+                    'service_ms': self.service_time * 1000,
+                    'retry_after': self._retry_after(pending),
+                    'scheduler': 'fifo' if self.scheduler is None else 'cost',
+                    'scheduled': 0 if self.scheduler is None else len(self.scheduler),
+                    'waiters': self.waiters, 'max_waiters': self.max_waiters}
 
     def get_jobs(self, max_jobs: int) -> dict:
         """
-        Retrieve the status of the running and completed jobs.
+        Retrieve the status of the running and completed jobs, from the job table
+        instead of the futures, so that the futures stay unlocked meanwhile. Only the
+        last TP_JOB_HISTORY job IDs are listed, without the rejected jobs.
 
         Args:
             max_jobs (int): The maximum number of jobs to retrieve.
@@ -79,17 +500,7 @@ class ThreadPool:
                     The keys are in the format "job_id_{job_id}"
                     and the values are either "running" or "done".
         """
-        result: dict = {}
-        with self.dict_lock:
-            for job_id in range(1, max_jobs):
-                if job_id in self.futures and not self.futures[job_id].done():
-                    result[f"job_id_{job_id}"] = "running"
-                else:
-                    result[f"job_id_{job_id}"] = "done"
-                    if job_id in self.futures:
-                        _log_exception(self.futures[job_id], job_id)
-                        self.futures.pop(job_id)
-        return result
+        return self.jobs.legacy_states(max_jobs)
 
     def check_job(self, job_id : int) -> bool:
         """
@@ -102,59 +513,58 @@ class ThreadPool:
             bool: True if the job is completed or not found, False otherwise.
         """
         with self.dict_lock:
-            if job_id not in self.futures or self.futures[job_id].done():
-                if job_id in self.futures:
-                    _log_exception(self.futures[job_id], job_id)
-                    self.futures.pop(job_id)
-                return True
-        return False
+            future = self.futures.get(job_id)
+        # The job may be done before its callback removed it
+        return future is None or future.done()
 
-    def shutdown(self):
+    def wait_job(self, job_id : int, timeout : float) -> bool:
         """
-        Shuts down the task runner by stopping the executor and joining the cleaner thread.
-        """
-        self.executor.shutdown()
-        self.running = False
-
-
-class ThreadPoolCleaner(Thread):
-    """
-    A class that represents a thread responsible for cleaning up completed futures in a ThreadPool.
-
-    Attributes:
-        thread_pool (ThreadPool): The ThreadPool instance associated with this cleaner thread.
-    """
+        Blocks until the job with the given job_id completes or the timeout expires.
+        All the waiters of a job wait on one Event, set when the job finishes, and the
+        dict_lock is only held to look the job up. Once max_waiters threads are
+        blocked, it returns at once instead of blocking.
 
-    def __init__(self, thread_pool: ThreadPool):
-        super().__init__()
-        self.thread_pool = thread_pool
+        Args:
+            job_id (int): The ID of the job to wait for.
+            timeout (float): The maximum number of seconds to wait.
 
-    def run(self):
+        Returns:
+            bool: True if the job is completed or not found, False otherwise.
         """
-        The main method that runs the thread.
+        with self.queue_lock:
+            if 0 < self.max_waiters <= self.waiters:
+                return self.check_job(job_id)
+            self.waiters += 1
+        try:
+            with self.dict_lock:
+                if job_id not in self.futures:
+                    return True
+                # Set by _finish, which removes the job under the same lock
+                done_event = self.done_events.setdefault(job_id, Event())
+            return done_event.wait(timeout)
+        finally:
+            with self.queue_lock:
+                self.waiters -= 1
 
-        This method continuously sleeps for a specified interval and then calls
-        the `cleanup_futures` method to remove completed futures from the thread pool.
+    def shutdown(self):
         """
-        while True:
-            time.sleep(CLEANUP_INTERVAL)
-            self.cleanup_futures()
-            if not self.thread_pool.running and len(self.thread_pool.futures) == 0:
-                logging.info("All jobs completed. Exiting.")
-                os._exit(0)
-
-    def cleanup_futures(self):
+        Shuts down the task runner: waits for the submitted jobs, then exits the process
+        as soon as no job is left, including the jobs of replaced worker processes.
         """
-        Removes completed futures from the thread pool.
+        # The jobs still in the scheduler are handed to the executor as others complete
+        with self.dict_lock:
+            futures = list(self.futures.values())
+        wait(futures)
+        self.executor.shutdown()
+        self.running = False
+        with self.dict_lock:
+            idle = not self.futures
+        if idle:
+            _exit()
 
-        This method iterates over the futures in the thread pool and removes
-        any futures that have completed.
 
-        If a completed future is found, it logs the exception associated with
-        the future and removes it from the pool.
-        """
-        with self.thread_pool.dict_lock:
-            for job_id, future in list(self.thread_pool.futures.items()):
-                if future.done():
-                    _log_exception(future, job_id)
-                    self.thread_pool.futures.pop(job_id)
+def _exit():
+    logging.info("All jobs completed. Exiting.")
+    # os._exit skips the exit handlers, so the queued log records are written first
+    stop_logging()
+    os._exit(0)
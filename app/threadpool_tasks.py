@@ -3,101 +3,175 @@ A module that contains functions for performing data analysis tasks.
 The functions in this module are intended to be executed asynchronously
 """
 
-import json
-import os
+import copy
 
-from app.data_ingestor import DataIngestor
+import numpy as np
+
+from app.aggregate_cube import AggregateCube
+from app.data_ingestor import DataIngestor, STATE_COL, CATEGORY_COL, STRAT_COL
+from app.result_store import encode_result
 
-RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
 INVALID_QUESTION = {"error": "Invalid question"}
 INVALID_STATE = {"error": "Invalid state"}
+INVALID_ENDPOINT = {"error": "Invalid endpoint"}
+INVALID_BATCH = {"error": "Invalid batch"}
+
+def _separate_data_per_column(rows : np.ndarray, data_ingestor : DataIngestor, column) -> dict:
+    codes = data_ingestor.codes[column][rows]
+    unique_codes, first_rows, inverse = np.unique(codes, return_index=True, return_inverse=True)
+    # Group the rows by code, keeping the original row order inside every group
+    grouped_rows = rows[np.argsort(inverse, kind='stable')]
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(unique_codes)))[:-1]
+    groups = np.split(grouped_rows, bounds)
+    labels = data_ingestor.labels[column]
+    # Keep groups in order of first appearance, like the rows in the CSV
+    return {labels[unique_codes[i]]: groups[i] for i in np.argsort(first_rows)}
+
+def _get_mean(rows : np.ndarray, data_ingestor : DataIngestor) -> float:
+    values = data_ingestor.values[rows]
+    valid_data = values[~np.isnan(values)]
+    return float(valid_data.mean()) if valid_data.size else float('NaN')
+
+# The helpers below answer from the aggregate cube when the data ingestor has one
+# and from the rows otherwise.
+
+def _get_global_mean(question : str, data_ingestor : DataIngestor) -> float:
+    if data_ingestor.cube is not None:
+        return data_ingestor.cube.global_mean(question)
+    return _get_mean(data_ingestor.get_data_for_question(question), data_ingestor)
+
+def _get_state_means(question : str, data_ingestor : DataIngestor) -> dict:
+    if data_ingestor.cube is not None:
+        return data_ingestor.cube.state_means(question)
+    return {state: _get_mean(rows, data_ingestor) \
+            for state, rows in data_ingestor.get_data_per_state(question).items()}
+
+def _get_state_mean(question : str, state : str, data_ingestor : DataIngestor) -> float:
+    if data_ingestor.cube is not None:
+        return data_ingestor.cube.state_mean(question, state)
+    rows = data_ingestor.get_data_per_state(question).get(state)
+    return _get_mean(rows, data_ingestor) if rows is not None else None
+
+def _get_category_means(question : str, state : str, data_ingestor : DataIngestor) -> dict:
+    if data_ingestor.cube is not None:
+        return data_ingestor.cube.category_means(question, state)
+    rows = data_ingestor.get_data_per_state(question).get(state)
+    if rows is None:
+        return None
+    return {strat: (data_ingestor.label_of(CATEGORY_COL, strat_rows[0]), \
+            _get_mean(strat_rows, data_ingestor)) \
+            for strat, strat_rows in _separate_data_per_column(rows, data_ingestor,
+                                                                STRAT_COL).items()}
 
-STATE_COL = 'LocationDesc'
-CATEGORY_COL = 'StratificationCategory1'
-STRAT_COL = 'Stratification1'
-DATA_COL = 'Data_Value'
+def _check_valid_question(data : dict, data_ingestor : DataIngestor) -> bool:
+    return isinstance(data, dict) and 'question' in data and \
+            (data['question'] in data_ingestor.questions_best_is_min or \
+            data['question'] in data_ingestor.questions_best_is_max)
 
-def _separate_data_per_column(data : list, column) -> dict:
-    state_data = {}
-    for row in data:
-        location_desc = row.get(column)
-        if location_desc not in state_data:
-            state_data[location_desc] = []
-        state_data[location_desc].append(row)
-    return state_data
+def _check_valid_state(data : dict) -> bool:
+    # States that are not strings match no rows, and may not even be hashable
+    return isinstance(data.get('state'), str)
 
-def _get_mean(data : list, column : str = DATA_COL) -> float:
-    valid_data = [float(row.get(column)) for row in data if row.get(column) != '']
-    return sum(valid_data) / len(valid_data) if valid_data else float('NaN')
+def _check_valid_spec(spec) -> bool:
+    return isinstance(spec, dict) and spec.get('endpoint') in ENDPOINT_TASKS
 
-def _check_valid_question(data : dict, data_ingestor : DataIngestor) -> bool:
-    return 'question' in data and (data['question'] in data_ingestor.questions_best_is_min or \
-            data['question'] in data_ingestor.questions_best_is_max)
 
-def _write_result(job_id : int, result : dict):
-    os.makedirs(RESULTS_DIR, exist_ok=True)
-    with open(os.path.join(RESULTS_DIR, f"{job_id}"), 'w', encoding='utf-8') as file:
-        file.write(json.dumps(result))
 
+def estimate_cost(endpoint: str, data: dict, data_ingestor: DataIngestor) -> int:
+    """
+    Estimates the cost of a request as the number of values its task reads:
+    rows when computing from the rows, groups when answering from the aggregate cube.
 
-def states_mean(job_id: int, data: dict, data_ingestor: DataIngestor):
+    Args:
+        endpoint (str): The name of the endpoint, a key of ENDPOINT_TASKS.
+        data (dict): The data of the request.
+        data_ingestor (DataIngestor): An instance of the DataIngestor class.
+
+    Returns:
+        int: The estimated cost, 0 for requests answered with an error.
+    """
+    if endpoint == 'batch':
+        return sum(estimate_cost(spec['endpoint'], spec, data_ingestor) \
+                   for spec in data if _check_valid_spec(spec)) \
+                if isinstance(data, list) else 0
+    if not isinstance(data, dict) or not _check_valid_question(data, data_ingestor):
+        return 0
+    question = data['question']
+    state = data.get('state') if _check_valid_state(data) else None
+    if data_ingestor.cube is not None:
+        if endpoint in ('global_mean', 'state_mean', 'state_diff_from_mean'):
+            return 1
+        category_totals = data_ingestor.cube.category_totals.get(question, {})
+        if endpoint == 'state_mean_by_category':
+            return len(category_totals.get(state, ()))
+        if endpoint == 'mean_by_category':
+            return sum(len(strats) for strats in category_totals.values())
+        return len(category_totals)
+    if endpoint in ('state_mean', 'state_mean_by_category'):
+        return len(data_ingestor.get_data_for_question_state(question, state))
+    return len(data_ingestor.get_data_for_question(question))
+
+
+def run_task(task: callable, data: dict, data_ingestor: DataIngestor, *args) -> bytes:
+    """
+    Runs one of the tasks of this module and serializes its result.
+
+    Args:
+        task (callable): The task to run.
+        data (dict): The data of the request.
+        data_ingestor (DataIngestor): An instance of the DataIngestor class.
+        *args: Additional arguments to be passed to the task.
+
+    Returns:
+        bytes: The result serialized as JSON.
+    """
+    return encode_result(task(data, data_ingestor, *args))
+
+
+def states_mean(data: dict, data_ingestor: DataIngestor) -> dict:
     """
     Calculate the mean value for each state in the given data.
-    Writes result to a file with the job_id as the filename.
 
     Args:
-        job_id (int): The ID of the job.
         data (dict): The data containing the question and relevant information.
         data_ingestor (DataIngestor): An instance of the DataIngestor class.
 
     Returns:
-        None
+        dict: The mean of every state, sorted by mean.
     """
-    if _check_valid_question(data, data_ingestor):
-        question = data['question']
-        relevant_data = data_ingestor.get_data_for_question(question)
-        data_per_state = _separate_data_per_column(relevant_data, STATE_COL)
-        state_means = {state: _get_mean(data) for state, data in data_per_state.items()}
-        state_means = {k: v for k, v in sorted(state_means.items(), key=lambda item: item[1])}
-        _write_result(job_id, state_means)
-    else:
-        _write_result(job_id, INVALID_QUESTION)
-
-
-def state_mean(job_id: int, data: dict, data_ingestor: DataIngestor):
+    if not _check_valid_question(data, data_ingestor):
+        return INVALID_QUESTION
+    state_means = _get_state_means(data['question'], data_ingestor)
+    return {k: v for k, v in sorted(state_means.items(), key=lambda item: item[1])}
+
+
+def state_mean(data: dict, data_ingestor: DataIngestor) -> dict:
     """
     Calculate the mean of a specific state's data for a given question.
-    Writes result to a file with the job_id as the filename.
 
     Parameters:
-    - job_id (int): The ID of the job.
     - data (dict): The data dictionary containing the question and state.
     - data_ingestor (DataIngestor): An instance of the DataIngestor class.
 
     Returns:
-    None
+    dict: The mean of the state.
     """
-    if _check_valid_question(data, data_ingestor) and 'state' in data:
-        question = data['question']
-        state = data['state']
-        relevant_data = data_ingestor.get_data_for_question(question)
-        data_per_state = _separate_data_per_column(relevant_data, STATE_COL)
-
-        if state not in data_per_state:
-            _write_result(job_id, INVALID_STATE)
-        result = {state: _get_mean(data_per_state[state])}
-        _write_result(job_id, result)
-    else:
-        _write_result(job_id, INVALID_QUESTION)
-
-
-def top(job_id: int, data: dict, data_ingestor: DataIngestor, best: bool, num_top_states: int = 5):
+    if not _check_valid_question(data, data_ingestor) or 'state' not in data:
+        return INVALID_QUESTION
+    if not _check_valid_state(data):
+        return INVALID_STATE
+    state = data['state']
+    mean = _get_state_mean(data['question'], state, data_ingestor)
+    if mean is None:
+        return INVALID_STATE
+    return {state: mean}
+
+
+def top(data: dict, data_ingestor: DataIngestor, best: bool, num_top_states: int = 5) -> dict:
     """
     Retrieves the top states based on the mean value of the data for a given question.
-    Writes result to a file with the job_id as the filename.
 
     Args:
-        job_id (int): The ID of the job.
         data (dict): The data dictionary containing the question and relevant data.
         data_ingestor (DataIngestor): An instance of the DataIngestor class.
         best (bool): Flag indicating whether the top states should be based on the highest
@@ -105,157 +179,175 @@ def top(job_id: int, data: dict, data_ingestor: DataIngestor, best: bool, num_to
         num_top_states (int, optional): The number of top states to retrieve. Defaults to 5.
 
     Returns:
-        None
+        dict: The means of the top states.
     """
-    if _check_valid_question(data, data_ingestor):
-        question = data['question']
-        relevant_data = data_ingestor.get_data_for_question(question)
-        data_per_state = _separate_data_per_column(relevant_data, STATE_COL)
-        state_means = {state: _get_mean(data) for state, data in data_per_state.items()}
-        # Sort states by mean
-        order = question in data_ingestor.questions_best_is_max  \
-                if best else question in data_ingestor.questions_best_is_min
-        sorted_states = sorted(state_means, key=state_means.get, reverse=order)
-        result = {state: state_means[state] for state in sorted_states[:num_top_states]}
-        _write_result(job_id, result)
-    else:
-        _write_result(job_id, INVALID_QUESTION)
-
-
-def global_mean(job_id: int, data: dict, data_ingestor: DataIngestor):
+    if not _check_valid_question(data, data_ingestor):
+        return INVALID_QUESTION
+    question = data['question']
+    state_means = _get_state_means(question, data_ingestor)
+    # Sort states by mean
+    order = question in data_ingestor.questions_best_is_max  \
+            if best else question in data_ingestor.questions_best_is_min
+    sorted_states = sorted(state_means, key=state_means.get, reverse=order)
+    return {state: state_means[state] for state in sorted_states[:num_top_states]}
+
+
+def global_mean(data: dict, data_ingestor: DataIngestor) -> dict:
     """
-    Calculate the global mean for a given question and write the result.
-    Writes result to a file with the job_id as the filename.
+    Calculate the global mean for a given question.
 
     Parameters:
-    job_id (int): The ID of the job.
     data (dict): The data containing the question.
     data_ingestor (DataIngestor): The data ingestor object.
 
     Returns:
-    None
+    dict: The global mean.
     """
-    if _check_valid_question(data, data_ingestor):
-        question = data['question']
-        relevant_data = data_ingestor.get_data_for_question(question)
-        mean = _get_mean(relevant_data)
-        _write_result(job_id, {"global_mean": mean})
-    else:
-        _write_result(job_id, INVALID_QUESTION)
+    if not _check_valid_question(data, data_ingestor):
+        return INVALID_QUESTION
+    return {"global_mean": _get_global_mean(data['question'], data_ingestor)}
 
 
-def diff_from_mean(job_id: int, data: dict, data_ingestor: DataIngestor):
+def diff_from_mean(data: dict, data_ingestor: DataIngestor) -> dict:
     """
     Calculate the difference from the mean for each state in the given data.
-    Writes result to a file with the job_id as the filename.
 
     Parameters:
-    - job_id (int): The ID of the job.
     - data (dict): The data containing the question and relevant information.
     - data_ingestor (DataIngestor): An instance of the DataIngestor class.
 
     Returns:
-    None
+    dict: The difference between the global mean and the mean of every state.
     """
-    if _check_valid_question(data, data_ingestor):
-        question = data['question']
-        relevant_data = data_ingestor.get_data_for_question(question)
-        data_per_state = _separate_data_per_column(relevant_data, STATE_COL)
-        mean_global = _get_mean(relevant_data)
-        diff = {state: (mean_global - _get_mean(data)) for state, data in data_per_state.items()}
-        _write_result(job_id, diff)
-    else:
-        _write_result(job_id, INVALID_QUESTION)
-
-
-def state_diff_from_mean(job_id: int, data: dict, data_ingestor: DataIngestor):
+    if not _check_valid_question(data, data_ingestor):
+        return INVALID_QUESTION
+    question = data['question']
+    mean_global = _get_global_mean(question, data_ingestor)
+    return {state: (mean_global - mean) \
+            for state, mean in _get_state_means(question, data_ingestor).items()}
+
+
+def state_diff_from_mean(data: dict, data_ingestor: DataIngestor) -> dict:
     """
     Calculates the difference between the mean of a specific state's data and the global mean.
-    Writes result to a file with the job_id as the filename.
 
     Parameters:
-    - job_id (int): The ID of the job.
     - data (dict): The data dictionary containing the question and state.
     - data_ingestor (DataIngestor): An instance of the DataIngestor class.
 
     Returns:
-    None
+    dict: The difference between the global mean and the mean of the state.
     """
-    if _check_valid_question(data, data_ingestor) and 'state' in data:
-        question = data['question']
-        state = data['state']
-        relevant_data = data_ingestor.get_data_for_question(question)
-        data_per_state = _separate_data_per_column(relevant_data, STATE_COL)
-        mean_global = _get_mean(relevant_data)
-        if state not in data_per_state:
-            _write_result(job_id, INVALID_STATE)
-            return
-        diff = mean_global - _get_mean(data_per_state[state])
-        _write_result(job_id, {state: diff})
-    else:
-        _write_result(job_id, INVALID_QUESTION)
-
-
-def mean_by_category(job_id : int, data : dict, data_ingestor : DataIngestor):
+    if not _check_valid_question(data, data_ingestor) or 'state' not in data:
+        return INVALID_QUESTION
+    if not _check_valid_state(data):
+        return INVALID_STATE
+    question = data['question']
+    state = data['state']
+    mean = _get_state_mean(question, state, data_ingestor)
+    if mean is None:
+        return INVALID_STATE
+    return {state: _get_global_mean(question, data_ingestor) - mean}
+
+
+def mean_by_category(data : dict, data_ingestor : DataIngestor) -> dict:
     """
     Calculate the mean value for each category in the given data, grouped by state
         and stratification value.
-    Writes result to a file with the job_id as the filename.
 
     Parameters:
-    - job_id (int): The ID of the job.
     - data (dict): The data dictionary containing the question and relevant data.
     - data_ingestor (DataIngestor): An instance of the DataIngestor class.
 
     Returns:
-    None
+    dict: The mean of every (state, category, stratification value).
     """
-    if _check_valid_question(data, data_ingestor):
-        question = data['question']
-        relevant_data = data_ingestor.get_data_for_question(question)
-
-        data_per_state = _separate_data_per_column(relevant_data, STATE_COL)
-        date_per_state_per_category = {state: _separate_data_per_column(data, STRAT_COL) \
-                for state, data in data_per_state.items()}
-
-        result = {f'(\'{state_name}\', \'{data[0][CATEGORY_COL]}\', \'{stratication_value}\')' \
-                : _get_mean(data) \
-                for state_name, state_data in date_per_state_per_category.items() \
-                for stratication_value, data in state_data.items() if stratication_value != ''}
-        _write_result(job_id, result)
-    else:
-        _write_result(job_id, INVALID_QUESTION)
+    if not _check_valid_question(data, data_ingestor):
+        return INVALID_QUESTION
+    question = data['question']
+    return {f'(\'{state_name}\', \'{category}\', \'{stratication_value}\')' : mean \
+            for state_name in data_ingestor.get_data_per_state(question) \
+            for stratication_value, (category, mean) \
+            in _get_category_means(question, state_name, data_ingestor).items() \
+            if stratication_value != ''}
 
 
-def state_mean_by_category(job_id: int, data: dict, data_ingestor: DataIngestor):
+def state_mean_by_category(data: dict, data_ingestor: DataIngestor) -> dict:
     """
     Calculate the mean value for each category in a specific state.
-    Writes result to a file with the job_id as the filename.
 
     Args:
-        job_id (int): The ID of the job.
         data (dict): The data containing the question and state.
         data_ingestor (DataIngestor): An instance of the DataIngestor class.
 
     Returns:
-        None
+        dict: The mean of every (category, stratification value) of the state.
+    """
+    if not _check_valid_question(data, data_ingestor) or 'state' not in data:
+        return INVALID_QUESTION
+    if not _check_valid_state(data):
+        return INVALID_STATE
+    state = data['state']
+    category_means = _get_category_means(data['question'], state, data_ingestor)
+    if category_means is None:
+        return INVALID_STATE
+
+    result = {f'(\'{category}\', \'{stratication_value}\')' : mean \
+            for stratication_value, (category, mean) in category_means.items()
+            if stratication_value != ''}
+
+    sorted_result = {k: result[k] for k in sorted(result)}
+
+    return {state: sorted_result}
+
+
+def batch(data: list, data_ingestor: DataIngestor) -> list:
+    """
+    Answers a list of requests to the other endpoints. Unless the data ingestor already
+    has an aggregate cube, the values of all the questions of the batch are summarized
+    in one pass over their rows, from which every request is answered.
+
+    Args:
+        data (list): The requests, dictionaries with the name of the endpoint under
+            "endpoint" and the data of the request (question, state).
+        data_ingestor (DataIngestor): An instance of the DataIngestor class.
+
+    Returns:
+        list: The result of every request, in the order of the requests.
     """
-    if _check_valid_question(data, data_ingestor) and 'state' in data:
-        question = data['question']
-        relevant_data = data_ingestor.get_data_for_question(question)
-        state = data['state']
-        data_per_state = _separate_data_per_column(relevant_data, STATE_COL)
-        if state not in data_per_state:
-            _write_result(job_id, INVALID_STATE)
-            return
-        date_per_category = _separate_data_per_column(data_per_state[state], STRAT_COL)
-
-        result = {f'(\'{data[0][CATEGORY_COL]}\', \'{stratication_value}\')' : _get_mean(data) \
-                for stratication_value, data in date_per_category.items()
-                if stratication_value != ''}
-
-        sorted_result = {k: result[k] for k in sorted(result)}
-
-        _write_result(job_id, {state: sorted_result})
-    else:
-        _write_result(job_id, INVALID_QUESTION)
+    if not isinstance(data, list):
+        return INVALID_BATCH
+    if data_ingestor.cube is None:
+        questions = {spec['question'] for spec in data \
+                     if _check_valid_spec(spec) and _check_valid_question(spec, data_ingestor)}
+        if questions:
+            rows = np.sort(np.concatenate([data_ingestor.get_data_for_question(question) \
+                                           for question in questions]))
+            # A view of the data ingestor answering from the cube of the batch
+            data_ingestor = copy.copy(data_ingestor)
+            data_ingestor.cube = AggregateCube(data_ingestor, rows)
+    results = []
+    for spec in data:
+        if not _check_valid_spec(spec):
+            results.append(INVALID_ENDPOINT)
+            continue
+        task, args = ENDPOINT_TASKS[spec['endpoint']]
+        results.append(task(spec, data_ingestor, *args))
+    return results
+
+
+# Maps the name of every endpoint to its task and the additional arguments it takes
+ENDPOINT_TASKS = {
+    'states_mean': (states_mean, ()),
+    'state_mean': (state_mean, ()),
+    'best5': (top, (True,)),
+    'worst5': (top, (False,)),
+    'global_mean': (global_mean, ()),
+    'diff_from_mean': (diff_from_mean, ()),
+    'state_diff_from_mean': (state_diff_from_mean, ()),
+    'mean_by_category': (mean_by_category, ()),
+    'state_mean_by_category': (state_mean_by_category, ()),
+}
+
+# The tasks of all the routes: the endpoints above and the batch of requests to them
+REQUEST_TASKS = {**ENDPOINT_TASKS, 'batch': (batch, ())}
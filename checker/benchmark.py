@@ -0,0 +1,44 @@
+"""
+Micro-benchmarks for the data ingestor and the tasks executed by the webserver.
+
+Every benchmark is a script of its own under checker/benchmarks, which this one runs
+by name. Run from the root of the repository, like the checker:
+    python checker/benchmark.py ingest [csv_path]
+    python checker/benchmark.py scaling [csv_path] [--factors 1,10,100]
+    python checker/benchmark.py poll [csv_path]
+    python checker/benchmark.py executor [csv_path] [--workers 1,2,4] [--jobs 200]
+    python checker/benchmark.py shared [csv_path] [--workers 1,2,4]
+    python checker/benchmark.py startup [csv_path]
+    python checker/benchmark.py batch [csv_path]
+    python checker/benchmark.py append [csv_path] [--delta 100]
+    python checker/benchmark.py memory [csv_path] [--factors 1,10] [--chunk-rows 100000]
+    python checker/benchmark.py parallel [csv_path] [--factors 10] [--workers 1,2,4]
+    python checker/benchmark.py jobs [--job-counts 10000,100000,1000000]
+    python checker/benchmark.py locks [csv_path] [--duration 6]
+    python checker/benchmark.py mixed [csv_path] [--jobs 2000] [--heavy 0.2] [--load 0.7]
+    python checker/benchmark.py logging [csv_path] [--jobs 2000]
+    python checker/benchmark.py synthetic [csv_path] [--factors 1,10,100]
+    python checker/benchmark.py profiler [csv_path]
+"""
+
+import argparse
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+# pylint: disable=wrong-import-position
+import bench_common
+
+BENCHMARKS = ('ingest', 'scaling', 'poll', 'executor', 'shared', 'startup', 'batch', 'append',
+              'memory', 'parallel', 'jobs', 'locks', 'mixed', 'logging', 'synthetic',
+              'profiler')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('benchmark', choices=BENCHMARKS)
+    arguments, rest = parser.parse_known_args()
+    benchmark = importlib.import_module(f"bench_{arguments.benchmark}")
+    bench_common.main(benchmark.__doc__, benchmark.run,
+                      getattr(benchmark, 'add_arguments', None), rest)
@@ -0,0 +1,54 @@
+"""
+Compares appending small deltas to the dataset with parsing it again after each one.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_append.py [csv_path] [--delta 100]
+"""
+
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+# bench_common puts the repository on the import path
+from bench_common import main, timeit
+# pylint: disable=wrong-import-position,wrong-import-order
+from app.aggregate_cube import AggregateCube
+from app.data_ingestor import DataIngestor
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the benchmark."""
+    parser.add_argument('--delta', type=int, default=100, help="number of rows per delta")
+
+
+def run(arguments: argparse.Namespace):
+    """Compares appending small deltas to the dataset with parsing it again after each one."""
+    with open(arguments.csv_path, 'r', newline='', encoding='utf-8') as file:
+        rows = list(csv.reader(file))
+    header, rows = rows[0], rows[1:]
+    num_deltas, delta_size = 50, arguments.delta
+    base = rows[:len(rows) - num_deltas * delta_size]
+    deltas = [rows[len(base) + i * delta_size:len(base) + (i + 1) * delta_size]
+              for i in range(num_deltas)]
+
+    with tempfile.TemporaryDirectory() as temporary:
+        csv_copy = os.path.join(temporary, 'data.csv')
+        with open(csv_copy, 'w', newline='', encoding='utf-8') as file:
+            csv.writer(file).writerows([header] + base)
+        ingestor = DataIngestor(csv_copy)
+        ingestor.cube = AggregateCube(ingestor)
+        reparse = timeit(lambda: AggregateCube(DataIngestor(csv_copy)), 3)
+
+    start = time.perf_counter()
+    for delta in deltas:
+        ingestor = ingestor.append(delta, header)
+    append = (time.perf_counter() - start) * 1000 / num_deltas
+
+    print(f"{len(base)} rows, {num_deltas} deltas of {delta_size} rows")
+    print(f"reparse + cube: {reparse:.2f} ms per delta, append: {append:.3f} ms per delta")
+
+
+if __name__ == '__main__':
+    main(__doc__, run, add_arguments)
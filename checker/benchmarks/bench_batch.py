@@ -0,0 +1,46 @@
+"""
+Compares a dashboard refresh sent as separate requests with the same refresh batched.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_batch.py [csv_path]
+"""
+
+import argparse
+from concurrent.futures import wait
+
+# bench_common puts the repository on the import path
+from bench_common import main, sample_request, timeit
+# pylint: disable=wrong-import-position,wrong-import-order
+from app import threadpool_tasks
+from app.data_ingestor import DataIngestor
+from app.result_store import MemoryResultStore
+from app.task_runner import ThreadPool
+
+
+def run(arguments: argparse.Namespace):
+    """Compares a dashboard refresh sent as separate requests with the same refresh batched."""
+    ingestor = DataIngestor(arguments.csv_path)
+    state = sample_request(ingestor)['state']
+    questions = ingestor.questions_best_is_min + ingestor.questions_best_is_max
+    specs = [{'endpoint': endpoint, 'question': question, 'state': state}
+             for question in questions for endpoint in threadpool_tasks.ENDPOINT_TASKS]
+    jobs = [(*threadpool_tasks.ENDPOINT_TASKS[spec['endpoint']], spec) for spec in specs]
+
+    def submitted(pool: ThreadPool, jobs: list):
+        wait([pool.submit(threadpool_tasks.run_task, job_id, task, data, ingestor, *args)
+              for job_id, (task, args, data) in enumerate(jobs, start=1)])
+
+    pool = ThreadPool(MemoryResultStore(), ingestor, executor='thread')
+    print(f"{len(specs)} requests ({len(questions)} questions x "
+          f"{len(threadpool_tasks.ENDPOINT_TASKS)} endpoints)")
+    print(f"{'mode':<12}{'tasks ms':>10}{'jobs ms':>10}")
+    print(f"{'separate':<12}"
+          f"{timeit(lambda: [task(data, ingestor, *args) for task, args, data in jobs], 5):>10.2f}"
+          f"{timeit(lambda: submitted(pool, jobs), 5):>10.2f}")
+    print(f"{'batch':<12}{timeit(lambda: threadpool_tasks.batch(specs, ingestor), 5):>10.2f}"
+          f"{timeit(lambda: submitted(pool, [(threadpool_tasks.batch, (), specs)]), 5):>10.2f}")
+    pool.executor.shutdown()
+
+
+if __name__ == '__main__':
+    main(__doc__, run)
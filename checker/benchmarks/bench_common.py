@@ -0,0 +1,112 @@
+"""
+The helpers shared by the benchmarks: puts the repository and the checker scripts on the
+import path, times the code the benchmarks compare and measures its memory, and parses
+the command line of every benchmark.
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for path in (ROOT, os.path.join(ROOT, 'checker')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# pylint: disable=wrong-import-position
+from app.data_ingestor import DataIngestor, STATE_COL
+
+DEFAULT_CSV = "./nutrition_activity_obesity_usa_subset.csv"
+REPEATS = 20
+# Powers of two up to the number of CPUs
+DEFAULT_WORKERS = ','.join(str(2**i) for i in range((os.cpu_count() or 1).bit_length()))
+
+
+def measure(build: callable) -> tuple:
+    """Returns the built object, the time it took, its retained and its peak memory."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, elapsed, retained, peak
+
+
+def timeit(func: callable, repeats: int = REPEATS) -> float:
+    """Returns the mean duration of func in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def sample_request(data_ingestor: DataIngestor) -> dict:
+    """Returns a request for the first question and the state of its first row."""
+    question = data_ingestor.questions_best_is_min[0]
+    rows = data_ingestor.get_data_for_question(question)
+    state = data_ingestor.label_of(STATE_COL, rows[0]) if len(rows) else ''
+    return {'question': question, 'state': state}
+
+
+def replicate(csv_path: str, factor: int, directory: str) -> str:
+    """Writes a copy of the CSV with its rows repeated factor times."""
+    with open(csv_path, 'r', encoding='utf-8', newline='') as file:
+        header = file.readline()
+        body = file.read()
+    if body and not body.endswith('\n'):
+        body += '\n'
+    path = os.path.join(directory, f"x{factor}.csv")
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        file.write(header)
+        for _ in range(factor):
+            file.write(body)
+    return path
+
+
+def memory_status() -> dict:
+    """Returns the VmRSS and VmHWM (peak RSS) of this process, in bytes."""
+    status = {}
+    with open('/proc/self/status', 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.startswith(('VmRSS:', 'VmHWM:')):
+                status[line.split(':')[0]] = int(line.split()[1]) * 1024
+    return status
+
+
+def measure_load(load: callable, results):
+    """
+    Loads a dataset and puts its number of rows, the time it took, the peak and the
+    retained RSS in results. Meant to run in a forked process of its own.
+    """
+    # Reset the peak RSS inherited from the parent, so that only the load is measured
+    with open('/proc/self/clear_refs', 'w', encoding='utf-8') as file:
+        file.write('5')
+    before = memory_status()['VmRSS']
+    start = time.perf_counter()
+    ingestor = load()
+    elapsed = time.perf_counter() - start
+    after = memory_status()
+    results.put((len(ingestor), elapsed, after['VmHWM'] - before, after['VmRSS'] - before))
+
+
+def main(doc: str, run: callable, add_arguments: callable = None, argv: list = None):
+    """
+    Parses the command line of a benchmark, the path to the CSV and its own options,
+    and runs it.
+
+    Args:
+        doc (str): The docstring of the benchmark, whose first line describes it.
+        run (callable): Runs the benchmark with the parsed arguments.
+        add_arguments (callable, optional): Adds the options of the benchmark to the parser.
+        argv (list, optional): The arguments to parse, those of the command line by default.
+    """
+    parser = argparse.ArgumentParser(description=doc.strip().splitlines()[0])
+    parser.add_argument('csv_path', nargs='?', default=DEFAULT_CSV)
+    if add_arguments is not None:
+        add_arguments(parser)
+    run(parser.parse_args(argv))
@@ -0,0 +1,48 @@
+"""
+Measures the job throughput of the thread and process backends per number of workers.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_executor.py [csv_path] [--workers 1,2,4] [--jobs 200]
+"""
+
+import argparse
+import time
+from concurrent.futures import wait
+
+# bench_common puts the repository on the import path
+from bench_common import DEFAULT_WORKERS, main, sample_request
+# pylint: disable=wrong-import-position,wrong-import-order
+from app import threadpool_tasks
+from app.data_ingestor import DataIngestor
+from app.result_store import MemoryResultStore
+from app.task_runner import ThreadPool
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the benchmark."""
+    parser.add_argument('--workers', default=DEFAULT_WORKERS, help="numbers of workers")
+    parser.add_argument('--jobs', type=int, default=200, help="number of jobs submitted")
+
+
+def run(arguments: argparse.Namespace):
+    """Measures the job throughput of the thread and process backends per number of workers."""
+    ingestor = DataIngestor(arguments.csv_path)
+    task, args = threadpool_tasks.ENDPOINT_TASKS['mean_by_category']
+    request = sample_request(ingestor)
+
+    print(f"{'workers':>8}{'thread jobs/s':>15}{'process jobs/s':>16}")
+    for num_workers in map(int, arguments.workers.split(',')):
+        throughput = {}
+        for executor in ('thread', 'process'):
+            pool = ThreadPool(MemoryResultStore(), ingestor, num_workers, executor)
+            start = time.perf_counter()
+            wait([pool.submit(threadpool_tasks.run_task, job_id, task, request, ingestor, *args)
+                  for job_id in range(1, arguments.jobs + 1)])
+            throughput[executor] = arguments.jobs / (time.perf_counter() - start)
+            # Stop the workers without ThreadPool.shutdown, which exits the process
+            pool.executor.shutdown()
+        print(f"{num_workers:>8}{throughput['thread']:>15.1f}{throughput['process']:>16.1f}")
+
+
+if __name__ == '__main__':
+    main(__doc__, run, add_arguments)
@@ -0,0 +1,70 @@
+"""
+Compares the list of dicts representation with the columnar DataIngestor and the
+aggregate cube: load time, memory and the latency of every endpoint.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_ingest.py [csv_path]
+"""
+
+import argparse
+import csv
+import time
+
+# bench_common puts the repository on the import path
+from bench_common import main, measure, sample_request, timeit
+# pylint: disable=wrong-import-position,wrong-import-order
+from app import threadpool_tasks
+from app.aggregate_cube import AggregateCube
+from app.data_ingestor import DataIngestor, DATA_COL, STATE_COL
+
+
+def legacy_load(csv_path: str) -> list:
+    """Loads the CSV like the DataIngestor before the columnar store, a dict per row."""
+    with open(csv_path, 'r', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+
+def _legacy_states_mean(rows: list, question: str) -> dict:
+    per_state = {}
+    for row in rows:
+        if row['Question'] == question:
+            per_state.setdefault(row[STATE_COL], []).append(row)
+    means = {}
+    for state, state_rows in per_state.items():
+        valid = [float(row[DATA_COL]) for row in state_rows if row[DATA_COL] != '']
+        means[state] = sum(valid) / len(valid) if valid else float('NaN')
+    return means
+
+
+def run(arguments: argparse.Namespace):
+    """Compares the list of dicts representation with the columnar DataIngestor."""
+    csv_path = arguments.csv_path
+    legacy, legacy_time, legacy_mem, legacy_peak = measure(lambda: legacy_load(csv_path))
+    ingestor, new_time, new_mem, new_peak = measure(lambda: DataIngestor(csv_path))
+
+    print(f"{'representation':<16}{'rows':>10}{'load s':>10}{'retained MB':>14}{'peak MB':>10}")
+    print(f"{'list of dicts':<16}{len(legacy):>10}{legacy_time:>10.2f}"
+          f"{legacy_mem / 2**20:>14.1f}{legacy_peak / 2**20:>10.1f}")
+    print(f"{'columnar':<16}{len(ingestor):>10}{new_time:>10.2f}"
+          f"{new_mem / 2**20:>14.1f}{new_peak / 2**20:>10.1f}")
+
+    request = sample_request(ingestor)
+    print("\nstates_mean kernel: list of dicts "
+          f"{timeit(lambda: _legacy_states_mean(legacy, request['question'])):.3f} ms, columnar "
+          f"{timeit(lambda: threadpool_tasks.states_mean(request, ingestor)):.3f} ms")
+    del legacy
+
+    cube = DataIngestor(csv_path)
+    start = time.perf_counter()
+    cube.cube = AggregateCube(cube)
+    print(f"\naggregate cube built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"\n{'endpoint':<24}{'rows ms':>10}{'cube ms':>10}")
+    for endpoint, (task, args) in threadpool_tasks.ENDPOINT_TASKS.items():
+        rows_time = timeit(lambda task=task, args=args: task(request, ingestor, *args))
+        cube_time = timeit(lambda task=task, args=args: task(request, cube, *args))
+        print(f"{endpoint:<24}{rows_time:>10.3f}{cube_time:>10.4f}")
+
+
+if __name__ == '__main__':
+    main(__doc__, run)
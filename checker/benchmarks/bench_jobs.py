@@ -0,0 +1,54 @@
+"""
+Measures counting and listing the jobs, scanning every job versus the job table.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_jobs.py [--job-counts 10000,100000,1000000]
+"""
+
+import argparse
+from concurrent.futures import Future
+
+# bench_common puts the repository on the import path
+from bench_common import main, timeit
+# pylint: disable=wrong-import-position,wrong-import-order
+from app.job_table import JobTable, RUNNING, DONE
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the benchmark."""
+    parser.add_argument('--job-counts', default='10000,100000,1000000',
+                        help="numbers of jobs listed")
+
+
+def _legacy_get_jobs(futures: dict, max_jobs: int) -> dict:
+    """The job listing before the job table, scanning the futures of every job ID."""
+    return {f"job_id_{job_id}": 'running' if job_id in futures and not futures[job_id].done()
+            else 'done' for job_id in range(1, max_jobs)}
+
+
+def run(arguments: argparse.Namespace):
+    """Measures counting and listing the jobs, scanning every job versus the job table."""
+    print(f"{'jobs':>9}{'scan ms':>10}{'table all ms':>14}{'num_jobs ms':>13}"
+          f"{'page ms':>9}{'running page ms':>17}")
+    for count in map(int, arguments.job_counts.split(',')):
+        # The last hundred jobs still run, the others are done and forgotten
+        table = JobTable()
+        futures = {}
+        for job_id in range(1, count + 1):
+            table.set(job_id, RUNNING)
+            if job_id <= count - 100:
+                table.set(job_id, DONE)
+            else:
+                futures[job_id] = Future()
+        repeats = max(1, 100000 // count)
+        scan = timeit(lambda: _legacy_get_jobs(futures, count + 1), repeats)
+        table_all = timeit(lambda: table.legacy_states(count + 1), repeats)
+        stats = timeit(table.stats)
+        page = timeit(lambda: table.page(count // 2, 100))
+        running = timeit(lambda: table.page(1, 100, RUNNING))
+        print(f"{count:>9}{scan:>10.2f}{table_all:>14.2f}{stats:>13.4f}"
+              f"{page:>9.4f}{running:>17.4f}")
+
+
+if __name__ == '__main__':
+    main(__doc__, run, add_arguments)
@@ -0,0 +1,83 @@
+"""
+Measures how long the futures of the task runner stay locked while jobs are submitted
+and polled, and how long finished jobs stay registered once the last one is done,
+which delays the exit on shutdown.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_locks.py [csv_path] [--duration 6]
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import wait
+
+import numpy as np
+
+# bench_common puts the repository on the import path
+from bench_common import main, sample_request
+# pylint: disable=wrong-import-position,wrong-import-order
+from app import threadpool_tasks
+from app.data_ingestor import DataIngestor
+from app.result_store import MemoryResultStore
+from app.task_runner import ThreadPool
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the benchmark."""
+    parser.add_argument('--duration', type=float, default=6,
+                        help="number of seconds jobs are submitted for")
+
+
+class _TimedLock:
+    """A lock recording how long it is held every time it is acquired."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.holds = []
+        self.acquired = 0.0
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.acquired = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.holds.append(time.perf_counter() - self.acquired)
+        self.lock.release()
+
+
+def run(arguments: argparse.Namespace):
+    """Measures how long the futures stay locked and finished jobs stay registered."""
+    ingestor = DataIngestor(arguments.csv_path)
+    task, args = threadpool_tasks.ENDPOINT_TASKS['state_mean']
+    request = sample_request(ingestor)
+    pool = ThreadPool(MemoryResultStore(), ingestor, 2, 'thread')
+    pool.dict_lock = _TimedLock()
+
+    job_id = 0
+    futures = []
+    deadline = time.perf_counter() + arguments.duration
+    while time.perf_counter() < deadline:
+        job_id += 1
+        futures.append(pool.submit(threadpool_tasks.run_task, job_id, task, request,
+                                   ingestor, *args))
+        pool.check_job(max(job_id - 10, 1))
+        if len(futures) >= 100:
+            wait(futures)
+            futures.clear()
+    wait(futures)
+    done = time.perf_counter()
+    while pool.futures:
+        time.sleep(0.001)
+    release_lag = time.perf_counter() - done
+    pool.executor.shutdown()
+
+    holds = np.array(pool.dict_lock.holds) * 1e6
+    print(f"{'jobs':>8}{'acquires':>10}{'mean us':>9}{'p99 us':>9}{'max us':>10}"
+          f"{'held ms':>9}{'release lag ms':>16}")
+    print(f"{job_id:>8}{len(holds):>10}{holds.mean():>9.2f}{np.percentile(holds, 99):>9.2f}"
+          f"{holds.max():>10.1f}{holds.sum() / 1000:>9.1f}{release_lag * 1000:>16.1f}")
+
+
+if __name__ == '__main__':
+    main(__doc__, run, add_arguments)
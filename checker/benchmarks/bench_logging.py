@@ -0,0 +1,91 @@
+"""
+Measures the time the request threads spend logging, with the records written
+synchronously as before the logging pipeline, and queued to a background writer.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_logging.py [csv_path] [--jobs 2000]
+"""
+
+import argparse
+import logging
+import logging.handlers
+import os
+import queue
+import tempfile
+import time
+
+import numpy as np
+
+# bench_common puts the repository on the import path
+from bench_common import main, sample_request
+# pylint: disable=wrong-import-position,wrong-import-order
+from app.data_ingestor import DataIngestor
+from app.log_pipeline import LogWriter, NonBlockingQueueHandler
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the benchmark."""
+    parser.add_argument('--jobs', type=int, default=200,
+                        help="number of records logged and of polls")
+
+
+def _sync_handlers(directory: str) -> list:
+    """The handlers of the root logger before the logging pipeline, writing synchronously."""
+    filename = os.path.join(directory, 'sync.log')
+    rotating = logging.handlers.RotatingFileHandler(filename, maxBytes=100000, backupCount=20)
+    formatter = logging.Formatter('%(asctime)s %(levelname)-8s %(message)s')
+    formatter.converter = time.gmtime
+    rotating.setFormatter(formatter)
+    return [logging.FileHandler(filename), rotating]
+
+
+def run(arguments: argparse.Namespace):
+    """Measures the time the request threads spend logging, synchronously and queued."""
+    # Importing the webserver sets it up: it loads the dataset and starts its workers
+    from app import webserver  # pylint: disable=import-outside-toplevel
+    ingestor = DataIngestor(arguments.csv_path)
+    request = sample_request(ingestor)
+    client = webserver.test_client()
+    webserver.result_store.put(1, b'{}')
+    webserver.job_counter = max(webserver.job_counter, 2)
+    root = logging.getLogger(None)
+    handlers = root.handlers[:]
+
+    print(f"{'handlers':<10}{'log p50 us':>11}{'log p99 us':>11}{'log max us':>11}"
+          f"{'poll p50 us':>12}{'poll p99 us':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ('sync', 'queue'):
+            if mode == 'sync':
+                pipeline = _sync_handlers(directory)
+                listener = None
+            else:
+                queue_handler = NonBlockingQueueHandler(queue.Queue(10000))
+                listener = LogWriter(queue_handler.queue, _sync_handlers(directory)[1], 0.1)
+                listener.start()
+                pipeline = [queue_handler]
+            root.handlers = pipeline
+
+            logs = []
+            for _ in range(arguments.jobs):
+                start = time.perf_counter()
+                logging.info("Got request at %s with data:\n %s", '/api/state_mean', request)
+                logs.append(time.perf_counter() - start)
+            polls = []
+            for _ in range(arguments.jobs):
+                start = time.perf_counter()
+                client.get('/api/get_results/1')
+                polls.append(time.perf_counter() - start)
+
+            if listener is not None:
+                listener.stop()
+            for handler in pipeline:
+                handler.close()
+            log_p50, log_p99, log_max = np.percentile(np.array(logs) * 1e6, [50, 99, 100])
+            poll_p50, poll_p99 = np.percentile(np.array(polls) * 1e6, [50, 99])
+            print(f"{mode:<10}{log_p50:>11.1f}{log_p99:>11.1f}{log_max:>11.1f}"
+                  f"{poll_p50:>12.1f}{poll_p99:>12.1f}")
+    root.handlers = handlers
+
+
+if __name__ == '__main__':
+    main(__doc__, run, add_arguments)
@@ -0,0 +1,59 @@
+"""
+Measures the peak RSS of every ingestion mode, each one in a forked process.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_memory.py [csv_path] [--factors 1,10] [--chunk-rows 100000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+# bench_common puts the repository on the import path
+from bench_common import main, measure_load, replicate
+# pylint: disable=wrong-import-position,wrong-import-order
+from app.data_ingestor import DataIngestor, open_snapshot
+from bench_ingest import legacy_load
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the benchmark."""
+    parser.add_argument('--factors', default='1,10,100',
+                        help="dataset sizes, as multiples of the CSV")
+    parser.add_argument('--chunk-rows', type=int, default=100000,
+                        help="rows per chunk of the streaming ingestion")
+
+
+def run(arguments: argparse.Namespace):
+    """Measures the peak RSS of every ingestion mode, each one in a forked process."""
+    import pandas  # pylint: disable=import-outside-toplevel,unused-import
+    print("pandas is imported beforehand, so its own memory is not counted")
+    context = multiprocessing.get_context('fork')
+    print(f"{'factor':>8}{'mode':>22}{'rows':>12}{'load s':>9}"
+          f"{'peak RSS MB':>13}{'retained MB':>13}")
+    with tempfile.TemporaryDirectory() as directory:
+        for factor in map(int, arguments.factors.split(',')):
+            csv_path = replicate(arguments.csv_path, factor, directory)
+            snapshot = os.path.join(directory, f"x{factor}.snapshot")
+            open_snapshot(csv_path, snapshot)
+            modes = {
+                'list of dicts': lambda csv_path=csv_path: legacy_load(csv_path),
+                'csv module': lambda csv_path=csv_path: DataIngestor(csv_path, 0),
+                f'pandas {arguments.chunk_rows} rows':
+                    lambda csv_path=csv_path: DataIngestor(csv_path, arguments.chunk_rows),
+                'snapshot map': lambda snapshot=snapshot: DataIngestor.load(snapshot),
+            }
+            for mode, load in modes.items():
+                results = context.Queue()
+                process = context.Process(target=measure_load, args=(load, results))
+                process.start()
+                rows, elapsed, peak, retained = results.get()
+                process.join()
+                print(f"{factor:>8}{mode:>22}{rows:>12}{elapsed:>9.2f}"
+                      f"{peak / 2**20:>13.1f}{retained / 2**20:>13.1f}")
+            os.remove(csv_path)
+
+
+if __name__ == '__main__':
+    main(__doc__, run, add_arguments)
@@ -0,0 +1,84 @@
+"""
+Replays a mix of cheap state_mean and heavy mean_by_category requests arriving at random,
+at a fraction of the capacity of the workers, and measures their latency per scheduler.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_mixed.py [csv_path] [--jobs 2000] [--heavy 0.2] [--load 0.7]
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import wait
+
+import numpy as np
+
+# bench_common puts the repository on the import path
+from bench_common import DEFAULT_WORKERS, main, sample_request, timeit
+# pylint: disable=wrong-import-position,wrong-import-order
+from app import threadpool_tasks
+from app.data_ingestor import DataIngestor
+from app.result_store import MemoryResultStore
+from app.task_runner import ThreadPool
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the benchmark."""
+    parser.add_argument('--workers', default=DEFAULT_WORKERS,
+                        help="number of workers, the first of a list")
+    parser.add_argument('--jobs', type=int, default=200, help="number of requests replayed")
+    parser.add_argument('--heavy', type=float, default=0.2,
+                        help="fraction of heavy requests")
+    parser.add_argument('--load', type=float, default=0.7,
+                        help="arrival rate, relative to the capacity")
+
+
+def run(arguments: argparse.Namespace):
+    """Replays a mix of cheap and heavy requests and measures their latency per scheduler."""
+    ingestor = DataIngestor(arguments.csv_path)
+    request = sample_request(ingestor)
+    num_workers = int(arguments.workers.split(',')[0])
+    kinds = {'state_mean': request, 'mean_by_category': {'question': request['question']}}
+    service = {endpoint: timeit(lambda endpoint=endpoint, data=data: threadpool_tasks.run_task(
+        threadpool_tasks.ENDPOINT_TASKS[endpoint][0], data, ingestor)) / 1000
+               for endpoint, data in kinds.items()}
+
+    rng = random.Random(0)
+    replay = ['mean_by_category' if rng.random() < arguments.heavy else 'state_mean'
+              for _ in range(arguments.jobs)]
+    mean_service = sum(service[endpoint] for endpoint in replay) / len(replay)
+    gaps = [rng.expovariate(arguments.load * num_workers / mean_service) for _ in replay]
+    print("service ms: " + ", ".join(f"{endpoint} {seconds * 1000:.2f}"
+                                    for endpoint, seconds in service.items()))
+
+    print(f"{'scheduler':<10}{'endpoint':<18}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'max ms':>9}")
+    for scheduler in ('fifo', 'cost'):
+        pool = ThreadPool(MemoryResultStore(), ingestor, num_workers, 'thread',
+                          scheduler=scheduler)
+        latencies = {endpoint: [] for endpoint in kinds}
+        futures = []
+        arrival = time.perf_counter()
+        for job_id, (endpoint, gap) in enumerate(zip(replay, gaps), start=1):
+            time.sleep(max(arrival - time.perf_counter(), 0))
+            submitted = time.perf_counter()
+            task, args = threadpool_tasks.ENDPOINT_TASKS[endpoint]
+            cost = threadpool_tasks.estimate_cost(endpoint, kinds[endpoint], ingestor)
+            future = pool.submit(threadpool_tasks.run_task, job_id, task, kinds[endpoint],
+                                 ingestor, *args, endpoint=endpoint, cost=cost)
+            future.add_done_callback(lambda _, endpoint=endpoint, submitted=submitted:
+                                     latencies[endpoint].append(
+                                         time.perf_counter() - submitted))
+            futures.append(future)
+            arrival += gap
+        wait(futures)
+        time.sleep(0.1)
+        pool.executor.shutdown()
+        for endpoint, values in latencies.items():
+            p50, p95, p99, worst = np.percentile(np.array(values) * 1000, [50, 95, 99, 100])
+            print(f"{scheduler:<10}{endpoint:<18}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}"
+                  f"{worst:>9.2f}")
+
+
+if __name__ == '__main__':
+    main(__doc__, run, add_arguments)
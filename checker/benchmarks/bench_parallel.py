@@ -0,0 +1,48 @@
+"""
+Measures the parse time of the parallel parser per number of worker processes.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_parallel.py [csv_path] [--factors 10] [--workers 1,2,4]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+# bench_common puts the repository on the import path
+from bench_common import DEFAULT_WORKERS, main, replicate
+# pylint: disable=wrong-import-position,wrong-import-order
+from app.data_ingestor import DataIngestor
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the benchmark."""
+    parser.add_argument('--factors', default='1,10,100',
+                        help="dataset sizes, as multiples of the CSV")
+    parser.add_argument('--workers', default=DEFAULT_WORKERS,
+                        help="numbers of parsing processes")
+
+
+def run(arguments: argparse.Namespace):
+    """Measures the parse time of the parallel parser per number of worker processes."""
+    print(f"{'factor':>8}{'MB':>8}{'workers':>9}{'parse s':>9}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for factor in map(int, arguments.factors.split(',')):
+            csv_path = replicate(arguments.csv_path, factor, directory)
+            size = os.path.getsize(csv_path) / 2**20
+            start = time.perf_counter()
+            DataIngestor(csv_path, chunk_rows=0, workers=1)
+            sequential = time.perf_counter() - start
+            print(f"{factor:>8}{size:>8.0f}{'-':>9}{sequential:>9.2f}{1:>9.2f}")
+            for num_workers in map(int, arguments.workers.split(',')):
+                start = time.perf_counter()
+                DataIngestor(csv_path, chunk_rows=0, workers=num_workers)
+                elapsed = time.perf_counter() - start
+                print(f"{factor:>8}{size:>8.0f}{num_workers:>9}{elapsed:>9.2f}"
+                      f"{sequential / elapsed:>9.2f}")
+            os.remove(csv_path)
+
+
+if __name__ == '__main__':
+    main(__doc__, run, add_arguments)
@@ -0,0 +1,52 @@
+"""
+Measures get_results for the largest payloads, spliced versus parsed and re-encoded.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_poll.py [csv_path]
+"""
+
+import argparse
+import json
+
+from flask import jsonify
+
+# bench_common puts the repository on the import path
+from bench_common import main, sample_request, timeit
+# pylint: disable=wrong-import-position,wrong-import-order
+from app import threadpool_tasks
+from app.data_ingestor import DataIngestor
+from app.result_store import done_envelope, orjson
+
+
+def run(arguments: argparse.Namespace):
+    """Measures get_results for the largest payloads, spliced versus parsed and re-encoded."""
+    # Importing the webserver sets it up: it loads the dataset and starts its workers
+    from app import webserver  # pylint: disable=import-outside-toplevel
+    ingestor = DataIngestor(arguments.csv_path)
+    request = sample_request(ingestor)
+    client = webserver.test_client()
+
+    print(f"{'endpoint':<24}{'KB':>8}{'dumps ms':>10}{'orjson ms':>10}"
+          f"{'reparse ms':>12}{'splice ms':>11}{'get_results ms':>16}")
+    for job_id, endpoint in enumerate(('mean_by_category', 'states_mean',
+                                       'state_mean_by_category'), start=1):
+        task, args = threadpool_tasks.ENDPOINT_TASKS[endpoint]
+        result = task(request, ingestor, *args)
+        payload = json.dumps(result).encode('utf-8')
+        webserver.result_store.put(job_id, payload)
+        webserver.job_counter = max(webserver.job_counter, job_id + 1)
+
+        dumps = timeit(lambda result=result: json.dumps(result).encode('utf-8'))
+        fast_dumps = timeit(lambda result=result: orjson.dumps(result)) if orjson else float('NaN')
+        with webserver.test_request_context():
+            reparse = timeit(lambda payload=payload: jsonify(
+                {'status': 'done', 'data': json.loads(payload)}).get_data())
+            splice = timeit(lambda payload=payload: webserver.response_class(
+                done_envelope(payload), mimetype='application/json').get_data())
+        poll = timeit(lambda job_id=job_id: client.get(f"/api/get_results/{job_id}").get_data())
+        print(f"{endpoint:<24}{len(payload) / 1024:>8.1f}{dumps:>10.3f}{fast_dumps:>10.3f}"
+              f"{reparse:>12.3f}{splice:>11.4f}{poll:>16.3f}")
+
+
+if __name__ == '__main__':
+    main(__doc__, run)
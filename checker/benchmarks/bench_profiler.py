@@ -0,0 +1,44 @@
+"""
+Measures what the profiling of the jobs costs: the decision taken for every job
+while it is disabled, relative to the fastest task, and the slowdown of the
+profiled jobs of every endpoint.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_profiler.py [csv_path]
+"""
+
+import argparse
+import time
+
+# bench_common puts the repository on the import path
+from bench_common import main, sample_request, timeit
+# pylint: disable=wrong-import-position,wrong-import-order
+from app import threadpool_tasks
+from app.data_ingestor import DataIngestor
+from app.profiler import JobProfiler, profile_call
+
+
+def run(arguments: argparse.Namespace):
+    """Measures the cost of the profiler, disabled and on the profiled jobs."""
+    ingestor = DataIngestor(arguments.csv_path)
+    request = sample_request(ingestor)
+    disabled = JobProfiler()
+    calls = 1000000
+    start = time.perf_counter()
+    for _ in range(calls):
+        disabled.sample('state_mean')
+    decision = (time.perf_counter() - start) / calls * 1e6
+
+    print(f"{'endpoint':<24}{'job us':>10}{'disabled %':>12}{'profiled us':>13}{'slowdown':>10}")
+    for endpoint, (task, args) in threadpool_tasks.ENDPOINT_TASKS.items():
+        plain = timeit(lambda task=task, args=args: threadpool_tasks.run_task(
+            task, request, ingestor, *args)) * 1000
+        profiled = timeit(lambda endpoint=endpoint, task=task, args=args: profile_call(
+            endpoint, threadpool_tasks.run_task, task, request, ingestor, *args)) * 1000
+        print(f"{endpoint:<24}{plain:>10.1f}{decision / plain * 100:>12.3f}{profiled:>13.1f}"
+              f"{profiled / plain:>10.1f}")
+    print(f"\ndecision while disabled: {decision * 1000:.0f} ns per job")
+
+
+if __name__ == '__main__':
+    main(__doc__, run)
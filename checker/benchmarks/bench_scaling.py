@@ -0,0 +1,50 @@
+"""
+Shows how question lookups scale as the CSV is replicated.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_scaling.py [csv_path] [--factors 1,10,100]
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+# bench_common puts the repository on the import path
+from bench_common import main, replicate, sample_request, timeit
+# pylint: disable=wrong-import-position,wrong-import-order
+from app import threadpool_tasks
+from app.data_ingestor import DataIngestor, QUESTION_COL
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the benchmark."""
+    parser.add_argument('--factors', default='1,10,100',
+                        help="dataset sizes, as multiples of the CSV")
+
+
+def run(arguments: argparse.Namespace):
+    """Shows how question lookups scale as the CSV is replicated."""
+    print(f"{'factor':>8}{'rows':>12}{'load s':>10}{'scan ms':>10}{'index ms':>10}"
+          f"{'states_mean ms':>16}{'state_mean ms':>15}")
+    with tempfile.TemporaryDirectory() as directory:
+        for factor in map(int, arguments.factors.split(',')):
+            start = time.perf_counter()
+            ingestor = DataIngestor(replicate(arguments.csv_path, factor, directory))
+            load_time = time.perf_counter() - start
+
+            request = sample_request(ingestor)
+            code = ingestor.label_codes[QUESTION_COL].get(request['question'])
+            scan = timeit(lambda: np.flatnonzero(ingestor.codes[QUESTION_COL] == code))
+            index = timeit(lambda: ingestor.get_data_for_question_state(request['question'],
+                                                                        request['state']))
+            states = timeit(lambda: threadpool_tasks.states_mean(request, ingestor))
+            state = timeit(lambda: threadpool_tasks.state_mean(request, ingestor))
+            print(f"{factor:>8}{len(ingestor):>12}{load_time:>10.2f}{scan:>10.3f}{index:>10.4f}"
+                  f"{states:>16.3f}{state:>15.3f}")
+            del ingestor
+
+
+if __name__ == '__main__':
+    main(__doc__, run, add_arguments)
@@ -0,0 +1,70 @@
+"""
+Compares workers parsing their own copy of the CSV with workers mapping a shared snapshot.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_shared.py [csv_path] [--workers 1,2,4]
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+# bench_common puts the repository on the import path
+from bench_common import DEFAULT_WORKERS, main, sample_request
+# pylint: disable=wrong-import-position,wrong-import-order
+from app import threadpool_tasks
+from app.data_ingestor import DataIngestor, open_snapshot
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the benchmark."""
+    parser.add_argument('--workers', default=DEFAULT_WORKERS, help="numbers of workers")
+
+
+def _private_memory() -> int:
+    """Returns the memory of this process that is not shared with others, in bytes."""
+    private = 0
+    with open('/proc/self/smaps_rollup', 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                private += int(line.split()[1]) * 1024
+    return private
+
+
+def _start_worker(csv_path: str, directory: str, results: multiprocessing.Queue):
+    before = _private_memory()
+    start = time.perf_counter()
+    ingestor = open_snapshot(csv_path, directory) if directory else DataIngestor(csv_path)
+    elapsed = time.perf_counter() - start
+    # Touch all the columns, like requests would
+    threadpool_tasks.mean_by_category(sample_request(ingestor), ingestor)
+    results.put((elapsed, _private_memory() - before))
+
+
+def run(arguments: argparse.Namespace):
+    """Compares workers parsing their own copy of the CSV with workers mapping a shared one."""
+    context = multiprocessing.get_context('fork')
+    print(f"{'workers':>8}{'mode':>8}{'max start s':>13}{'private MB/worker':>19}")
+    with tempfile.TemporaryDirectory() as temporary:
+        for num_workers in map(int, arguments.workers.split(',')):
+            for directory in (None, os.path.join(temporary, 'dataset')):
+                results = context.Queue()
+                workers = [context.Process(target=_start_worker,
+                                           args=(arguments.csv_path, directory, results))
+                           for _ in range(num_workers)]
+                for worker in workers:
+                    worker.start()
+                measures = [results.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+                print(f"{num_workers:>8}{'shared' if directory else 'parse':>8}"
+                      f"{max(elapsed for elapsed, _ in measures):>13.2f}"
+                      f"{sum(memory for _, memory in measures) / num_workers / 2**20:>19.1f}")
+            shutil.rmtree(os.path.join(temporary, 'dataset'), ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(__doc__, run, add_arguments)
@@ -0,0 +1,52 @@
+"""
+Measures the time until the first answer when parsing the CSV or mapping its snapshot,
+cold, warm, after the CSV is touched and after it changed.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_startup.py [csv_path]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+# bench_common puts the repository on the import path
+from bench_common import main, sample_request
+# pylint: disable=wrong-import-position,wrong-import-order
+from app import threadpool_tasks
+from app.data_ingestor import DataIngestor, open_snapshot
+
+
+def _first_answer(load: callable) -> float:
+    start = time.perf_counter()
+    ingestor = load()
+    threadpool_tasks.states_mean(sample_request(ingestor), ingestor)
+    return time.perf_counter() - start
+
+
+def run(arguments: argparse.Namespace):
+    """Measures the time until the first answer when parsing the CSV or mapping its snapshot."""
+    with tempfile.TemporaryDirectory() as temporary:
+        snapshot = os.path.join(temporary, 'snapshot')
+        csv_copy = shutil.copy(arguments.csv_path, os.path.join(temporary, 'data.csv'))
+        timings = {
+            'parse CSV': _first_answer(lambda: DataIngestor(csv_copy)),
+            'cold (parse + write snapshot)': _first_answer(
+                lambda: open_snapshot(csv_copy, snapshot)),
+            'warm (map snapshot)': _first_answer(lambda: open_snapshot(csv_copy, snapshot)),
+        }
+        os.utime(csv_copy)
+        timings['touched CSV (hash + map)'] = _first_answer(
+            lambda: open_snapshot(csv_copy, snapshot))
+        with open(csv_copy, 'a', encoding='utf-8') as file:
+            file.write('\n')
+        timings['changed CSV (rebuild)'] = _first_answer(lambda: open_snapshot(csv_copy, snapshot))
+
+    for name, elapsed in timings.items():
+        print(f"{name:<32}{elapsed:>8.3f} s")
+
+
+if __name__ == '__main__':
+    main(__doc__, run)
@@ -0,0 +1,80 @@
+"""
+Measures the ingest time, the peak RSS and the latency of every endpoint on synthetic
+datasets of the given multiples of the rows of the CSV (see generate_dataset.py).
+Unlike the replicated copies of the other benchmarks, their values differ.
+
+Run from the root of the repository:
+    python checker/benchmarks/bench_synthetic.py [csv_path] [--factors 1,10,100]
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import tempfile
+import time
+
+# bench_common puts the repository on the import path
+from bench_common import main, measure_load, sample_request, timeit
+# pylint: disable=wrong-import-position,wrong-import-order
+from app import threadpool_tasks
+from app.aggregate_cube import AggregateCube
+from app.data_ingestor import DataIngestor
+from generate_dataset import generate
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the benchmark."""
+    parser.add_argument('--factors', default='1,10,100',
+                        help="dataset sizes, as multiples of the rows of the CSV")
+
+
+def run(arguments: argparse.Namespace):
+    """Measures ingestion and the endpoints on synthetic datasets of growing sizes."""
+    context = multiprocessing.get_context('fork')
+    with open(arguments.csv_path, 'r', encoding='utf-8', newline='') as file:
+        source_rows = sum(1 for _ in csv.reader(file)) - 1
+    latencies = {}
+    print(f"{'factor':>8}{'rows':>12}{'MB':>8}{'generate s':>12}{'load s':>9}"
+          f"{'peak RSS MB':>13}{'cube s':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for factor in map(int, arguments.factors.split(',')):
+            csv_path = os.path.join(directory, f"synthetic{factor}.csv")
+            start = time.perf_counter()
+            generate(csv_path, factor * source_rows, arguments.csv_path)
+            generate_time = time.perf_counter() - start
+
+            results = context.Queue()
+            process = context.Process(target=measure_load,
+                                      args=(lambda: DataIngestor(csv_path), results))
+            process.start()
+            rows, load_time, peak, _ = results.get()
+            process.join()
+
+            ingestor = DataIngestor(csv_path)
+            cube = DataIngestor(csv_path)
+            start = time.perf_counter()
+            cube.cube = AggregateCube(cube)
+            cube_time = time.perf_counter() - start
+            print(f"{factor:>8}{rows:>12}{os.path.getsize(csv_path) / 2**20:>8.0f}"
+                  f"{generate_time:>12.2f}{load_time:>9.2f}{peak / 2**20:>13.1f}"
+                  f"{cube_time:>9.2f}")
+
+            request = sample_request(ingestor)
+            for endpoint, (task, args) in threadpool_tasks.ENDPOINT_TASKS.items():
+                latencies.setdefault(endpoint, []).append((
+                    timeit(lambda task=task, args=args: task(request, ingestor, *args)),
+                    timeit(lambda task=task, args=args: task(request, cube, *args))))
+            del ingestor, cube
+            os.remove(csv_path)
+
+    factors = arguments.factors.split(',')
+    print(f"\n{'endpoint':<24}" + ''.join(f"{'rows ms x' + factor:>14}" for factor in factors)
+          + ''.join(f"{'cube ms x' + factor:>14}" for factor in factors))
+    for endpoint, times in latencies.items():
+        print(f"{endpoint:<24}" + ''.join(f"{rows_time:>14.3f}" for rows_time, _ in times)
+              + ''.join(f"{cube_time:>14.4f}" for _, cube_time in times))
+
+
+if __name__ == '__main__':
+    main(__doc__, run, add_arguments)
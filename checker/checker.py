@@ -12,6 +12,9 @@ total_score = 0
 
 ONLY_LAST = False
 
+# Seconds the server may hold a get_results request until the job is done
+POLL_WAIT = 1
+
 class TestAPI(unittest.TestCase):
     def setUp(self):
         os.system("rm -rf results/*")
@@ -110,7 +113,8 @@ class TestAPI(unittest.TestCase):
                 job_id = job_id["job_id"]
 
                 self.check_res_timeout(
-                    res_callable = lambda: requests.get(f"http://127.0.0.1:5000/api/get_results/{job_id}"),
+                    res_callable = lambda: requests.get(f"http://127.0.0.1:5000/api/get_results/{job_id}",
+                                                        params={"wait": POLL_WAIT}),
                     ref_result = ref_result,
                     timeout_sec = 1)
                 
@@ -0,0 +1,133 @@
+"""
+Generates a synthetic dataset with the schema, questions, states and stratifications
+of a source CSV, at any number of rows, for scale tests.
+
+Run from the root of the repository:
+    python checker/generate_dataset.py output.csv [--rows 2100000 | --factor 100]
+        [--source nutrition_activity_obesity_usa_subset.csv] [--seed 0] [--jitter 0.5]
+
+Every row of the source is written once, so that every combination of question, state
+and stratification appears, then rows are drawn at random from the source. The values
+are those of the drawn rows plus Gaussian noise, scaled by the standard deviation of
+the values of their question and stratification, so that the means per question, state
+and stratification stay close to those of the source. Blank values stay blank.
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from app.data_ingestor import QUESTION_COL, STRAT_COL, DATA_COL
+
+DEFAULT_SOURCE = "./nutrition_activity_obesity_usa_subset.csv"
+# The number of rows drawn and written at once
+CHUNK_ROWS = 100000
+
+
+def _render(row: list) -> str:
+    # The line terminator makes the writer quote the fields spanning several lines
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\r\n').writerow(row)
+    return buffer.getvalue()[:-2]
+
+
+def _templates(source: str) -> tuple:
+    """
+    Reads the source and splits each of its rows around its value.
+
+    Returns:
+        tuple: The header, the text of the rows before and after their value,
+            their values (NaN if blank), the standard deviation of the values of the
+            question and stratification of every row, and the line terminator.
+    """
+    with open(source, 'r', encoding='utf-8', newline='') as file:
+        first_line = file.readline()
+        file.seek(0)
+        reader = csv.reader(file)
+        header = next(reader)
+        rows = [row for row in reader if row]
+    value_col = header.index(DATA_COL)
+    question_col = header.index(QUESTION_COL)
+    strat_col = header.index(STRAT_COL)
+
+    prefixes = [_render(row[:value_col]) + ',' if value_col else '' for row in rows]
+    suffixes = [',' + _render(row[value_col + 1:]) if value_col + 1 < len(header) else ''
+                for row in rows]
+    values = np.array([float(row[value_col]) if row[value_col] != '' else np.nan
+                       for row in rows])
+
+    series = {}
+    for index, row in enumerate(rows):
+        series.setdefault((row[question_col], row[strat_col]), []).append(index)
+    deviations = np.zeros(len(rows))
+    for indices in series.values():
+        series_values = values[indices]
+        if np.count_nonzero(~np.isnan(series_values)) > 1:
+            deviations[indices] = np.nanstd(series_values)
+    terminator = '\r\n' if first_line.endswith('\r\n') else '\n'
+    return _render(header), prefixes, suffixes, values, deviations, terminator
+
+
+def generate(output: str, rows: int, source: str = DEFAULT_SOURCE, seed: int = 0,
+             jitter: float = 0.5) -> int:
+    """
+    Writes a synthetic dataset.
+
+    Args:
+        output (str): The path to the CSV file written.
+        rows (int): The number of rows, at least that of the source.
+        source (str, optional): The path to the source CSV.
+        seed (int, optional): The seed of the random draws.
+        jitter (float, optional): The standard deviation of the noise added to the values,
+            relative to that of the values of their question and stratification.
+
+    Returns:
+        int: The number of rows written.
+    """
+    header, prefixes, suffixes, values, deviations, terminator = _templates(source)
+    rng = np.random.default_rng(seed)
+    rows = max(rows, len(prefixes))
+    with open(output, 'w', encoding='utf-8', newline='') as file:
+        file.write(header + terminator)
+        written = 0
+        while written < rows:
+            count = min(CHUNK_ROWS, rows - written)
+            if written < len(prefixes):
+                # Every row of the source first, then random ones
+                drawn = np.arange(written, min(written + count, len(prefixes)))
+            else:
+                drawn = rng.integers(0, len(prefixes), size=count)
+            noisy = values[drawn] + rng.standard_normal(len(drawn)) * deviations[drawn] * jitter
+            noisy = np.clip(noisy, 0, 100).round(1)
+            texts = ['' if text == 'nan' else text for text in noisy.astype(str)]
+            file.write(''.join(prefixes[index] + text + suffixes[index] + terminator
+                               for index, text in zip(drawn.tolist(), texts)))
+            written += len(drawn)
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('output')
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument('--rows', type=int, help="number of rows")
+    size.add_argument('--factor', type=float, default=10,
+                      help="number of rows, as a multiple of those of the source")
+    parser.add_argument('--source', default=DEFAULT_SOURCE)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jitter', type=float, default=0.5,
+                        help="noise added to the values, relative to their deviation")
+    arguments = parser.parse_args()
+    if arguments.rows is None:
+        with open(arguments.source, 'r', encoding='utf-8', newline='') as source_file:
+            arguments.rows = int(arguments.factor * (sum(1 for _ in csv.reader(source_file)) - 1))
+    written = generate(arguments.output, arguments.rows, arguments.source, arguments.seed,
+                       arguments.jitter)
+    print(f"Wrote {written} rows to {arguments.output}")
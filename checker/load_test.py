@@ -0,0 +1,304 @@
+"""
+Load tests for a running webserver: replays a trace of requests, or a mix synthesized
+from the inputs of the tests, and reports the latency of every endpoint.
+
+Run from the root of the repository, with the webserver running:
+    python checker/load_test.py [--url http://localhost:5000] [--requests 1000]
+        [--concurrency 16] [--rate 0] [--mix states_mean=2,best5=1]
+        [--trace trace.jsonl] [--record trace.jsonl]
+        [--save baseline.json] [--compare baseline.json] [--tolerance 0.2]
+
+A trace has one request per line: {"endpoint": "state_mean", "data": {...}}, optionally
+with "at", the second the request is sent at from the start of the replay.
+With --rate, the requests are sent at that many per second (open loop), otherwise each
+of the --concurrency clients sends its next request once the previous one is done.
+Repeated requests are answered from the memo of the server, unless it runs with
+MEMO_MAX_ENTRIES=0.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+TESTS_DIR = "./tests"
+# The longest the server holds a get_results request, see routes.MAX_POLL_WAIT
+POLL_WAIT = 30
+PERCENTILES = (50, 95, 99)
+# The latency percentiles compared with the baseline
+COMPARED = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def load_trace(path: str) -> list:
+    """
+    Loads a trace of requests.
+
+    Returns:
+        list: The (endpoint, data, at) requests, at being None when not recorded.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        entries = [json.loads(line) for line in file if line.strip()]
+    return [(entry['endpoint'], entry.get('data'), entry.get('at')) for entry in entries]
+
+
+def synthesize(tests_dir: str, count: int, mix: dict, seed: int) -> list:
+    """
+    Synthesizes requests from the inputs of the tests, drawing the endpoints
+    with the weights of the mix, or uniformly.
+
+    Returns:
+        list: The (endpoint, data, None) requests.
+    """
+    payloads = {}
+    for endpoint in sorted(os.listdir(tests_dir)):
+        input_dir = os.path.join(tests_dir, endpoint, 'input')
+        if os.path.isdir(input_dir) and (not mix or endpoint in mix):
+            payloads[endpoint] = []
+            for name in sorted(os.listdir(input_dir)):
+                with open(os.path.join(input_dir, name), 'r', encoding='utf-8') as file:
+                    payloads[endpoint].append(json.load(file))
+    endpoints = list(payloads)
+    weights = [mix.get(endpoint, 1) for endpoint in endpoints]
+    rng = random.Random(seed)
+    return [(endpoint, rng.choice(payloads[endpoint]), None)
+            for endpoint in rng.choices(endpoints, weights, k=count)]
+
+
+def scrape_queue_times(url: str) -> dict:
+    """
+    Reads the histograms of the time the jobs waited in the queue from /api/metrics.
+
+    Returns:
+        dict: Maps the endpoints to the sum of their queue times and their number of jobs,
+            empty if the server does not expose them.
+    """
+    try:
+        text = requests.get(f"{url}/api/metrics", timeout=10).text
+    except requests.RequestException:
+        return {}
+    times = {}
+    for line in text.splitlines():
+        for suffix, index in (('_sum', 0), ('_count', 1)):
+            prefix = f"di_job_duration_seconds{suffix}{{endpoint=\""
+            if line.startswith(prefix) and 'phase="queue"' in line:
+                endpoint = line[len(prefix):line.index('"', len(prefix))]
+                times.setdefault(endpoint, [0.0, 0])[index] = float(line.rsplit(' ', 1)[1])
+    return times
+
+
+class LoadTest:
+    """
+    Sends requests to the webserver from several client threads and records their outcome.
+
+    Attributes:
+        url (str): The URL of the webserver.
+        concurrency (int): The number of client threads.
+        rate (float): The number of requests sent per second, 0 for a closed loop.
+        results (list): The (endpoint, outcome, seconds) of every request sent, the outcome
+            being "done", "rejected" (429 or 503) or "error".
+        sessions (local): The HTTP session of every client thread.
+    """
+
+    def __init__(self, url: str, concurrency: int, rate: float):
+        self.url = url
+        self.concurrency = concurrency
+        self.rate = rate
+        self.results = []
+        self.sessions = threading.local()
+        self.lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self.sessions, 'session'):
+            self.sessions.session = requests.Session()
+        return self.sessions.session
+
+    def send(self, endpoint: str, data, start_at: float):
+        """
+        Sends a request at the given time and waits for its result.
+        """
+        time.sleep(max(start_at - time.perf_counter(), 0))
+        session = self._session()
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{self.url}/api/{endpoint}", json=data, timeout=60)
+            if response.status_code in (429, 503):
+                outcome = 'rejected'
+            else:
+                body = response.json()
+                while 'job_id' in body:
+                    body = session.get(f"{self.url}/api/get_results/{body['job_id']}",
+                                       params={'wait': POLL_WAIT}, timeout=POLL_WAIT + 10).json()
+                    if body.get('status') != 'running':
+                        break
+                outcome = 'done' if body.get('status') == 'done' else 'error'
+        except (requests.RequestException, ValueError):
+            outcome = 'error'
+        with self.lock:
+            self.results.append((endpoint, outcome, time.perf_counter() - start))
+
+    def run(self, trace: list) -> float:
+        """
+        Sends the requests of the trace.
+
+        Returns:
+            float: The number of seconds the requests took.
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as clients:
+            for index, (endpoint, data, at) in enumerate(trace):
+                if at is None:
+                    at = index / self.rate if self.rate > 0 else 0
+                clients.submit(self.send, endpoint, data, start + at)
+        return time.perf_counter() - start
+
+
+def summarize(results: list, duration: float, queue_before: dict, queue_after: dict) -> dict:
+    """
+    Summarizes the outcome of the requests, per endpoint and for all of them.
+
+    Returns:
+        dict: Maps the endpoints, and "all", to their number of requests, of rejected
+            and failed ones, their throughput, the percentiles of their latency and
+            their mean time in the queue of the server.
+    """
+    summary = {}
+    for endpoint in sorted({result[0] for result in results}) + ['all']:
+        selected = [result for result in results if endpoint in ('all', result[0])]
+        latencies = np.array([seconds for _, outcome, seconds in selected if outcome == 'done'])
+        stats = {'requests': len(selected),
+                 'rejected': sum(outcome == 'rejected' for _, outcome, _ in selected),
+                 'errors': sum(outcome == 'error' for _, outcome, _ in selected),
+                 'throughput': len(latencies) / duration if duration > 0 else 0.0}
+        for percentile in PERCENTILES:
+            stats[f"p{percentile}_ms"] = float(np.percentile(latencies, percentile) * 1000) \
+                if len(latencies) else None
+        endpoints = queue_after if endpoint == 'all' else \
+            {endpoint: queue_after[endpoint]} if endpoint in queue_after else {}
+        total, count = 0.0, 0
+        for name, (after_sum, after_count) in endpoints.items():
+            before_sum, before_count = queue_before.get(name, (0.0, 0))
+            total += after_sum - before_sum
+            count += after_count - before_count
+        stats['queue_ms'] = total / count * 1000 if count else None
+        summary[endpoint] = stats
+    return summary
+
+
+def _format(value) -> str:
+    return '-' if value is None else f"{value:.1f}"
+
+
+def print_summary(summary: dict):
+    """
+    Prints the summary as a table.
+    """
+    print(f"{'endpoint':<24}{'requests':>9}{'rejected':>9}{'errors':>7}{'req/s':>8}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queue ms':>10}")
+    for endpoint, stats in summary.items():
+        print(f"{endpoint:<24}{stats['requests']:>9}{stats['rejected']:>9}{stats['errors']:>7}"
+              f"{stats['throughput']:>8.1f}{_format(stats['p50_ms']):>9}"
+              f"{_format(stats['p95_ms']):>9}{_format(stats['p99_ms']):>9}"
+              f"{_format(stats['queue_ms']):>10}")
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compares the latency percentiles with those of a baseline.
+
+    Returns:
+        list: The (endpoint, percentile, baseline, current) regressions, slower than
+            the baseline by more than the tolerance (a fraction).
+    """
+    regressions = []
+    print(f"{'endpoint':<24}" + ''.join(f"{name:>18}" for name in COMPARED))
+    for endpoint, stats in summary.items():
+        reference = baseline.get(endpoint)
+        if reference is None:
+            continue
+        cells = []
+        for name in COMPARED:
+            if stats[name] is None or not reference.get(name):
+                cells.append('-')
+                continue
+            change = stats[name] / reference[name] - 1
+            cells.append(f"{change:+.0%}")
+            if change > tolerance:
+                regressions.append((endpoint, name, reference[name], stats[name]))
+        print(f"{endpoint:<24}" + ''.join(f"{cell:>18}" for cell in cells))
+    return regressions
+
+
+def _parse_mix(mix: str) -> dict:
+    return {endpoint.strip(): float(weight) for endpoint, weight in
+            (item.split('=') for item in mix.split(',') if item.strip())}
+
+
+def main(arguments: argparse.Namespace) -> int:
+    """
+    Runs the load test.
+
+    Returns:
+        int: The exit status, 1 if the latency regressed from the baseline.
+    """
+    if arguments.trace:
+        trace = load_trace(arguments.trace)
+    else:
+        trace = synthesize(arguments.tests_dir, arguments.requests,
+                           _parse_mix(arguments.mix), arguments.seed)
+    if arguments.record:
+        with open(arguments.record, 'w', encoding='utf-8') as file:
+            for endpoint, data, _ in trace:
+                file.write(json.dumps({'endpoint': endpoint, 'data': data}) + '\n')
+
+    queue_before = scrape_queue_times(arguments.url)
+    load_test = LoadTest(arguments.url, arguments.concurrency, arguments.rate)
+    duration = load_test.run(trace)
+    summary = summarize(load_test.results, duration, queue_before,
+                        scrape_queue_times(arguments.url))
+    print(f"{len(trace)} requests in {duration:.2f} s, concurrency {arguments.concurrency}, "
+          f"rate {arguments.rate or 'unbounded'}")
+    print_summary(summary)
+
+    if arguments.save:
+        with open(arguments.save, 'w', encoding='utf-8') as file:
+            json.dump({'config': {'requests': len(trace), 'concurrency': arguments.concurrency,
+                                  'rate': arguments.rate, 'trace': arguments.trace,
+                                  'mix': arguments.mix, 'seed': arguments.seed},
+                       'summary': summary}, file, indent=2)
+    if arguments.compare:
+        with open(arguments.compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)['summary']
+        regressions = compare(summary, baseline, arguments.tolerance)
+        for endpoint, name, reference, current in regressions:
+            print(f"Regression: {endpoint} {name} {reference:.1f} -> {current:.1f} ms")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--trace', help="JSON lines trace to replay instead of synthesizing one")
+    parser.add_argument('--tests-dir', default=TESTS_DIR,
+                        help="directory of the tests whose inputs are synthesized from")
+    parser.add_argument('--requests', type=int, default=1000,
+                        help="number of requests synthesized")
+    parser.add_argument('--mix', default='',
+                        help="weights of the endpoints synthesized, e.g. states_mean=2,best5=1")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--concurrency', type=int, default=16, help="number of clients")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="requests sent per second, 0 for a closed loop")
+    parser.add_argument('--record', help="file to write the requests sent to, as a trace")
+    parser.add_argument('--save', help="file to write the results to, as a baseline")
+    parser.add_argument('--compare', help="baseline to compare the results with")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="slowdown from the baseline reported as a regression")
+    sys.exit(main(parser.parse_args()))
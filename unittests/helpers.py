@@ -0,0 +1,32 @@
+"""
+The setup shared by the unit tests: puts the repository and the checker scripts on the
+import path, and locates the dataset and the inputs of the endpoint tests.
+
+Run from the root of the repository:
+    python -m unittest discover unittests
+"""
+
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'checker')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+CSV_PATH = os.path.join(ROOT, "nutrition_activity_obesity_usa_subset.csv")
+TESTS_DIR = os.path.join(ROOT, "tests")
+
+
+def endpoint_inputs(endpoint: str) -> list:
+    """
+    Returns the (file name, data) of the inputs of the tests of an endpoint,
+    sorted by file name.
+    """
+    input_dir = os.path.join(TESTS_DIR, endpoint, 'input')
+    inputs = []
+    for input_file in sorted(os.listdir(input_dir)):
+        with open(os.path.join(input_dir, input_file), 'r', encoding='utf-8') as fin:
+            inputs.append((input_file, json.load(fin)))
+    return inputs
@@ -0,0 +1,32 @@
+import unittest
+
+from deepdiff import DeepDiff
+
+from unittests.helpers import CSV_PATH, endpoint_inputs
+from app import threadpool_tasks
+from app.aggregate_cube import AggregateCube
+from app.data_ingestor import DataIngestor
+
+
+class TestAggregateCube(unittest.TestCase):
+    """Checks that the aggregate cubes answer exactly like the computation over the rows."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tasks = threadpool_tasks.ENDPOINT_TASKS
+        cls.rows = DataIngestor(CSV_PATH)
+        cls.cube = DataIngestor(CSV_PATH)
+        cls.cube.cube = AggregateCube(cls.cube)
+
+    def test_same_results(self):
+        for endpoint, (task, args) in self.tasks.items():
+            for input_file, req_data in endpoint_inputs(endpoint):
+                with self.subTest(endpoint=endpoint, input_file=input_file):
+                    d = DeepDiff(task(req_data, self.cube, *args),
+                                 task(req_data, self.rows, *args),
+                                 math_epsilon=1e-9, ignore_nan_inequality=True)
+                    self.assertTrue(d == {}, str(d))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+from deepdiff import DeepDiff
+
+from unittests.helpers import CSV_PATH, endpoint_inputs
+from app import threadpool_tasks
+from app.aggregate_cube import AggregateCube
+from app.data_ingestor import DataIngestor
+
+
+class TestBatch(unittest.TestCase):
+    """Checks that a batch answers every spec like its endpoint, and malformed ones with errors."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tasks = threadpool_tasks.ENDPOINT_TASKS
+        cls.rows = DataIngestor(CSV_PATH)
+        cls.cube = DataIngestor(CSV_PATH)
+        cls.cube.cube = AggregateCube(cls.cube)
+
+    def test_batch(self):
+        specs = [{**req_data, 'endpoint': endpoint}
+                 for endpoint in self.tasks for _, req_data in endpoint_inputs(endpoint)]
+        specs.append({'endpoint': 'unknown', 'question': ''})
+        expected = [self.tasks[spec['endpoint']][0](spec, self.rows,
+                                                    *self.tasks[spec['endpoint']][1])
+                    if spec['endpoint'] in self.tasks else {"error": "Invalid endpoint"}
+                    for spec in specs]
+        d = DeepDiff(threadpool_tasks.batch(specs, self.rows), expected,
+                     math_epsilon=1e-9, ignore_nan_inequality=True)
+        self.assertTrue(d == {}, str(d))
+
+    def test_invalid_specs(self):
+        question = self.rows.questions_best_is_min[0]
+        specs = [{'endpoint': 'state_mean', 'question': question, 'state': [1]},
+                 {'endpoint': 'state_mean_by_category', 'question': question, 'state': {}},
+                 {'endpoint': 'state_diff_from_mean', 'question': question, 'state': 1},
+                 {'endpoint': 'states_mean', 'question': [question]},
+                 {'endpoint': 'global_mean', 'question': question}]
+        results = threadpool_tasks.batch(specs, self.rows)
+        self.assertEqual(results[:3], [threadpool_tasks.INVALID_STATE] * 3)
+        self.assertEqual(results[3], threadpool_tasks.INVALID_QUESTION)
+        self.assertAlmostEqual(results[4]['global_mean'],
+                               threadpool_tasks.global_mean(specs[4], self.rows)['global_mean'])
+        self.assertEqual(threadpool_tasks.state_mean(specs[0], self.cube),
+                         threadpool_tasks.INVALID_STATE)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
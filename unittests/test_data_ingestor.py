@@ -0,0 +1,161 @@
+import csv
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from deepdiff import DeepDiff
+
+from unittests.helpers import CSV_PATH, endpoint_inputs
+from app import data_ingestor, threadpool_tasks
+from app.aggregate_cube import AggregateCube
+from app.data_ingestor import DataIngestor, CATEGORICAL_COLUMNS, DATA_COL, STRAT_COL
+
+
+class TestAppend(unittest.TestCase):
+    """Checks that appending rows gives the same answers as parsing all of them."""
+
+    def test_append(self):
+        with open(CSV_PATH, 'r', newline='') as fin:
+            rows = list(csv.reader(fin))
+        half = len(rows) // 2
+        with tempfile.NamedTemporaryFile('w', newline='', suffix='.csv') as head:
+            csv.writer(head).writerows(rows[:half])
+            head.flush()
+            appended = DataIngestor(head.name)
+        appended.cube = AggregateCube(appended)
+        first = appended
+        question = {'question': first.questions_best_is_min[0]}
+        before = threadpool_tasks.states_mean(question, first)
+        for start in range(half, len(rows), 1000):
+            appended = appended.append(rows[start:start + 1000], rows[0])
+        # The versions appended to are left unchanged
+        d = DeepDiff(threadpool_tasks.states_mean(question, first), before,
+                     ignore_nan_inequality=True)
+        self.assertTrue(d == {}, str(d))
+
+        full = DataIngestor(CSV_PATH)
+        for endpoint, (task, args) in threadpool_tasks.ENDPOINT_TASKS.items():
+            for input_file, req_data in endpoint_inputs(endpoint):
+                with self.subTest(endpoint=endpoint, input_file=input_file):
+                    d = DeepDiff(task(req_data, appended, *args), task(req_data, full, *args),
+                                 math_epsilon=1e-9, ignore_nan_inequality=True)
+                    self.assertTrue(d == {}, str(d))
+
+
+class TestChunkedIngestion(unittest.TestCase):
+    """Checks that streaming the CSV in chunks reads the same data as the csv module."""
+
+    def test_same_data(self):
+        whole = DataIngestor(CSV_PATH, chunk_rows=0)
+        chunked = DataIngestor(CSV_PATH, chunk_rows=997)
+        self.assertEqual(chunked.labels, whole.labels)
+        self.assertTrue(np.array_equal(chunked.values, whole.values, equal_nan=True))
+        for column in CATEGORICAL_COLUMNS:
+            self.assertTrue(np.array_equal(chunked.codes[column], whole.codes[column]))
+
+
+class TestParallelIngestion(unittest.TestCase):
+    """Checks that parsing ranges of the CSV in parallel reads the same data as one pass."""
+
+    def test_quoted_newlines(self):
+        with open(CSV_PATH, 'r', newline='') as fin:
+            rows = list(csv.reader(fin))
+        strat = rows[0].index(STRAT_COL)
+        for number, row in enumerate(rows[1:2000]):
+            # Quoted fields with newlines, quotes and commas, in used and unused columns
+            row[0] = f'line "{number}"\nnext, line\r\n'
+            if number % 3 == 0:
+                row[strat] = f'{row[strat]}\n"{number % 5}"'
+        with tempfile.NamedTemporaryFile('w', newline='', suffix='.csv') as fout:
+            csv.writer(fout).writerows(rows[:2000])
+            fout.flush()
+            whole = DataIngestor(fout.name, chunk_rows=0, workers=1)
+            part_bytes = data_ingestor.PARALLEL_PART_BYTES
+            data_ingestor.PARALLEL_PART_BYTES = 997
+            try:
+                parallel = DataIngestor(fout.name, chunk_rows=0, workers=3)
+            finally:
+                data_ingestor.PARALLEL_PART_BYTES = part_bytes
+
+        self.assertEqual(len(parallel), len(rows[1:2000]))
+        self.assertEqual(parallel.labels, whole.labels)
+        self.assertTrue(np.array_equal(parallel.values, whole.values, equal_nan=True))
+        for column in CATEGORICAL_COLUMNS:
+            self.assertTrue(np.array_equal(parallel.codes[column], whole.codes[column]))
+
+
+class TestSnapshot(unittest.TestCase):
+    """Checks that a snapshot is reused until the size or the contents of its CSV change."""
+
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.temporary.name, 'data.csv')
+        with open(CSV_PATH, 'r', newline='') as fin:
+            self.rows = list(csv.reader(fin))[:200]
+        self.write_rows(self.rows, 1_000_000_000)
+        self.directory = os.path.join(self.temporary.name, 'cache', 'data.snapshot')
+        self.saves = mock.patch.object(DataIngestor, 'save', autospec=True,
+                                       side_effect=DataIngestor.save).start()
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(self.temporary.cleanup)
+
+    def write_rows(self, rows: list, mtime: int):
+        with open(self.csv_path, 'w', newline='') as fout:
+            csv.writer(fout).writerows(rows)
+        os.utime(self.csv_path, (mtime, mtime))
+
+    def open(self) -> DataIngestor:
+        return data_ingestor.open_snapshot(self.csv_path, self.directory)
+
+    def test_warm_reuse(self):
+        self.assertEqual(len(self.open()), len(self.rows) - 1)
+        self.assertEqual(len(self.open()), len(self.rows) - 1)
+        self.assertEqual(self.saves.call_count, 1)
+
+    def test_size_change(self):
+        self.open()
+        self.write_rows(self.rows[:100], 1_000_000_000)
+        self.assertEqual(len(self.open()), 99)
+        self.assertEqual(self.saves.call_count, 2)
+
+    def test_touch_reuses(self):
+        self.open()
+        os.utime(self.csv_path, (2_000_000_000, 2_000_000_000))
+        with mock.patch.object(data_ingestor, '_file_hash',
+                               side_effect=data_ingestor._file_hash) as file_hash:
+            self.open()
+            self.assertEqual(file_hash.call_count, 1)
+            # The new mtime is remembered, so the next start does not hash again
+            self.open()
+            self.assertEqual(file_hash.call_count, 1)
+        self.assertEqual(self.saves.call_count, 1)
+
+    def test_same_size_edit(self):
+        self.open()
+        column = self.rows[0].index(DATA_COL)
+        row = next(row for row in self.rows[1:] if row[column][:1].isdigit())
+        row[column] = ('1' if row[column][0] != '1' else '2') + row[column][1:]
+        self.write_rows(self.rows, 2_000_000_000)
+        self.assertIn(float(row[column]), self.open().values)
+        self.assertEqual(self.saves.call_count, 2)
+
+    def test_unwritable_directory(self):
+        # The parent of the snapshot is a file, so nothing can be created under it
+        blocker = os.path.join(self.temporary.name, 'blocker')
+        open(blocker, 'w', encoding='utf-8').close()
+        with self.assertLogs(level='WARNING'):
+            parsed = data_ingestor.open_snapshot(self.csv_path,
+                                                 os.path.join(blocker, 'data.snapshot'))
+        self.assertEqual(len(parsed), len(self.rows) - 1)
+        self.assertEqual(self.saves.call_count, 0)
+
+    def test_default_directory(self):
+        directory = data_ingestor.default_snapshot_dir(self.csv_path)
+        self.assertTrue(directory.startswith(tempfile.gettempdir()))
+        self.assertNotEqual(directory, data_ingestor.default_snapshot_dir(CSV_PATH))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from unittests.helpers import CSV_PATH
+from app.data_ingestor import DataIngestor
+from generate_dataset import generate
+
+
+class TestGenerateDataset(unittest.TestCase):
+    """Checks that the synthetic datasets have the labels of the CSV and noisy values."""
+
+    def test_generate(self):
+        source = DataIngestor(CSV_PATH)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "synthetic.csv")
+            self.assertEqual(generate(path, 3 * len(source), CSV_PATH, seed=1), 3 * len(source))
+            synthetic = DataIngestor(path)
+        self.assertEqual(len(synthetic), 3 * len(source))
+        self.assertEqual(synthetic.labels, source.labels)
+        values = synthetic.values[:len(source)]
+        self.assertTrue(np.array_equal(np.isnan(values), np.isnan(source.values)))
+        self.assertFalse(np.array_equal(values, source.values, equal_nan=True))
+        self.assertTrue(np.all((synthetic.values >= 0) | np.isnan(synthetic.values)))
+
+
+if __name__ == '__main__':
+    unittest.main()
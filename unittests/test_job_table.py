@@ -0,0 +1,82 @@
+import threading
+import unittest
+from time import sleep
+
+import unittests.helpers  # pylint: disable=unused-import
+from app.job_table import JobTable, RUNNING, DONE, FAILED, REJECTED, UNKNOWN
+from app.result_store import MemoryResultStore
+from app.task_runner import ThreadPool, QueueFullError
+
+
+def _fail():
+    raise ValueError("failed")
+
+
+class TestJobTable(unittest.TestCase):
+    """Checks the counters and the pages of the job table of the task runner."""
+
+    def test_states_and_pages(self):
+        runner = ThreadPool(MemoryResultStore(), num_workers=2, executor='thread')
+        release = threading.Event()
+        futures = [runner.submit(lambda: b'[]', 1), runner.submit(_fail, 2),
+                   runner.submit(lambda: release.wait() and b'[]', 4)]
+        runner.complete(5)
+        for future in futures[:2]:
+            future.exception(timeout=5)
+        sleep(0.1)
+        self.assertEqual(runner.jobs.stats(),
+                         {'num_jobs': 4, 'running': 1, 'done': 2, 'failed': 1, 'rejected': 0})
+        self.assertEqual(runner.jobs.page(1, 2), ([(1, DONE), (2, FAILED)], 3))
+        self.assertEqual(runner.jobs.page(3, 10), ([(4, RUNNING), (5, DONE)], None))
+        self.assertEqual(runner.jobs.page(1, 10, DONE), ([(1, DONE), (5, DONE)], None))
+        self.assertEqual(runner.get_jobs(6), {'job_id_1': 'done', 'job_id_2': 'done',
+                                              'job_id_3': 'done', 'job_id_4': 'running',
+                                              'job_id_5': 'done'})
+        release.set()
+        futures[2].result(timeout=5)
+        sleep(0.1)
+        self.assertEqual(runner.jobs.page(1, 10, RUNNING), ([], None))
+        # The finished jobs release their futures without a cleaner
+        self.assertEqual(runner.futures, {})
+        runner.executor.shutdown()
+
+    def test_history(self):
+        table = JobTable(history=8)
+        for job_id in range(1, 21):
+            table.set(job_id, RUNNING)
+            if job_id != 3:
+                table.set(job_id, DONE if job_id % 2 else FAILED)
+        self.assertEqual(len(table.states), 8)
+        self.assertEqual((table.start, table.end), (13, 21))
+        self.assertEqual(table.get(12), UNKNOWN)
+        self.assertEqual(table.page(1, 3), ([(13, DONE), (14, FAILED), (15, DONE)], 16))
+        self.assertEqual(table.page(16, 10, FAILED),
+                         ([(16, FAILED), (18, FAILED), (20, FAILED)], None))
+        self.assertEqual(list(table.legacy_states(21)), [f"job_id_{i}" for i in range(13, 21)])
+        # Job 3 left the ring while running, and is still counted when it finishes
+        self.assertEqual(table.stats()['running'], 1)
+        table.set(3, DONE)
+        self.assertEqual(table.stats(), {'num_jobs': 20, 'running': 0, 'done': 10,
+                                         'failed': 10, 'rejected': 0})
+        # Skipping more IDs than the ring holds clears it
+        table.set(100, RUNNING)
+        self.assertEqual(table.page(1, 10), ([(100, RUNNING)], None))
+
+    def test_rejected(self):
+        runner = ThreadPool(MemoryResultStore(), num_workers=1, executor='thread',
+                            max_queue=1)
+        release = threading.Event()
+        future = runner.submit(lambda: release.wait() and b'[]', 1)
+        with self.assertRaises(QueueFullError):
+            runner.submit(lambda: b'[]', 2)
+        self.assertEqual(runner.jobs.get(2), REJECTED)
+        self.assertEqual(runner.get_jobs(3), {'job_id_1': 'running'})
+        self.assertEqual(runner.jobs.stats(), {'num_jobs': 1, 'running': 1, 'done': 0,
+                                               'failed': 0, 'rejected': 1})
+        release.set()
+        future.result(timeout=5)
+        runner.executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from unittests.helpers import TESTS_DIR
+from load_test import synthesize, summarize, compare
+
+
+class TestLoadTest(unittest.TestCase):
+    """Checks the synthesis of the requests and the summary of the load tests."""
+
+    def test_summary(self):
+        trace = synthesize(TESTS_DIR, 50, {'best5': 1, 'state_mean': 3}, seed=0)
+        self.assertEqual(len(trace), 50)
+        self.assertEqual({endpoint for endpoint, _, _ in trace}, {'best5', 'state_mean'})
+
+        results = [('best5', 'done', 0.010), ('best5', 'done', 0.030),
+                   ('best5', 'rejected', 0.001), ('state_mean', 'error', 0.002)]
+        summary = summarize(results, 2.0, {'best5': (1.0, 10)}, {'best5': (1.5, 15)})
+        self.assertEqual(summary['best5']['rejected'], 1)
+        self.assertEqual(summary['best5']['throughput'], 1.0)
+        self.assertAlmostEqual(summary['best5']['p50_ms'], 20.0)
+        self.assertAlmostEqual(summary['best5']['queue_ms'], 100.0)
+        self.assertIsNone(summary['state_mean']['p50_ms'])
+        self.assertEqual(summary['all']['errors'], 1)
+        baseline = {'best5': {'p50_ms': 10.0, 'p95_ms': 29.0, 'p99_ms': 29.9}}
+        with redirect_stdout(io.StringIO()) as output:
+            regressions = compare(summary, baseline, 0.2)
+        self.assertEqual([name for _, name, _, _ in regressions], ['p50_ms'])
+        header, row = output.getvalue().splitlines()
+        self.assertEqual(header.split(), ['endpoint', 'p50_ms', 'p95_ms', 'p99_ms'])
+        self.assertEqual(row.split(), ['best5', '+100%', '-0%', '-0%'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import logging
+import queue
+import sys
+import threading
+import unittest
+
+import unittests.helpers  # pylint: disable=unused-import
+from app.log_pipeline import LogWriter, NonBlockingQueueHandler
+
+
+class TestLogPipeline(unittest.TestCase):
+    """Checks that the queued log records are written, and dropped when the queue is full."""
+
+    def test_queue(self):
+        records = []
+        class _ListHandler(logging.Handler):
+            def emit(self, record):
+                records.append(self.format(record))
+
+        handler = NonBlockingQueueHandler(queue.Queue(2))
+        logger = logging.getLogger('unittests.log_pipeline')
+        logger.propagate = False
+        logger.addHandler(handler)
+        for number in range(3):
+            logger.warning("record %d", number)
+        self.assertEqual(handler.dropped, 1)
+
+        writer = LogWriter(handler.queue, _ListHandler(), 60)
+        writer.start()
+        writer.stop()
+        self.assertEqual(records, ["record 0", "record 1"])
+
+    def test_dropped_from_threads(self):
+        handler = NonBlockingQueueHandler(queue.Queue(10))
+        record = logging.LogRecord('unittests.log_pipeline', logging.INFO, __file__, 0,
+                                   "record", None, None)
+        interval = sys.getswitchinterval()
+        # Switch threads as often as possible, for the increments to interleave
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=lambda: [handler.emit(record)
+                                                        for _ in range(5000)])
+                       for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(handler.queue.qsize(), 10)
+        self.assertEqual(handler.dropped, 8 * 5000 - 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
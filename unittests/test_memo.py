@@ -0,0 +1,60 @@
+import threading
+import unittest
+
+import unittests.helpers  # pylint: disable=unused-import
+from app.memo import RequestMemo
+from app.result_store import MemoryResultStore
+from app.task_runner import ThreadPool
+
+
+class TestRequestMemo(unittest.TestCase):
+    """Checks that identical requests share one job and are then answered from the memo."""
+
+    def setUp(self):
+        self.store = MemoryResultStore()
+        self.memo = RequestMemo(self.store)
+        self.runner = ThreadPool(self.store, num_workers=2, executor='thread')
+        self.release = threading.Event()
+        self.calls = 0
+
+    def tearDown(self):
+        self.release.set()
+        self.runner.executor.shutdown()
+
+    def task(self, payload):
+        self.calls += 1
+        self.release.wait()
+        return payload
+
+    def test_single_flight_and_cache(self):
+        key = ('best5', '"q"', 'null')
+        for job_id in (1, 2, 3):
+            self.memo.submit(key, self.runner, self.task, job_id, b'[1]')
+        self.release.set()
+        for job_id in (1, 2, 3):
+            self.assertTrue(self.runner.wait_job(job_id, 5))
+            self.assertEqual(self.store.get(job_id), b'[1]')
+        self.memo.submit(key, self.runner, self.task, 4, b'[1]')
+        self.assertEqual(self.store.get(4), b'[1]')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual((self.memo.misses, self.memo.shared, self.memo.hits), (1, 2, 1))
+
+        self.memo.invalidate()
+        self.memo.submit(key, self.runner, self.task, 5, b'[2]')
+        self.assertTrue(self.runner.wait_job(5, 5))
+        self.assertEqual(self.store.get(5), b'[2]')
+        self.assertEqual(self.calls, 2)
+
+    def test_stale_generation(self):
+        self.release.set()
+        key = ('best5', '"q"', 'null')
+        generation = self.memo.generation
+        self.memo.invalidate()
+        self.memo.submit(key, self.runner, self.task, 1, b'[1]', generation=generation)
+        self.assertTrue(self.runner.wait_job(1, 5))
+        self.assertEqual(self.store.get(1), b'[1]')
+        self.assertIsNone(self.memo.get(key))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+import unittests.helpers  # pylint: disable=unused-import
+from app.metrics import JobMetrics
+from app.result_store import MemoryResultStore
+from app.task_runner import ThreadPool
+
+
+class TestMetrics(unittest.TestCase):
+    """Checks the latency histograms of the jobs and their exposition."""
+
+    def test_histograms(self):
+        job_metrics = JobMetrics()
+        job_metrics.observe('best5', 0.0, 0.002, 0.102, 0.103)
+        job_metrics.observe('best5', 0.0, 0.0, 0.02, 0.02)
+        lines = job_metrics.render()
+        name = 'di_job_duration_seconds'
+        self.assertIn(f'{name}_bucket{{endpoint="best5",phase="queue",le="0.0025"}} 2', lines)
+        self.assertIn(f'{name}_bucket{{endpoint="best5",phase="compute",le="0.05"}} 1', lines)
+        self.assertIn(f'{name}_bucket{{endpoint="best5",phase="total",le="+Inf"}} 2', lines)
+        self.assertIn(f'{name}_count{{endpoint="best5",phase="persist"}} 2', lines)
+
+        runner = ThreadPool(MemoryResultStore(), num_workers=1, executor='thread')
+        runner.submit(lambda: b'[]', 1, endpoint='global_mean').result(timeout=5)
+        self.assertEqual(runner.metrics.histograms[('global_mean', 'total')].count, 1)
+        runner.executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
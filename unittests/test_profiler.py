@@ -0,0 +1,46 @@
+import json
+import unittest
+from time import sleep
+
+import unittests.helpers  # pylint: disable=unused-import
+from app.result_store import MemoryResultStore
+from app.task_runner import ThreadPool
+
+
+def _profiled_leaf():
+    return sorted([3, 1, 2])
+
+
+def _profiled_task():
+    return json.dumps(_profiled_leaf()).encode('utf-8')
+
+
+class TestProfiler(unittest.TestCase):
+    """Checks that the sampled jobs are profiled into collapsed stacks per endpoint."""
+
+    def test_profiled_jobs(self):
+        runner = ThreadPool(MemoryResultStore(), num_workers=1, executor='thread')
+        self.assertFalse(runner.profiler.sample('best5'))
+        with self.assertRaises(ValueError):
+            runner.profiler.configure(rate=2)
+        runner.profiler.configure(rates={'best5': 1})
+        runner.submit(_profiled_task, 1, endpoint='best5').result(timeout=5)
+        runner.submit(_profiled_task, 2, endpoint='worst5').result(timeout=5)
+        sleep(0.1)
+        self.assertEqual(runner.profiler.status()['profiled'], {'best5': 1})
+        self.assertEqual(runner.result_store.get(1), b'[1, 2, 3]')
+
+        stacks = dict(line.rsplit(' ', 1) for line in runner.profiler.collapsed().splitlines())
+        leaf = f"best5;{__name__}._profiled_task;{__name__}._profiled_leaf"
+        self.assertTrue(any(stack.startswith(leaf) for stack in stacks))
+        self.assertTrue(all(stack.startswith('best5') and int(microseconds) > 0
+                            for stack, microseconds in stacks.items()))
+        self.assertEqual(runner.profiler.collapsed('worst5'), '')
+        runner.profiler.configure(rate=0, rates={}, reset=True)
+        self.assertEqual(runner.profiler.status()['stacks'], 0)
+        self.assertFalse(runner.profiler.status()['enabled'])
+        runner.executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from unittest import mock
+
+import unittests.helpers  # pylint: disable=unused-import
+from app.result_store import ResultStore, MemoryResultStore
+
+
+class TestResultStore(unittest.TestCase):
+    """Checks the interface of the result stores and the limits of the memory store."""
+
+    def test_incomplete_backend(self):
+        class _PutOnly(ResultStore):
+            def put(self, job_id, payload):
+                pass
+
+        with self.assertRaises(TypeError):
+            _PutOnly()
+
+    def test_memory_limit(self):
+        store = MemoryResultStore(max_bytes=4, ttl=0)
+        store.put(1, b'[1]')
+        store.put(2, b'[2]')
+        self.assertIsNone(store.get(1))
+        self.assertEqual(store.get(2), b'[2]')
+        self.assertEqual(store.stats()['evictions'], 1)
+
+    def test_expiry_behind_recent(self):
+        store = MemoryResultStore(ttl=10)
+        with mock.patch('app.result_store.time.monotonic') as monotonic:
+            monotonic.return_value = 0
+            store.put(1, b'[1]')
+            monotonic.return_value = 5
+            store.put(2, b'[2]')
+            store.put(3, b'[3]')
+            # 1 becomes the most recently used, behind 2 and 3 that expire later
+            self.assertEqual(store.get(1), b'[1]')
+            monotonic.return_value = 6
+            store.put(3, b'[33]')
+            monotonic.return_value = 11
+            store.put(4, b'[4]')
+            self.assertEqual(list(store.results), [2, 3, 4])
+            self.assertEqual(store.stats()['bytes'], 10)
+            # The expiry of the first put of 3 is skipped, it was stored again since
+            monotonic.return_value = 15
+            self.assertEqual(store.get(3), b'[33]')
+            self.assertEqual(list(store.results), [4, 3])
+            monotonic.return_value = 16
+            self.assertEqual(store.get(4), b'[4]')
+            self.assertEqual(list(store.results), [4])
+            self.assertEqual(store.stats()['evictions'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import threading
+import unittest
+
+import unittests.helpers  # pylint: disable=unused-import
+from app.result_store import MemoryResultStore
+from app.scheduler import CostScheduler
+from app.task_runner import ThreadPool
+
+
+class TestCostScheduler(unittest.TestCase):
+    """Checks that cheap jobs overtake the expensive ones, but not indefinitely."""
+
+    def test_order(self):
+        scheduler = CostScheduler(slack=10, max_delay=5)
+        scheduler.observe('mean_by_category', 1000, 0.02)
+        scheduler.observe('state_mean', 10, 0.0001)
+        # The heavy job may wait 10 * 20 ms for the jobs submitted after it
+        scheduler.push('heavy', 0.0, 'mean_by_category', 1000)
+        scheduler.push('cheap', 0.1, 'state_mean', 10)
+        scheduler.push('late', 0.3, 'state_mean', 10)
+        self.assertEqual([scheduler.pop() for _ in range(3)], ['cheap', 'heavy', 'late'])
+
+    def test_thread_pool(self):
+        runner = ThreadPool(MemoryResultStore(), num_workers=1, executor='thread',
+                            scheduler='cost')
+        runner.scheduler.observe('mean_by_category', 1, 1.0)
+        runner.scheduler.observe('state_mean', 1, 0.001)
+        release = threading.Event()
+        order = []
+        def task(name):
+            release.wait()
+            order.append(name)
+            return b'[]'
+        futures = [runner.submit(task, 1, 'first', endpoint='state_mean', cost=1),
+                   runner.submit(task, 2, 'heavy', endpoint='mean_by_category', cost=1),
+                   runner.submit(task, 3, 'cheap', endpoint='state_mean', cost=1)]
+        self.assertEqual(runner.queue_stats()['scheduled'], 2)
+        release.set()
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(order, ['first', 'cheap', 'heavy'])
+        runner.executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import json
+import threading
+import unittest
+from time import monotonic, sleep
+
+import unittests.helpers  # pylint: disable=unused-import
+from app.result_store import MemoryResultStore
+from app.task_runner import ThreadPool, QueueFullError
+
+
+def _read_shared(shared_data: dict) -> bytes:
+    return json.dumps(shared_data).encode('utf-8')
+
+
+class TestSharedDataReload(unittest.TestCase):
+    """Checks that the worker processes see the data set after a reload."""
+
+    def test_set_shared_data(self):
+        store = MemoryResultStore()
+        old, new = {'version': 1}, {'version': 2}
+        runner = ThreadPool(store, old, num_workers=1, executor='process')
+        first = runner.submit(_read_shared, 1, old)
+        runner.set_shared_data(new)
+        second = runner.submit(_read_shared, 2, new)
+        first.result(timeout=10)
+        second.result(timeout=10)
+        self.assertEqual(json.loads(store.get(1)), old)
+        self.assertEqual(json.loads(store.get(2)), new)
+        runner.executor.shutdown()
+
+    def test_refork_deferred(self):
+        store = MemoryResultStore()
+        runner = ThreadPool(store, {'version': 1}, num_workers=1, executor='process')
+        executor = runner.executor
+        for version in range(2, 5):
+            runner.set_shared_data({'version': version})
+        self.assertIs(runner.executor, executor)
+        runner.submit(_read_shared, 1, runner.shared_data).result(timeout=10)
+        runner.submit(_read_shared, 2, runner.shared_data).result(timeout=10)
+        self.assertIsNot(runner.executor, executor)
+        self.assertEqual(json.loads(store.get(1)), {'version': 4})
+        self.assertEqual(json.loads(store.get(2)), {'version': 4})
+        runner.executor.shutdown()
+
+
+class TestAdmission(unittest.TestCase):
+    """Checks that the task runner rejects the jobs over the queue and endpoint limits."""
+
+    def test_limits(self):
+        runner = ThreadPool(MemoryResultStore(), num_workers=1, executor='thread',
+                            max_queue=2, endpoint_limits={'mean_by_category': 1})
+        release = threading.Event()
+        task = lambda: release.wait() and b'[]'
+        first = runner.submit(task, 1, endpoint='mean_by_category')
+        with self.assertRaises(QueueFullError) as context:
+            runner.submit(task, 2, endpoint='mean_by_category')
+        self.assertEqual(context.exception.endpoint, 'mean_by_category')
+        second = runner.submit(task, 3, endpoint='best5')
+        with self.assertRaises(QueueFullError) as context:
+            runner.submit(task, 4, endpoint='best5')
+        self.assertIsNone(context.exception.endpoint)
+        self.assertGreaterEqual(context.exception.retry_after, 1)
+        self.assertEqual(runner.queue_stats()['depth'], 2)
+        self.assertEqual(runner.queue_stats()['rejected'], 2)
+
+        release.set()
+        first.result(timeout=5)
+        second.result(timeout=5)
+        sleep(0.1)
+        runner.submit(task, 5, endpoint='mean_by_category').result(timeout=5)
+        sleep(0.1)
+        self.assertEqual(runner.queue_stats()['depth'], 0)
+        runner.executor.shutdown()
+
+    def test_run_inline(self):
+        runner = ThreadPool(MemoryResultStore(), num_workers=1, executor='thread',
+                            endpoint_limits={'best5': 1})
+        release = threading.Event()
+        queued = runner.submit(lambda: release.wait() and b'[]', 1, endpoint='best5')
+        with self.assertRaises(QueueFullError):
+            runner.run_inline(lambda: b'[]', endpoint='best5')
+        release.set()
+        queued.result(timeout=5)
+        sleep(0.1)
+        runner.profiler.configure(rate=1)
+        self.assertEqual(runner.run_inline(lambda: b'[1]', endpoint='best5'), b'[1]')
+        self.assertEqual(runner.queue_stats()['depth'], 0)
+        self.assertEqual(runner.metrics.histograms[('best5', 'compute')].count, 2)
+        self.assertEqual(runner.profiler.status()['profiled'], {'best5': 1})
+        runner.executor.shutdown()
+
+
+class TestWaitJob(unittest.TestCase):
+    """Checks that the waiters of a job return when it finishes, at most max_waiters blocking."""
+
+    def test_max_waiters(self):
+        runner = ThreadPool(MemoryResultStore(), num_workers=1, executor='thread')
+        runner.max_waiters = 1
+        release = threading.Event()
+        future = runner.submit(lambda: release.wait() and b'[]', 1)
+        waiter = threading.Thread(target=runner.wait_job, args=(1, 5))
+        waiter.start()
+        sleep(0.1)
+        self.assertEqual(runner.queue_stats()['waiters'], 1)
+        started = monotonic()
+        self.assertFalse(runner.wait_job(1, 5))
+        self.assertLess(monotonic() - started, 1)
+        release.set()
+        future.result(timeout=5)
+        waiter.join(timeout=5)
+        self.assertEqual(runner.queue_stats()['waiters'], 0)
+        runner.executor.shutdown()
+
+    def test_many_waiters(self):
+        runner = ThreadPool(MemoryResultStore(), num_workers=2, executor='thread')
+        release = threading.Event()
+        futures = [runner.submit(lambda: release.wait() and b'[]', job_id)
+                   for job_id in (1, 2)]
+        results = []
+        waiters = [threading.Thread(target=lambda job_id: results.append(
+                       runner.wait_job(job_id, 30)), args=(1 + index % 2,))
+                   for index in range(2000)]
+        for waiter in waiters:
+            waiter.start()
+        while runner.queue_stats()['waiters'] < len(waiters):
+            sleep(0.01)
+        started = monotonic()
+        release.set()
+        for waiter in waiters:
+            waiter.join(timeout=10)
+        self.assertLess(monotonic() - started, 10)
+        self.assertEqual(results, [True] * len(waiters))
+        self.assertEqual(runner.done_events, {})
+        for future in futures:
+            future.result(timeout=5)
+        runner.executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()